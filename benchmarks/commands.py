@@ -0,0 +1,247 @@
+"""Time every command on a generated repository and compare the results with a baseline.
+
+Workspace shape comes from parameters: file count, directory depth and fan-out, file size
+distribution, share of binary files, churn per commit and size of an ignored tree.
+Every step runs through mygit.main.main in a forked child, so each one reports its own
+wall time, peak RSS and read/write syscall counts (from /proc/self/io, Linux only).
+
+    python benchmarks/commands.py --files 5000 --output result.json
+    python benchmarks/commands.py --files 5000 --baseline result.json --tolerance 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mygit.main import main as mygit_main  # noqa: E402
+
+STEPS = ("init", "index -a", "commit", "status clean", "status dirty", "log", "checkout", "merge", "reset")
+IO_FIELDS = {"syscr": "read_syscalls", "syscw": "write_syscalls", "rchar": "read_bytes", "wchar": "written_bytes"}
+WORDS = ["alpha", "beta", "gamma", "delta", "status", "index", "commit", "branch", "merge", "tree", "blob"]
+
+
+class Workspace:
+    def __init__(self, path: Path, namespace: argparse.Namespace):
+        self.path = path
+        self.namespace = namespace
+        self.random = random.Random(namespace.seed)
+        self.directories = [Path()]
+        level = [Path()]
+        for depth in range(namespace.depth):
+            level = [parent / f"d{depth}_{i}" for parent in level for i in range(namespace.fanout)]
+            self.directories.extend(level)
+        self.files = []
+        self.generation = 0
+
+    def get_size(self):
+        if self.namespace.size_distribution == "fixed":
+            return self.namespace.mean_size
+        if self.namespace.size_distribution == "uniform":
+            return self.random.randint(0, 2 * self.namespace.mean_size)
+        return int(self.random.lognormvariate(0, 1) * self.namespace.mean_size / 1.65)  # e ** 0.5 is the mean
+
+    def get_content(self, size: int, is_binary: bool):
+        if is_binary:
+            return self.random.getrandbits(8 * size).to_bytes(size, "little")  # randbytes needs python 3.9
+        words = []
+        length = 0
+        while length < size:
+            words.append(self.random.choice(WORDS))
+            length += len(words[-1]) + 1
+        return bytes(" ".join(words)[:size], encoding="utf-8")
+
+    def write_file(self, relative_path: Path):
+        file_path = self.path / relative_path
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with Path.open(file_path, "wb") as file:
+            file.write(self.get_content(self.get_size(), self.random.random() < self.namespace.binary_fraction))
+
+    def create_files(self):
+        for i in range(self.namespace.files):
+            relative_path = self.directories[i % len(self.directories)] / f"file{i}.bin"
+            self.files.append(relative_path)
+            self.write_file(relative_path)
+
+    def create_ignored_tree(self):
+        with Path.open(self.path / ".mygit_ignore", "a") as ignore:
+            ignore.write("\nbuild/\n")
+        for i in range(self.namespace.ignored_files):
+            self.write_file(Path("build") / f"d{i % 16}" / f"object{i}.o")
+
+    def churn(self):
+        # changes share of files, a tenth of it is deleted and the same number is added
+        self.generation += 1
+        count = max(1, int(len(self.files) * self.namespace.churn))
+        for relative_path in self.random.sample(self.files, min(count, len(self.files))):
+            self.write_file(relative_path)
+        for relative_path in self.random.sample(self.files, min(count // 10, len(self.files))):
+            Path.unlink(self.path / relative_path)
+            self.files.remove(relative_path)
+        for i in range(count // 10):
+            relative_path = self.random.choice(self.directories) / f"new{self.generation}_{i}.bin"
+            self.files.append(relative_path)
+            self.write_file(relative_path)
+
+
+def read_io_counters():
+    counters = {}
+    try:
+        with open("/proc/self/io", "r") as io:
+            for line in io:
+                name, value = line.split(":")
+                counters[name] = int(value)
+    except OSError:
+        pass  # not Linux, or procfs isn't mounted
+    return counters
+
+
+def run_step(workspace_path: Path, args: list):
+    # fork keeps generated state in the parent, child's rusage is its own peak
+    read_descriptor, write_descriptor = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_descriptor)
+        null = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(null, 1)
+        os.dup2(null, 2)
+        io_before = read_io_counters()
+        start = perf_counter()
+        try:
+            mygit_main(workspace_path, args, False)
+            exit_code = 0
+        except SystemExit as e:
+            exit_code = e.code or 0
+        except BaseException:
+            exit_code = 1
+        wall_time = perf_counter() - start
+        io_after = read_io_counters()
+        result = {"wall_time": wall_time}
+        for field in IO_FIELDS:
+            if field in io_after:
+                result[IO_FIELDS[field]] = io_after[field] - io_before[field]
+        os.write(write_descriptor, bytes(json.dumps(result), encoding="utf-8"))
+        os._exit(exit_code)
+
+    os.close(write_descriptor)
+    with os.fdopen(read_descriptor, "rb") as pipe:
+        result = json.loads(pipe.read() or b"{}")
+    _, status, usage = os.wait4(pid, 0)
+    if not os.WIFEXITED(status) or os.WEXITSTATUS(status) != 0:
+        raise RuntimeError(f"mygit {' '.join(args)} failed in benchmark")
+    result["peak_rss_kb"] = usage.ru_maxrss
+    return result
+
+
+def run_scenario(namespace: argparse.Namespace):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        workspace = Workspace(Path(directory), namespace)
+        workspace.create_files()
+
+        def step(name: str, args: str):
+            results[name] = run_step(workspace.path, args.split())
+
+        step("init", "init")
+        workspace.create_ignored_tree()
+        step("index -a", "index -a")
+        step("commit", "commit initial")
+        for i in range(namespace.commits - 1):  # history for log
+            workspace.churn()
+            run_step(workspace.path, "index -a".split())
+            run_step(workspace.path, f"commit history{i}".split())
+        step("status clean", "status")
+        workspace.churn()
+        step("status dirty", "status")
+        run_step(workspace.path, "reset".split())
+        step("log", "log")
+
+        run_step(workspace.path, "checkout -n feature".split())
+        workspace.churn()
+        run_step(workspace.path, "index -a".split())
+        run_step(workspace.path, "commit feature".split())
+        step("checkout", "checkout master")
+        step("merge", "merge feature")
+        workspace.churn()
+        step("reset", "reset")
+    return results
+
+
+def merge_best(best: dict, results: dict):
+    for name in results:
+        if name not in best:
+            best[name] = dict(results[name])
+        else:
+            for metric in results[name]:
+                best[name][metric] = min(best[name][metric], results[name][metric])
+
+
+def compare(report: dict, baseline: dict, tolerance: float):
+    regressions = []
+    for name in report["steps"]:
+        if name not in baseline.get("steps", {}):
+            continue
+        for metric in ("wall_time", "peak_rss_kb", "read_syscalls", "write_syscalls"):
+            old = baseline["steps"][name].get(metric)
+            new = report["steps"][name].get(metric)
+            if old is not None and new is not None and new > old * (1 + tolerance) and new - old > 0:
+                regressions.append(f"{name}: {metric} {old} -> {new}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="command benchmarks on a generated repository")
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--depth", type=int, default=3, help="directory levels below workspace")
+    parser.add_argument("--fanout", type=int, default=4, help="subdirectories of every directory")
+    parser.add_argument("--size-distribution", choices=("fixed", "uniform", "lognormal"), default="lognormal")
+    parser.add_argument("--mean-size", type=int, default=4096, help="mean file size in bytes")
+    parser.add_argument("--binary-fraction", type=float, default=0.1, help="share of files with random bytes")
+    parser.add_argument("--churn", type=float, default=0.05, help="share of files changed by every commit")
+    parser.add_argument("--commits", type=int, default=5, help="commits in history before log is timed")
+    parser.add_argument("--ignored-files", type=int, default=1000, help="files in ignored build/ tree")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="scenario runs, best value of each metric is kept")
+    parser.add_argument("--output", type=Path, help="write JSON report here")
+    parser.add_argument("--baseline", type=Path, help="JSON report to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed growth of every metric")
+    namespace = parser.parse_args()
+    if not hasattr(os, "fork"):
+        parser.error("benchmarks need os.fork")
+
+    best = {}
+    for _ in range(namespace.repeat):
+        merge_best(best, run_scenario(namespace))
+    parameters = {name: value for name, value in vars(namespace).items()
+                  if name not in ("output", "baseline", "tolerance", "repeat")}
+    report = {"parameters": parameters, "python": platform.python_version(), "platform": platform.platform(),
+              "steps": {name: best[name] for name in STEPS}}
+
+    print(f"{'step':<14}{'wall, s':>10}{'rss, KiB':>10}{'read calls':>12}{'write calls':>12}")
+    for name in STEPS:
+        result = report["steps"][name]
+        print(f"{name:<14}{result['wall_time']:>10.3f}{result['peak_rss_kb']:>10}"
+              f"{result.get('read_syscalls', '-'):>12}{result.get('write_syscalls', '-'):>12}")
+    if namespace.output is not None:
+        with Path.open(namespace.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+    if namespace.baseline is not None:
+        with Path.open(namespace.baseline, "r") as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get("parameters") != parameters:
+            print("baseline was measured with other parameters", file=sys.stderr)
+        regressions = compare(report, baseline, namespace.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+        sys.exit(1 if len(regressions) > 0 else 0)
+
+
+if __name__ == "__main__":
+    main()
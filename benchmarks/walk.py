@@ -0,0 +1,130 @@
+"""Compare workspace walk before and after the scandir walker.
+
+Counts directory reads and stat calls made through the os module while collecting
+files and their stat info, the way status and index -a do it, then times both walks.
+
+    python benchmarks/walk.py --dirs 200 --files 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mygit.backend import collect_tree_files  # noqa: E402
+from mygit.ignore import IgnoreRules  # noqa: E402
+from mygit.state import State  # noqa: E402
+
+counters = {"readdir": 0, "stat": 0}
+original_scandir = os.scandir
+original_listdir = os.listdir
+original_stat = os.stat
+
+
+class CountingEntry:
+    def __init__(self, entry: os.DirEntry):
+        self.entry = entry
+        self.name = entry.name
+        self.path = entry.path
+
+    def is_dir(self):
+        return self.entry.is_dir()  # d_type from getdents, no syscall for regular entries
+
+    def stat(self):
+        counters["stat"] += 1
+        return self.entry.stat()
+
+
+class CountingScandir:
+    def __init__(self, path):
+        counters["readdir"] += 1
+        self.iterator = original_scandir(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.iterator.close()
+
+    def __iter__(self):
+        return (CountingEntry(entry) for entry in self.iterator)
+
+
+def counting_listdir(path):
+    counters["readdir"] += 1
+    return original_listdir(path)
+
+
+def counting_stat(path, *args, **kwargs):
+    counters["stat"] += 1
+    return original_stat(path, *args, **kwargs)
+
+
+def iterdir_walk(dir_path: Path, file_paths: list, file_stats: list, ignore_rules: IgnoreRules):
+    # how status and index walked the workspace before: iterdir, is_file, then stat for the stat cache
+    for child in dir_path.iterdir():
+        is_file = child.is_file()
+        if not ignore_rules.matches(child, not is_file):
+            if is_file:
+                file_paths.append(child)
+                file_stats.append(child.stat())
+            else:
+                iterdir_walk(child, file_paths, file_stats, ignore_rules)
+
+
+def scandir_walk(dir_path: Path, file_paths: list, file_stats: list, ignore_rules: IgnoreRules):
+    state = State()
+    state.ignore_rules = ignore_rules
+    collect_tree_files(dir_path, file_paths, state, file_stats)
+
+
+def create_workspace(workspace_path: Path, dirs: int, files: int):
+    for i in range(dirs):
+        dir_path = workspace_path / f"dir{i % 10}" / f"sub{i}"
+        dir_path.mkdir(parents=True)
+        for j in range(files):
+            with Path.open(dir_path / f"file{j}.txt", "w") as file:
+                file.write(f"{i} {j}")
+
+
+def measure(walk_function, workspace_path: Path, ignore_rules: IgnoreRules, repeat: int):
+    counters.update(readdir=0, stat=0)
+    os.scandir, os.listdir, os.stat = CountingScandir, counting_listdir, counting_stat
+    try:
+        file_paths = []
+        walk_function(workspace_path, file_paths, [], ignore_rules)
+    finally:
+        os.scandir, os.listdir, os.stat = original_scandir, original_listdir, original_stat
+    calls = dict(counters)
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        walk_function(workspace_path, [], [], ignore_rules)
+        best = min(best, perf_counter() - start)
+    return len(file_paths), calls, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="workspace walk benchmark")
+    parser.add_argument("--dirs", type=int, default=200)
+    parser.add_argument("--files", type=int, default=50, help="files per directory")
+    parser.add_argument("--repeat", type=int, default=5)
+    namespace = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workspace:
+        workspace_path = Path(workspace)
+        create_workspace(workspace_path, namespace.dirs, namespace.files)
+        ignore_rules = IgnoreRules(workspace_path, ["*.o\n"])
+
+        print(f"{'walk':<10}{'files':>10}{'readdir':>10}{'stat':>10}{'best, s':>10}")
+        for name, walk_function in (("iterdir", iterdir_walk), ("scandir", scandir_walk)):
+            files, calls, best = measure(walk_function, workspace_path, ignore_rules, namespace.repeat)
+            print(f"{name:<10}{files:>10}{calls['readdir']:>10}{calls['stat']:>10}{best:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
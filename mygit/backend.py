@@ -1,11 +1,25 @@
 import logging
+import os
+import stat
+import sys
 from colorama import Fore
-from hashlib import sha1
-from mygit.constants import Constants
+from functools import partial
+from mygit import trace
+from mygit.bloom import append_changed_path_filter, get_path_hashes
+from mygit.commit_graph import append_commit, write_commit_graph, is_ancestor
+from mygit.constants import Constants, REPOSITORY_FORMAT
+from mygit.fsmonitor import query_fsmonitor
+from mygit.hashing import checksum_file, store_file, run_jobs, hash_object, Progress
+from mygit.index_file import write_index_file, append_index_journal, is_journal_full
+from mygit.log_file import iterate_records, read_last_records, parse_since, format_record
+from mygit.objects import get_object_path, object_exists, read_object, get_object_content, write_object, \
+    move_into_objects, iterate_object_chunks, iterate_loose_objects, get_parsed_object, is_checksum
+from mygit.pack import create_pack, get_packs, find_delta_bases, choose_deltas
 from mygit.state import State
+from mygit.walk import walk
 from pathlib import Path
-from time import strftime
-from zlib import decompress, compress
+from time import localtime, mktime, strftime, strptime, time
+from zlib import decompress, compress, error as zlib_error
 
 
 def is_init(c: Constants):
@@ -29,62 +43,217 @@ def has_collisions_with_service_files(c: Constants) -> bool:
 
 
 def write_down_index(c: Constants, s: State):
-    result = list()
+    with trace.phase("write index"):
+        is_rewritten = s.index_needs_rewrite or is_journal_full(c.mygit_index_path, c.index_journal_path)
+        if s.is_partial or not is_rewritten:  # partial state would drop paths it hasn't read
+            append_index_journal(c.index_journal_path, [
+                (path.relative_to(c.workspace_path).as_posix(), s.current_indexed_paths.get(path),
+                 s.workspace_stat_cache.get(path)) for path in sorted(s.changed_index_paths)],
+                s.fsmonitor_token if s.fsmonitor_token_is_changed else None)
+        else:
+            indexed_paths = {path.relative_to(c.workspace_path).as_posix(): s.current_indexed_paths[path]
+                             for path in s.current_indexed_paths}
+            stat_cache = {path.relative_to(c.workspace_path).as_posix(): s.workspace_stat_cache[path]
+                          for path in s.workspace_stat_cache}
+            write_index_file(c.mygit_index_path, indexed_paths, stat_cache, s.fsmonitor_token, s.cache_tree,
+                             s.cache_tree_commit)
+            if c.index_journal_path.exists():
+                Path.unlink(c.index_journal_path)  # its entries are in index now, replaying them would be harmless
+            s.index_needs_rewrite = False
+    s.changed_index_paths.clear()
+    s.stat_cache_is_changed = False
+    s.fsmonitor_token_is_changed = False
+
+
+def clean_index(c: Constants, s: State):
+    for child in c.mygit_index_dir_path.iterdir():
+        if child != c.mygit_index_path:
+            Path.unlink(child)
     for path in s.current_indexed_paths:
-        result.append(f"{path.relative_to(c.workspace_path)} {s.current_indexed_paths[path]}")
-    content = compress(bytes("\n".join(result), encoding="utf-8"), -1)
-    with Path.open(c.mygit_index_path, "wb") as index:
-        index.write(content)
+        s.invalidate_cache_tree(path.relative_to(c.workspace_path).as_posix())
+    s.current_indexed_paths.clear()
+    s.index_needs_rewrite = True
+    write_down_index(c, s)
 
 
-def clean_index(c: Constants):
-    for child in c.mygit_index_dir_path.iterdir():
-        Path.unlink(child)
-    Path.open(c.mygit_index_path, "w").close()
+def record_index_change(path: Path, c: Constants, s: State):
+    s.changed_index_paths.add(path)
+    s.invalidate_cache_tree(path.relative_to(c.workspace_path).as_posix())
+
+
+def get_stat_key(file_stat: os.stat_result):
+    return file_stat.st_mtime_ns, file_stat.st_ctime_ns, file_stat.st_size, file_stat.st_ino, file_stat.st_mode
+
+
+def get_cached_checksum(file_path: Path, file_stat: os.stat_result, s: State):
+    cached = s.workspace_stat_cache.get(file_path)
+    if cached is None or cached[1] != get_stat_key(file_stat):
+        return None
+    if file_stat.st_mtime_ns >= s.index_timestamp:  # racily clean: file could change after it was hashed
+        return None
+    return cached[0]
+
+
+def get_checksums(file_paths: list, c: Constants, s: State, store_blobs: bool = False, file_stats: list = None):
+    checksums = []
+    pending_positions = []
+    pending_jobs = []
+    pending_stat_keys = []
+    pending_size = 0
+    stat_calls = 0
+    for position, file_path in enumerate(file_paths):
+        if file_stats is None:
+            file_stat = file_path.stat()
+            stat_calls += 1
+        else:
+            file_stat = file_stats[position]  # walker has stat'ed them
+        if file_stat is None:  # fsmonitor saw no changes since checksum was cached
+            checksum = s.workspace_stat_cache[file_path][0]
+            if not store_blobs or not needs_blob(file_path, checksum, c, s):
+                checksums.append(checksum)
+                continue
+            file_stat = file_path.stat()
+            stat_calls += 1
+        checksum = get_cached_checksum(file_path, file_stat, s)
+        if checksum is None or store_blobs and needs_blob(file_path, checksum, c, s):
+            pending_positions.append(len(checksums))
+            pending_stat_keys.append(get_stat_key(file_stat))
+            pending_size += file_stat.st_size
+            if store_blobs:
+                pending_jobs.append((str(file_path), s.last_commit_indexed_path.get(file_path, ""),
+                                     str(c.mygit_index_dir_path)))
+            else:
+                pending_jobs.append(str(file_path))
+        checksums.append(checksum)
+    trace.count("files_stated", stat_calls)
+    trace.count("stat_cache_hits", len(file_paths) - len(pending_jobs))
+    trace.count("stat_cache_misses", len(pending_jobs))
+
+    if len(pending_jobs) > 0:
+        function = store_file if store_blobs else checksum_file
+        trace.count("files_hashed", len(pending_jobs))
+        trace.count("bytes_read", pending_size)  # workers may be processes, so their reads are counted here
+        trace.count("bytes_hashed", pending_size)
+        if store_blobs:
+            trace.count("bytes_compressed", pending_size)
+        with trace.phase("hash"):
+            results = run_jobs(function, pending_jobs, s.workers, store_blobs, pending_size)  # only storing compresses
+        for position, stat_key, checksum in zip(pending_positions, pending_stat_keys, results):
+            file_path = file_paths[position]
+            checksums[position] = checksum
+            if checksum is None:
+                logging.warning(Fore.YELLOW + f"{file_path.relative_to(c.workspace_path)} keeps changing while "
+                                              f"it's read, skipped")
+                continue
+            s.workspace_stat_cache[file_path] = (checksum, stat_key)
+            s.changed_index_paths.add(file_path)
+            s.stat_cache_is_changed = True
+            blob_index_path = c.mygit_index_dir_path / checksum
+            if store_blobs and blob_index_path.exists() and object_exists(checksum, c):
+                Path.unlink(blob_index_path)  # workers don't look into objects, this blob is already recorded
+
+    return checksums
+
+
+def collect_workspace_files(file_paths: list, file_stats: list, c: Constants, s: State):
+    changes = query_fsmonitor(s.fsmonitor_token, c)  # token is taken before any file is read
+    new_token = "" if changes is None else changes[0]
+    if new_token != s.fsmonitor_token:
+        s.fsmonitor_token = new_token
+        s.stat_cache_is_changed = True
+        s.fsmonitor_token_is_changed = True
+    collected = {}
+    if changes is None or changes[1] is None:  # monitor is down, or it has lost track of changes since token
+        collect_tree_files(c.workspace_path, file_paths, s, file_stats)
+        collected.update(zip(file_paths, file_stats))
+    else:
+        collect_changed_files(changes[1], collected, s)
+
+    # status reports files in this order, so walk and monitor have to agree on it
+    file_paths[:] = sorted(collected, key=str)
+    file_stats[:] = [collected[path] for path in file_paths]
+
+
+def collect_changed_files(changes: list, collected: dict, s: State):
+    changed_paths = set(changes)
+    changed_directories = tuple(str(path) + os.sep for path in changed_paths if not path.is_file())
+    for path in s.workspace_stat_cache:
+        if path not in changed_paths and not str(path).startswith(changed_directories):
+            collected[path] = None  # trusted, see get_checksums
+    for path in changed_paths.union(path for path in s.workspace_stat_cache if path not in collected):
+        if str(path).startswith(changed_directories):
+            continue  # walk of changed directory finds it
+        try:
+            path_stat = os.stat(path)
+            trace.count("files_stated")
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        if s.ignore_rules.matches_with_parents(path, stat.S_ISDIR(path_stat.st_mode)):
+            continue
+        if stat.S_ISDIR(path_stat.st_mode):
+            directory_file_paths = []
+            directory_file_stats = []
+            collect_tree_files(path, directory_file_paths, s, directory_file_stats)
+            collected.update(zip(directory_file_paths, directory_file_stats))
+        else:
+            collected[path] = path_stat
 
 
-def write_down_workspace_state(workspace_state: dict, c: Constants):
-    result = list()
+def needs_blob(file_path: Path, checksum: str, c: Constants, s: State):
+    if s.last_commit_indexed_path.get(file_path) == checksum:
+        return False
+    return not (c.mygit_index_dir_path / checksum).exists() and not object_exists(checksum, c)
+
+
+def collect_tree_files(dir_path: Path, file_paths: list, s: State, file_stats: list = None):
+    for _, files, _, _ in walk(dir_path, s.ignore_rules, with_stat=file_stats is not None):
+        for file_path, file_stat in files:
+            file_paths.append(file_path)
+            if file_stats is not None:
+                file_stats.append(file_stat)
+
+
+def write_down_head_manifest(commit_checksum: str, workspace_state: dict, c: Constants):
+    result = [commit_checksum]
     for path in workspace_state:
         result.append(f"{path.relative_to(c.workspace_path)} {workspace_state[path]}")
-    content = compress(bytes("\n".join(result), encoding="utf-8"), -1)
-    checksum = sha1(content).hexdigest()
-    with Path.open(c.mygit_objects_path / checksum, "wb") as workspace_state_file:
-        workspace_state_file.write(content)
+    temp_path = c.head_manifest_path.with_name("tmp-" + c.head_manifest_path.name)
+    with Path.open(temp_path, "wb") as manifest:
+        manifest.write(compress(bytes("\n".join(result), encoding="utf-8"), -1))
+    os.replace(temp_path, c.head_manifest_path)  # interrupted commit leaves previous manifest whole
 
-    return checksum
 
-
-def clear_workspace(c: Constants, s: State):
-    for child in c.workspace_path.iterdir():
-        if child not in s.ignored_paths:
-            if child.is_file():
-                Path.unlink(child)
-            else:
-                clear_directory(child, s)
+def get_repository_format(c: Constants):
+    if not c.format_path.exists():
+        return 1  # repositories created before format file was introduced
+    with Path.open(c.format_path, "r") as repository_format:
+        return int(repository_format.read())
 
 
 def clear_directory(directory_path: Path, s: State):
-    for child in directory_path.iterdir():
-        if child not in s.ignored_paths:
-            if child.is_file():
-                Path.unlink(child)
-            else:
-                clear_directory(child, s)
-    directory_path.rmdir()
+    kept_directories = set()
+    for current_path, files, directories, ignored in reversed(list(walk(directory_path, s.ignore_rules))):
+        for file_path, _ in files:
+            Path.unlink(file_path)
+        if len(ignored) > 0 or any(child in kept_directories for child in directories):
+            kept_directories.add(current_path)  # ignored files stay in place
+        else:
+            current_path.rmdir()
 
 
 def get_tree_content(saved_tree_checksum: str, c: Constants):
-    content = dict()
     if saved_tree_checksum == "":
-        return content
+        return dict()
+    return get_parsed_object(saved_tree_checksum, parse_tree, c)  # shared with other readers, read only
+
 
-    saved_tree = get_compressed_file_content(c.mygit_objects_path / saved_tree_checksum).split("\n")
+def parse_tree(tree_content: str, c: Constants):
+    content = dict()
+    saved_tree = tree_content.split("\n")
     for obj in saved_tree:
-        buffer = obj.split()
-        object_type = buffer[0]
-        path = c.workspace_path / buffer[1]
-        checksum = buffer[2]
+        object_type, buffer = obj.split(" ", 1)
+        path, checksum = buffer.rsplit(" ", 1)  # path could contain spaces
+        path = c.workspace_path / path
 
         if object_type not in content:
             content[object_type] = {path: checksum}
@@ -96,13 +265,36 @@ def get_tree_content(saved_tree_checksum: str, c: Constants):
     return content
 
 
+def diff_trees(old_tree_checksum: str, new_tree_checksum: str, changes: list, c: Constants):
+    if old_tree_checksum == new_tree_checksum:
+        return
+
+    old_content = get_tree_content(old_tree_checksum, c)
+    new_content = get_tree_content(new_tree_checksum, c)
+    old_blobs = old_content.get("blob", {})
+    new_blobs = new_content.get("blob", {})
+    for path in new_blobs:
+        if old_blobs.get(path) != new_blobs[path]:
+            changes.append((path, old_blobs.get(path), new_blobs[path]))
+    for path in old_blobs:
+        if path not in new_blobs:
+            changes.append((path, old_blobs[path], None))
+
+    old_trees = old_content.get("tree", {})
+    new_trees = new_content.get("tree", {})
+    for path in new_trees:
+        diff_trees(old_trees.get(path, ""), new_trees[path], changes, c)
+    for path in old_trees:
+        if path not in new_trees:
+            diff_trees(old_trees[path], "", changes, c)
+
+
 def get_last_tree_checksum(branch_path: Path, c: Constants):
-    last_commit_path = c.mygit_objects_path / get_last_commit_checksum(branch_path)
-    return get_tree_checksum(last_commit_path)
+    return get_tree_checksum(get_last_commit_checksum(branch_path), c)
 
 
-def get_tree_checksum(commit_path: Path):
-    return get_compressed_file_content(commit_path).split("\n")[0]
+def get_tree_checksum(commit_checksum: str, c: Constants):
+    return get_commit_content(commit_checksum, c)[0]
 
 
 def get_current_branch_name(c: Constants):
@@ -125,17 +317,33 @@ def get_last_commit_index_content(c: Constants):
     last_commit_checksum = get_last_commit_checksum(get_current_branch_path(c))
     if last_commit_checksum == "":
         return ""
+    if c.head_manifest_path.exists():
+        with Path.open(c.head_manifest_path, "rb") as manifest:
+            try:
+                manifest_commit_checksum, _, content = decompress(manifest.read()).decode().partition("\n")
+            except (zlib_error, UnicodeDecodeError):
+                manifest_commit_checksum = ""  # damaged manifest is rebuilt from the tree
+        if manifest_commit_checksum == last_commit_checksum:
+            return content
+
     commit_content = get_commit_content(last_commit_checksum, c)
-    content_checksum = commit_content[1]
-    return get_compressed_file_content(c.mygit_objects_path / content_checksum)
+    workspace_state = dict()
+    if commit_content[1] != "":  # commits made before format 7 carry a manifest object
+        for buffer in get_object_content(commit_content[1], c).split("\n"):
+            if buffer != "":
+                path, checksum = buffer.rsplit(" ", 1)
+                workspace_state[c.workspace_path / path] = checksum
+    else:
+        collect_tree_blobs(commit_content[0], workspace_state, c)
+    write_down_head_manifest(last_commit_checksum, workspace_state, c)
+    return "\n".join(f"{path.relative_to(c.workspace_path)} {workspace_state[path]}" for path in workspace_state)
 
 
-def get_compressed_file_content(file_path_absolute: Path):
-    if file_path_absolute.stat().st_size == 0:
-        return ""
-    with Path.open(file_path_absolute, "rb") as file:
-        content = decompress(file.read()).decode()
-    return content
+def collect_tree_blobs(tree_checksum: str, workspace_state: dict, c: Constants):
+    tree_content = get_tree_content(tree_checksum, c)
+    workspace_state.update(tree_content.get("blob", {}))
+    for subtree_checksum in tree_content.get("tree", {}).values():
+        collect_tree_blobs(subtree_checksum, workspace_state, c)
 
 
 # ===Commit=============================================================================================================
@@ -153,63 +361,73 @@ def make_commit(commit_message: str, c: Constants, s: State):
 
 def create_commit(current_branch_path: Path, commit_message: str, parent_commit_checksum: str, c: Constants, s: State):
     new_workspace_state = dict()
-    current_tree_checksum = create_tree(c.workspace_path, new_workspace_state, c, s)
-    workspace_state_checksum = write_down_workspace_state(new_workspace_state, c)
+    changed_paths = [path.relative_to(c.workspace_path).as_posix() for path in s.current_indexed_paths
+                     if s.current_indexed_paths[path] != s.last_commit_indexed_path.get(path, "deleted")]
+    with trace.phase("write trees"):
+        current_tree_checksum = create_tree(parent_commit_checksum, new_workspace_state, c, s)
+    timestamp = int(time())
     content_raw = bytes(
         current_tree_checksum + "\n" +
-        workspace_state_checksum + "\n" +
+        "\n" +  # manifest of paths is derived from tree now
         commit_message + "\n" +
-        str(strftime("%c %z")) + "\n" +
+        str(strftime("%c %z", localtime(timestamp))) + "\n" +
         parent_commit_checksum, encoding="utf-8")
-    content = compress(content_raw, -1)
-    checksum = sha1(content).hexdigest()
-    commit_path = c.mygit_objects_path / checksum
-    with Path.open(commit_path, "wb") as commit:
-        commit.write(content)
+    checksum = write_object(content_raw, "commit", c)
+    append_commit(checksum, parent_commit_checksum, current_tree_checksum, timestamp, c)
+    append_changed_path_filter(checksum, changed_paths, c)
+    write_down_head_manifest(checksum, new_workspace_state, c)
     with Path.open(current_branch_path, "w") as branch:
         branch.write(checksum)
-    clean_index(c)
-
-
-def create_tree(dir_path: Path, new_workspace_state: dict, c: Constants, s: State):
-    tree_objects = []
-    for child in dir_path.iterdir():
-        if child in s.ignored_paths:
-            continue
-        if child.is_file():
-            blob_checksum = create_blob(child, c, s)
-            if blob_checksum is not None:
-                tree_objects.append(f"blob {child.relative_to(c.workspace_path)} {blob_checksum}")
-                new_workspace_state[child] = blob_checksum
+    s.current_indexed_paths.clear()  # they are committed, so cached trees stay valid for new commit
+    s.cache_tree_commit = checksum
+    clean_index(c, s)
+
+
+def create_tree(parent_commit_checksum: str, new_workspace_state: dict, c: Constants, s: State):
+    # last commit with indexed changes on top, trees of directories without changes are taken from cache-tree
+    if s.cache_tree_commit != parent_commit_checksum:
+        s.cache_tree.clear()
+    for file_path in s.last_commit_indexed_path:
+        new_workspace_state[file_path] = s.last_commit_indexed_path[file_path]
+    for file_path in s.current_indexed_paths:
+        blob_checksum = create_blob(file_path, c, s)
+        if blob_checksum == "deleted":
+            new_workspace_state.pop(file_path, None)
         else:
-            tree_checksum = create_tree(child, new_workspace_state, c, s)
-            if tree_checksum is not None:
-                tree_objects.append(f"tree {child.relative_to(c.workspace_path)} {tree_checksum}")
-
-    if len(tree_objects) == 0:
-        return None
-    content_raw = bytes("\n".join(tree_objects), encoding="utf-8")
-    content = compress(content_raw, -1)
-    checksum = sha1(content).hexdigest()
-    tree_path = c.mygit_objects_path / checksum
-    if not tree_path.exists():
-        with Path.open(tree_path, "wb") as tree:
-            tree.write(content)
-
-    return checksum
+            new_workspace_state[file_path] = blob_checksum
+
+    tree_objects = {}  # relative directory -> its entries, only for directories out of cache-tree
+    subdirectories = {}
+    directories = {""}
+    workspace_prefix_length = len(str(c.workspace_path)) + 1  # slicing is much cheaper than relative_to
+    for file_path in new_workspace_state:
+        relative_path = str(file_path)[workspace_prefix_length:].replace(os.sep, "/")
+        directory = relative_path.rpartition("/")[0]
+        if directory not in s.cache_tree:
+            tree_objects.setdefault(directory, []).append(f"blob {relative_path} {new_workspace_state[file_path]}")
+        while directory not in directories:
+            directories.add(directory)
+            parent = directory.rpartition("/")[0]
+            subdirectories.setdefault(parent, []).append(directory)
+            directory = parent
+
+    for directory in sorted(directories, key=lambda path: path.count("/") + (path != ""), reverse=True):
+        if directory in s.cache_tree:
+            continue  # children first, so every subdirectory has its tree now
+        entries = tree_objects.get(directory, []) + \
+            [f"tree {child} {s.cache_tree[child][0]}" for child in subdirectories.get(directory, [])]
+        if len(entries) > 0:
+            s.cache_tree[directory] = (
+                write_object(bytes("\n".join(sorted(entries)), encoding="utf-8"), "tree", c), len(entries))
+    return s.cache_tree[""][0] if "" in s.cache_tree else None
 
 
 def create_blob(file_path: Path, c: Constants, s: State):
-    if file_path in s.current_indexed_paths:
-        indexed_checksum = s.current_indexed_paths[file_path]
-        indexed_blob_path = c.mygit_index_dir_path / indexed_checksum
-        if indexed_blob_path.exists():
-            indexed_blob_path.rename(c.mygit_objects_path / indexed_checksum)
-        return indexed_checksum
-    elif file_path in s.last_commit_indexed_path:
-        return s.last_commit_indexed_path[file_path]
-
-    return None
+    indexed_checksum = s.current_indexed_paths[file_path]
+    indexed_blob_path = c.mygit_index_dir_path / indexed_checksum
+    if indexed_checksum != "deleted" and indexed_blob_path.exists():
+        move_into_objects(indexed_blob_path, indexed_checksum, c)
+    return indexed_checksum
 
 
 # ===Checkout===========================================================================================================
@@ -220,8 +438,11 @@ def checkout_to_branch(branch_name, c: Constants, s: State):
     elif has_uncommitted_changes(c, s):
         logging.error(Fore.RED + "you can't checkout with uncommitted changes, use commit or reset")  # TODO reset
     else:
-        clear_workspace(c, s)
-        expand_tree(get_last_tree_checksum(branch_path, c), c)
+        current_tree_checksum = get_last_tree_checksum(get_current_branch_path(c), c)
+        if not update_workspace(current_tree_checksum, get_last_tree_checksum(branch_path, c), c, s):
+            logging.error(Fore.RED + f"couldn't move to branch {branch_name}, workspace was partially updated. "
+                                     f"Fix the errors above and use reset to restore workspace")
+            return
 
         with Path.open(c.mygit_head_path, "w") as head:
             head.write(branch_name)
@@ -235,24 +456,60 @@ def create_new_branch_from_current_and_checkout(new_branch_name: str, c: Constan
     logging.info(Fore.GREEN + f"moved to new branch {new_branch_name}")
 
 
-def expand_tree(tree_checksum: str, c: Constants):
-    tree_content = get_tree_content(tree_checksum, c)
-    for obj_type in tree_content:
-        if obj_type == "blob":
-            for path in tree_content[obj_type]:
-                expand_blob(tree_content[obj_type][path], path, c)
-        else:
-            for path in tree_content[obj_type]:
-                Path.mkdir(path)
-                expand_tree(tree_content[obj_type][path], c)
+def expand_blobs(blobs: list, c: Constants, s: State):
+    blobs = sorted(blobs)  # errors are reported in path order, whichever worker met them
+    progress = Progress("writing files", len(blobs))
+    with trace.phase("write files"):
+        results = run_jobs(partial(expand_blob_job, c=c, progress=progress), blobs, s.workers, use_processes=False)
+    errors = [error for error in results if error is not None]
+    for error in errors:
+        logging.error(Fore.RED + f"couldn't write {error}")
+    return len(errors) == 0
 
 
-def expand_blob(blob_checksum: str, target_filename: Path, c: Constants):
-    with Path.open(c.mygit_objects_path / blob_checksum, "rb") as source:
-        content = decompress(source.read())
+def expand_blob_job(job: tuple, c: Constants, progress: Progress):
+    file_path, blob_checksum = job
+    try:
+        expand_blob(blob_checksum, file_path, c)
+        return None
+    except OSError as e:
+        return f"{file_path.relative_to(c.workspace_path)}: {e.strerror}"
+    finally:
+        progress.advance()
 
+
+def expand_blob(blob_checksum: str, target_filename: Path, c: Constants):
     with Path.open(target_filename, "wb") as file:
-        file.write(content)
+        for chunk in iterate_object_chunks(blob_checksum, c):
+            file.write(chunk)
+
+
+def update_workspace(old_tree_checksum: str, new_tree_checksum: str, c: Constants, s: State):
+    changes = []
+    diff_trees(old_tree_checksum, new_tree_checksum, changes, c)
+    # removals go first, so a file can take place of removed directory and vice versa
+    for path, _, new_blob_checksum in changes:
+        if new_blob_checksum is None:
+            remove_workspace_file(path, c)
+    blobs = [(path, new_blob_checksum) for path, _, new_blob_checksum in changes if new_blob_checksum is not None]
+    for path, _ in blobs:
+        prepare_workspace_file(path, s)
+    return expand_blobs(blobs, c, s)
+
+
+def prepare_workspace_file(file_path: Path, s: State):
+    if file_path.is_dir():
+        clear_directory(file_path, s)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+
+
+def remove_workspace_file(file_path: Path, c: Constants):
+    if file_path.is_file():
+        Path.unlink(file_path)
+    directory_path = file_path.parent
+    while directory_path != c.workspace_path and directory_path.exists() and not any(directory_path.iterdir()):
+        directory_path.rmdir()
+        directory_path = directory_path.parent
 
 
 # ===Branch=============================================================================================================
@@ -277,10 +534,9 @@ def create_new_branch_from_current(new_branch_name: str, c: Constants):
 
 def create_new_branch_from_commit(branch_name: str, commit_checksum: str, c: Constants):
     branch_path = c.mygit_branches_path / branch_name
-    commit_path = c.mygit_objects_path / commit_checksum
     if branch_path.exists():
         logging.warning(Fore.YELLOW + f"branch {branch_name} already exists")
-    elif not commit_path.exists():
+    elif not object_exists(commit_checksum, c):
         logging.error(Fore.RED + "commit doesn't exist")
     else:
         with Path.open(branch_path, "w") as new_branch:
@@ -312,8 +568,11 @@ def merge(branch_name: str, c: Constants, s: State):
         elif has_uncommitted_changes(c, s):
             logging.error(Fore.RED + "you can't merge with uncommitted changes, use commit or reset")  # TODO reset
         elif can_be_fast_forwarded(from_commit_checksum, to_commit_checksum, c):
-            clear_workspace(c, s)
-            expand_tree(get_tree_checksum(c.mygit_objects_path / to_commit_checksum), c)
+            from_tree_checksum = get_tree_checksum(from_commit_checksum, c)
+            if not update_workspace(from_tree_checksum, get_tree_checksum(to_commit_checksum, c), c, s):
+                logging.error(Fore.RED + f"couldn't merge {branch_name}, workspace was partially updated. "
+                                         f"Fix the errors above and use reset to restore workspace")
+                return
 
             with Path.open(current_branch_path, "w") as current_branch:
                 current_branch.write(to_commit_checksum)
@@ -325,6 +584,10 @@ def merge(branch_name: str, c: Constants, s: State):
 
 
 def can_be_fast_forwarded(from_commit_checksum: str, to_commit_checksum: str, c: Constants):
+    known_by_commit_graph = is_ancestor(from_commit_checksum, to_commit_checksum, c)
+    if known_by_commit_graph is not None:
+        return known_by_commit_graph
+
     commit_checksum = to_commit_checksum
 
     while commit_checksum != "":
@@ -346,8 +609,8 @@ def delete_indexed_changes(objects_to_reset: list, c: Constants, s: State):
         else:
             delete_indexed_changes_dir(object_path, c, s)
 
-    if len(s.current_indexed_paths) == 0:
-        clean_index(c)
+    if len(s.current_indexed_paths) == 0 and not s.is_partial:  # partial state doesn't know other paths
+        clean_index(c, s)
     else:
         write_down_index(c, s)
 
@@ -355,16 +618,15 @@ def delete_indexed_changes(objects_to_reset: list, c: Constants, s: State):
 def delete_indexed_changes_file(file_path_absolute: Path, c: Constants, s: State):
     if file_path_absolute in s.current_indexed_paths:
         blob_index_path = c.mygit_index_dir_path / s.current_indexed_paths.pop(file_path_absolute)
+        record_index_change(file_path_absolute, c, s)
         if blob_index_path.exists():
             Path.unlink(blob_index_path)
 
 
 def delete_indexed_changes_dir(dir_path_absolute: Path, c: Constants, s: State):
-    for child in dir_path_absolute.iterdir():
-        if child.is_file():
-            delete_indexed_changes_file(child, c, s)
-        else:
-            delete_indexed_changes_dir(child, c, s)
+    for _, files, _, _ in walk(dir_path_absolute, s.ignore_rules):
+        for file_path, _ in files:
+            delete_indexed_changes_file(file_path, c, s)
 
 
 def reset_to_commit_state(objects_to_reset: list, c: Constants, s: State):
@@ -387,11 +649,29 @@ def reset_to_commit_state_file(file_path_absolute: Path, c: Constants, s: State)
 
 
 def reset_to_commit_state_dir(dir_path_absolute: Path, c: Constants, s: State):
-    for child in dir_path_absolute.iterdir():
-        if child.is_file():
-            reset_to_commit_state_file(child, c, s)
-        else:
-            reset_to_commit_state_dir(child, c, s)
+    for _, files, _, _ in walk(dir_path_absolute, s.ignore_rules):
+        for file_path, _ in files:
+            reset_to_commit_state_file(file_path, c, s)
+
+
+def reset_workspace_to_commit_state(c: Constants, s: State):
+    workspace_files = []
+    workspace_file_stats = []
+    with trace.phase("walk"):
+        collect_tree_files(c.workspace_path, workspace_files, s, workspace_file_stats)
+    workspace_checksums = dict(zip(workspace_files, get_checksums(workspace_files, c, s,
+                                                                  file_stats=workspace_file_stats)))
+    for file_path in workspace_files:
+        if file_path not in s.last_commit_indexed_path:
+            remove_workspace_file(file_path, c)
+    blobs = [(file_path, blob_checksum) for file_path, blob_checksum in s.last_commit_indexed_path.items()
+             if workspace_checksums.get(file_path) != blob_checksum]
+    for file_path, _ in blobs:
+        prepare_workspace_file(file_path, s)
+    is_restored = expand_blobs(blobs, c, s)
+    if s.stat_cache_is_changed:
+        write_down_index(c, s)
+    return is_restored
 
 
 def reset_all_indexed_files_to_commit_state(c: Constants, s: State):
@@ -407,8 +687,22 @@ def has_uncommitted_changes(c: Constants, s: State):
 
 def check_status(c: Constants, s: State):
     if not s.status_is_checked:
-        check_tree(c.workspace_path, c, s)
-        check_deleted_files(c, s)
+        workspace_files = []
+        workspace_file_stats = []
+        with trace.phase("walk"):
+            collect_workspace_files(workspace_files, workspace_file_stats, c, s)
+        for file_path, checksum in zip(workspace_files, get_checksums(workspace_files, c, s,
+                                                                      file_stats=workspace_file_stats)):
+            check_blob(file_path, checksum, c, s)
+        visited_files = set(workspace_files)
+        check_deleted_files(visited_files, c, s)
+
+        for path in [path for path in s.workspace_stat_cache if path not in visited_files]:
+            del s.workspace_stat_cache[path]
+            s.changed_index_paths.add(path)
+            s.stat_cache_is_changed = True
+        if s.stat_cache_is_changed:
+            write_down_index(c, s)
         s.status_is_checked = True
 
 
@@ -434,12 +728,8 @@ def print_status(c: Constants, s: State):
             logging.warning(Fore.YELLOW + indexed)
 
 
-def check_blob(file_path: Path, c: Constants, s: State):
-    with Path.open(file_path, "rb") as source:
-        content = compress(source.read(), -1)
-        checksum = sha1(content).hexdigest()
-        relative_path = str(file_path.relative_to(c.workspace_path))
-        message = "modified: " + relative_path
+def check_blob(file_path: Path, checksum: str, c: Constants, s: State):
+    message = "modified: " + str(file_path.relative_to(c.workspace_path))
 
     if file_path in s.last_commit_indexed_path and s.last_commit_indexed_path[file_path] == checksum:
         return
@@ -452,18 +742,12 @@ def check_blob(file_path: Path, c: Constants, s: State):
         s.status_not_indexed_paths.append(message)
 
 
-def check_tree(dir_path: Path, c: Constants, s: State):
-    for child in dir_path.iterdir():
-        if child not in s.ignored_paths:
-            if child.is_file():
-                check_blob(child, c, s)
-            else:
-                check_tree(child, c, s)
-
-
-def check_deleted_files(c: Constants, s: State):
+def check_deleted_files(visited_files: set, c: Constants, s: State):
     for path in s.last_commit_indexed_path:
-        if not path.exists():
+        if path in visited_files:
+            continue  # walked or trusted by fsmonitor
+        trace.count("files_stated")
+        if not path.exists():  # could be ignored now
             message = "deleted: " + str(path.relative_to(c.workspace_path))
             if path not in s.current_indexed_paths:
                 s.status_not_indexed_paths.append(message)
@@ -473,10 +757,18 @@ def check_deleted_files(c: Constants, s: State):
 
 def print_ignored_paths(c: Constants, s: State):
     logging.warning(Fore.YELLOW + "ignored paths:")
-    for ignored in s.ignored_paths:
+    ignored_paths = []
+    collect_ignored_paths(c.workspace_path, ignored_paths, s)
+    for ignored in ignored_paths:
         logging.info(str(ignored.relative_to(c.workspace_path)))
 
 
+def collect_ignored_paths(dir_path: Path, ignored_paths: list, s: State):
+    for _, _, _, ignored in walk(dir_path, s.ignore_rules):
+        ignored_paths.extend(ignored)  # directory is shown once, without its content
+    ignored_paths.sort()
+
+
 def print_indexed_paths(c: Constants, s: State):
     if len(s.current_indexed_paths) == 0:
         logging.warning(Fore.YELLOW + "index is empty, use index <file1, file2, ...> to index changes")
@@ -488,12 +780,26 @@ def print_indexed_paths(c: Constants, s: State):
 
 # ===Index==============================================================================================================
 def index_all_changes(c: Constants, s: State):
-    for child in c.workspace_path.iterdir():
-        index_object(child, c, s)
-    index_deleted_files(s)
+    file_paths = []
+    file_stats = []
+    with trace.phase("walk"):
+        collect_workspace_files(file_paths, file_stats, c, s)
+    index_files(file_paths, c, s, file_stats)
+    index_deleted_files(c, s)
     write_down_index(c, s)
 
 
+def get_relative_file_paths(files: list, c: Constants):
+    # paths named on command line, None when one of them is a directory, its files aren't known before walk
+    relative_paths = []
+    for file in files:
+        file_path = c.workspace_path / file
+        if file_path.is_dir():
+            return None
+        relative_paths.append(file_path.relative_to(c.workspace_path).as_posix())
+    return relative_paths
+
+
 def index_input_files(files: list, c: Constants, s: State):
     if len(files) == 0:
         logging.warning(Fore.YELLOW + "you didn't mention any file")
@@ -507,37 +813,28 @@ def index_object(file_path_absolute: Path, c: Constants, s: State):
     file_path_relative = str(file_path_absolute.relative_to(c.workspace_path))
     if not file_path_absolute.exists() and file_path_absolute not in s.last_commit_indexed_path:
         logging.error(Fore.RED + f"file or directory doesn't exist: {file_path_relative}")
-    elif file_path_absolute in s.ignored_paths:
+    elif s.ignore_rules.matches_with_parents(file_path_absolute, file_path_absolute.is_dir()):
         logging.warning(Fore.YELLOW + f"file has been ignored: {file_path_relative}")
     else:
         if not file_path_absolute.exists():  # TODO so we can't index deleted directory
-            index_file(file_path_absolute, c, s)
+            s.current_indexed_paths[file_path_absolute] = "deleted"
+            record_index_change(file_path_absolute, c, s)
         elif file_path_absolute.is_file():
-            index_file(file_path_absolute, c, s)
+            index_files([file_path_absolute], c, s)
         else:
-            index_tree(file_path_absolute, c, s)
+            file_paths = []
+            file_stats = []
+            collect_tree_files(file_path_absolute, file_paths, s, file_stats)
+            index_files(file_paths, c, s, file_stats)
 
 
-def index_tree(dir_path_absolute: Path, c: Constants, s: State):
-    for child in dir_path_absolute.iterdir():
-        if child not in s.ignored_paths:
-            if child.is_file():
-                index_file(child, c, s)
-            else:
-                index_tree(child, c, s)
-
-
-def index_file(file_path_absolute: Path, c: Constants, s: State):
-    if not file_path_absolute.exists():
-        s.current_indexed_paths[file_path_absolute] = "deleted"
-        return
+def index_files(file_paths: list, c: Constants, s: State, file_stats: list = None):
+    for file_path, checksum in zip(file_paths, get_checksums(file_paths, c, s, True, file_stats)):
+        if checksum is not None:  # unstable file stays as it was in index
+            index_file(file_path, checksum, c, s)
 
-    with Path.open(file_path_absolute, "rb") as source:
-        content = compress(source.read(), -1)
-        checksum = sha1(content).hexdigest()
-        blob_path = c.mygit_objects_path / checksum
-        blob_index_path = c.mygit_index_dir_path / checksum
 
+def index_file(file_path_absolute: Path, checksum: str, c: Constants, s: State):
     if file_path_absolute in s.last_commit_indexed_path and s.last_commit_indexed_path[file_path_absolute] == checksum:
         return
 
@@ -548,20 +845,421 @@ def index_file(file_path_absolute: Path, c: Constants, s: State):
             Path.unlink(p_i_c_path)
 
     s.current_indexed_paths[file_path_absolute] = checksum
-    if not blob_index_path.exists() and not blob_path.exists():
-        with Path.open(blob_index_path, "wb") as blob:
-            blob.write(content)
+    record_index_change(file_path_absolute, c, s)
 
 
-def index_deleted_files(s: State):
+def index_deleted_files(c: Constants, s: State):
     for path in s.last_commit_indexed_path:
         if not path.exists() and path not in s.current_indexed_paths:
             s.current_indexed_paths[path] = "deleted"
+            record_index_change(path, c, s)
+
+
+# ===Pack=============================================================================================================
+def pack_objects(repack_all: bool, c: Constants):
+    loose_checksums = list(iterate_loose_objects(c))
+    old_packs = get_packs(c) if repack_all else []
+    checksums = set(loose_checksums)
+    for pack in old_packs:
+        checksums.update(pack.iterate_checksums())
+    if len(checksums) == 0 or len(loose_checksums) == 0 and not repack_all:
+        logging.warning(Fore.YELLOW + "there are no loose objects to pack")
+        return
+
+    def read_compressed_object(checksum: str):
+        object_path = get_object_path(checksum, c)
+        if not object_path.exists():
+            return compress(read_object(checksum, c), -1)
+        with Path.open(object_path, "rb") as obj:
+            return obj.read()
+
+    deltas = choose_deltas(find_delta_bases(get_blob_history(c), checksums), lambda checksum: read_object(checksum, c))
+    pack_name = create_pack(list(checksums), read_compressed_object, c, deltas)
+    for checksum in loose_checksums:
+        Path.unlink(get_object_path(checksum, c))
+    for pack in old_packs:
+        if pack.name != pack_name:
+            Path.unlink(pack.index_path)
+            Path.unlink(pack.pack_path)
+    remove_empty_fan_out_directories(c)
+
+    pack_size = (c.packs_path / (pack_name + ".pack")).stat().st_size
+    logging.info(Fore.GREEN + f"packed {len(checksums)} objects ({len(deltas)} as deltas) "
+                              f"into {pack_name} ({pack_size} bytes)")
+
+
+def get_blob_history(c: Constants):
+    blob_history = []
+    for _, commit_content in iterate_history(c):  # oldest first, so previous versions of files come first
+        parent_commit_checksum = get_commit_parent_commit(commit_content)
+        parent_tree_checksum = "" if parent_commit_checksum == "" else get_tree_checksum(parent_commit_checksum, c)
+        changes = []
+        diff_trees(parent_tree_checksum, commit_content[0], changes, c)
+        for path, old_blob_checksum, new_blob_checksum in changes:
+            if new_blob_checksum is not None:
+                blob_history.append((path.name, new_blob_checksum, old_blob_checksum))
+
+    return blob_history
+
+
+def remove_empty_fan_out_directories(c: Constants):
+    for fan_out_path in c.mygit_objects_path.iterdir():
+        if len(fan_out_path.name) == 2 and fan_out_path.is_dir() and not any(fan_out_path.iterdir()):
+            fan_out_path.rmdir()
+
+
+# ===GC=================================================================================================================
+def collect_garbage(grace: str, dry_run: bool, c: Constants, s: State):
+    try:
+        cutoff = parse_since(grace).timestamp()  # younger objects may belong to a command running right now
+    except ValueError:
+        logging.error(Fore.RED + f"couldn't parse grace period {grace}, use durations like 2w, 1d, 0s or ISO time")
+        return
+
+    with trace.phase("mark"):
+        reachable = mark_reachable_objects(c, s)
+    loose_count, loose_size = prune_loose_objects(reachable, cutoff, dry_run, c)
+    packed_count, packed_size = prune_packed_objects(reachable, cutoff, dry_run, c)
+    index_count, index_size = prune_index_blobs(cutoff, dry_run, c, s)
+    if not dry_run and loose_count + packed_count > 0:
+        rebuild_commit_graph(c)  # removed commits leave the graph
+
+    action = "would remove" if dry_run else "removed"
+    logging.info(Fore.GREEN + f"{len(reachable)} objects are reachable, {action} {loose_count} loose objects, "
+                              f"{packed_count} packed objects and {index_count} index blobs "
+                              f"({loose_size + packed_size + index_size} bytes)")
+
+
+def mark_reachable_objects(c: Constants, s: State):
+    # roots are branches and index; history is walked commit by commit, trees level by level in parallel.
+    # cache-tree needs no marking: it's used only on top of its commit, whose trees are marked with it
+    reachable = set()
+    trees = set()
+    for branch_path in c.mygit_branches_path.iterdir():
+        commit_checksum = get_last_commit_checksum(branch_path)
+        while commit_checksum != "" and commit_checksum not in reachable:
+            reachable.add(commit_checksum)
+            commit_content = get_commit_content(commit_checksum, c)
+            trees.add(commit_content[0])
+            if commit_content[1] != "":  # manifest object of commits made before head manifest
+                reachable.add(commit_content[1])
+            commit_checksum = get_commit_parent_commit(commit_content)
+    reachable.update(checksum for checksum in s.current_indexed_paths.values() if checksum != "deleted")
+
+    pending = [tree_checksum for tree_checksum in trees if is_checksum(tree_checksum)]
+    while len(pending) > 0:
+        pending = [tree_checksum for tree_checksum in set(pending) if tree_checksum not in reachable]
+        reachable.update(pending)
+        pending_subtrees = []
+        for subtrees, blobs in run_jobs(partial(read_tree_children, c=c), pending, s.workers, use_processes=True):
+            reachable.update(blobs)
+            pending_subtrees.extend(subtrees)
+        pending = pending_subtrees
+    return reachable
+
+
+def read_tree_children(tree_checksum: str, c: Constants):
+    # parsed without paths and past object cache, every tree is read once
+    subtrees = []
+    blobs = []
+    for line in read_object(tree_checksum, c).split(b"\n"):
+        object_type, _, buffer = line.partition(b" ")
+        checksum = buffer.rpartition(b" ")[2].decode()
+        if object_type == b"tree":
+            subtrees.append(checksum)
+        elif object_type == b"blob":
+            blobs.append(checksum)
+    return subtrees, blobs
+
+
+def prune_loose_objects(reachable: set, cutoff: float, dry_run: bool, c: Constants):
+    count = 0
+    size = 0
+    for checksum in list(iterate_loose_objects(c)):
+        if checksum in reachable or not is_checksum(checksum):
+            continue
+        object_path = get_object_path(checksum, c)
+        object_stat = object_path.stat()
+        if object_stat.st_mtime >= cutoff:
+            continue
+        count += 1
+        size += object_stat.st_size
+        if not dry_run:
+            Path.unlink(object_path)
+    if not dry_run and count > 0:
+        remove_empty_fan_out_directories(c)
+    return count, size
+
+
+def prune_packed_objects(reachable: set, cutoff: float, dry_run: bool, c: Constants):
+    # packs older than grace period are rewritten with their reachable objects only
+    old_packs = [pack for pack in get_packs(c) if pack.pack_path.stat().st_mtime < cutoff]
+    kept = set()
+    count = 0
+    size = 0
+    for pack in old_packs:
+        for checksum in pack.iterate_checksums():
+            if checksum in reachable:
+                kept.add(checksum)
+            else:
+                count += 1
+                size += pack.find(bytes.fromhex(checksum))[1]
+    if count == 0 or dry_run:
+        return count, size
+
+    new_pack_name = None
+    if len(kept) > 0:
+        deltas = choose_deltas(find_delta_bases(get_blob_history(c), kept), lambda checksum: read_object(checksum, c))
+        new_pack_name = create_pack(list(kept), lambda checksum: compress(read_object(checksum, c), -1), c, deltas)
+    for pack in old_packs:
+        if pack.name != new_pack_name:
+            Path.unlink(pack.index_path)
+            Path.unlink(pack.pack_path)
+    return count, size  # stored size of removed records, as in dry run
+
+
+def prune_index_blobs(cutoff: float, dry_run: bool, c: Constants, s: State):
+    # blobs and temp files left by interrupted commands, index refers to none of them
+    indexed_checksums = set(s.current_indexed_paths.values())
+    count = 0
+    size = 0
+    for blob_path in list(c.mygit_index_dir_path.iterdir()):
+        if not (is_checksum(blob_path.name) and blob_path.name not in indexed_checksums or
+                blob_path.name.endswith(".tmp")):
+            continue
+        blob_stat = blob_path.stat()
+        if blob_stat.st_mtime >= cutoff:
+            continue
+        count += 1
+        size += blob_stat.st_size
+        if not dry_run:
+            Path.unlink(blob_path)
+    return count, size
+
+
+# ===Upgrade==========================================================================================================
+def upgrade_repository(c: Constants):
+    if not c.mygit_objects_path.exists() or not c.mygit_branches_path.exists():
+        logging.warning(Fore.YELLOW + "directory doesn't contain a repository. Use 'mygit init' to create new one")
+        return
+
+    repository_format = get_repository_format(c)
+    has_derived_files = c.packs_path.exists() and c.commit_graph_path.exists()
+    if repository_format >= REPOSITORY_FORMAT and has_derived_files:
+        logging.info(Fore.GREEN + "repository format is up to date")
+        return
+
+    if repository_format < 3:  # objects are moved first, so rewriting can use fan-out object paths
+        move_objects_into_fan_out_directories(c)
+    if repository_format < 2:
+        rewrite_objects_with_content_checksums(c)
+    if repository_format < 4 or not c.packs_path.exists():
+        c.packs_path.mkdir(exist_ok=True)
+    if repository_format < 5 or not c.commit_graph_path.exists():
+        rebuild_commit_graph(c)
+    if repository_format < 6:
+        rewrite_index(c)
+
+    with Path.open(c.format_path, "w") as format_file:
+        format_file.write(str(REPOSITORY_FORMAT))
+    if repository_format >= REPOSITORY_FORMAT:
+        logging.info(Fore.GREEN + "missing pack directory and commit graph were restored")
+    else:
+        logging.info(Fore.GREEN + f"repository was upgraded from format {repository_format} to {REPOSITORY_FORMAT}")
+
+
+def rebuild_commit_graph(c: Constants):
+    commits = []
+    for commit_checksum, commit_content in iterate_history(c):
+        commits.append((commit_checksum, get_commit_parent_commit(commit_content), commit_content[0],
+                        parse_commit_date(commit_content[3])))
+    write_commit_graph(commits, c)
+
+
+def rewrite_index(c: Constants):
+    s = State()
+    s.load_cache(c, "")  # compressed text index is still readable
+    s.index_needs_rewrite = True
+    write_down_index(c, s)
+
+
+def parse_commit_date(date: str):
+    try:
+        return int(mktime(strptime(date.rsplit(" ", 1)[0], "%c")))
+    except ValueError:
+        return 0
+
+
+def rewrite_objects_with_content_checksums(c: Constants):
+    new_checksums = dict()
+    for branch_path in c.mygit_branches_path.iterdir():
+        new_commit_checksum = rewrite_commit(get_last_commit_checksum(branch_path), new_checksums, c)
+        with Path.open(branch_path, "w") as branch:
+            branch.write(new_commit_checksum)
+
+    s = State()
+    s.load_cache(c, "")
+    for path in s.current_indexed_paths:
+        if s.current_indexed_paths[path] != "deleted":
+            s.current_indexed_paths[path] = rewrite_indexed_blob(s.current_indexed_paths[path], new_checksums, c)
+    s.workspace_stat_cache.clear()  # cached checksums were computed in the old format
+    s.cache_tree.clear()
+    s.index_needs_rewrite = True
+    write_down_index(c, s)
+
+    for old_checksum in new_checksums:
+        old_object_path = get_object_path(old_checksum, c)
+        if new_checksums[old_checksum] != old_checksum and old_object_path.exists():
+            Path.unlink(old_object_path)
+
+
+def rewrite_commit(commit_checksum: str, new_checksums: dict, c: Constants):
+    head_commit_checksum = commit_checksum
+    old_commits = []
+    while commit_checksum != "" and commit_checksum not in new_checksums:
+        old_commits.append(commit_checksum)
+        commit_checksum = get_commit_parent_commit(get_commit_content(commit_checksum, c))
+
+    for old_commit_checksum in reversed(old_commits):  # parents first, their new checksums are in children
+        commit_content = get_commit_content(old_commit_checksum, c)
+        commit_content[0] = rewrite_tree(commit_content[0], new_checksums, c)
+        commit_content[1] = rewrite_workspace_state(commit_content[1], new_checksums, c)
+        commit_content[4] = new_checksums.get(commit_content[4], "")
+        new_checksums[old_commit_checksum] = write_object(
+            bytes("\n".join(commit_content), encoding="utf-8"), "commit", c)
+
+    return new_checksums.get(head_commit_checksum, "")
+
+
+def rewrite_tree(tree_checksum: str, new_checksums: dict, c: Constants):
+    if tree_checksum not in new_checksums:
+        tree_objects = []
+        for obj in get_object_content(tree_checksum, c).split("\n"):
+            object_type, path, checksum = obj.split()
+            if object_type == "blob":
+                checksum = rewrite_blob(checksum, new_checksums, c)
+            else:
+                checksum = rewrite_tree(checksum, new_checksums, c)
+            tree_objects.append(f"{object_type} {path} {checksum}")
+        new_checksums[tree_checksum] = write_object(bytes("\n".join(tree_objects), encoding="utf-8"), "tree", c)
+
+    return new_checksums[tree_checksum]
+
+
+def rewrite_workspace_state(workspace_state_checksum: str, new_checksums: dict, c: Constants):
+    if workspace_state_checksum == "":
+        return ""
+    if workspace_state_checksum not in new_checksums:
+        result = []
+        content = get_object_content(workspace_state_checksum, c)
+        if content != "":
+            for buffer in content.split("\n"):
+                path, checksum = buffer.split()
+                result.append(f"{path} {rewrite_blob(checksum, new_checksums, c)}")
+        new_checksums[workspace_state_checksum] = write_object(bytes("\n".join(result), encoding="utf-8"), "state", c)
+
+    return new_checksums[workspace_state_checksum]
+
+
+def rewrite_blob(blob_checksum: str, new_checksums: dict, c: Constants):
+    if blob_checksum not in new_checksums:
+        old_blob_path = get_object_path(blob_checksum, c)
+        new_checksum = get_blob_content_checksum(old_blob_path)
+        if object_exists(new_checksum, c):
+            Path.unlink(old_blob_path)
+        else:
+            move_into_objects(old_blob_path, new_checksum, c)  # compressed content stays the same
+        new_checksums[blob_checksum] = new_checksum
+
+    return new_checksums[blob_checksum]
+
+
+def rewrite_indexed_blob(blob_checksum: str, new_checksums: dict, c: Constants):
+    old_blob_path = c.mygit_index_dir_path / blob_checksum
+    if not old_blob_path.exists():
+        return rewrite_blob(blob_checksum, new_checksums, c)
+
+    new_checksum = get_blob_content_checksum(old_blob_path)
+    old_blob_path.replace(c.mygit_index_dir_path / new_checksum)
+    return new_checksum
+
+
+def get_blob_content_checksum(blob_path: Path):
+    with Path.open(blob_path, "rb") as blob:
+        return hash_object(decompress(blob.read()), "blob")
+
+
+def move_objects_into_fan_out_directories(c: Constants):
+    for object_path in list(c.mygit_objects_path.iterdir()):
+        if object_path.is_file() and len(object_path.name) == 40:
+            move_into_objects(object_path, object_path.name, c)
 
 
 # ===Log================================================================================================================
+def iterate_history(c: Constants):
+    visited_commits = set()
+    for branch_path in sorted(c.mygit_branches_path.iterdir()):
+        commit_checksum = get_last_commit_checksum(branch_path)
+        commits = []
+        while commit_checksum != "" and commit_checksum not in visited_commits:
+            visited_commits.add(commit_checksum)
+            commits.append((commit_checksum, get_commit_content(commit_checksum, c)))
+            commit_checksum = get_commit_parent_commit(commits[-1][1])
+        yield from reversed(commits)  # parents before their children
+
+
+def get_log_paths(files: list, c: Constants):
+    # relative paths that limit log, empty list if whole workspace is asked, None if a path is out of it
+    relative_paths = []
+    for file in files:
+        relative_path = os.path.relpath(c.workspace_path / file, c.workspace_path).replace(os.sep, "/")
+        if relative_path == ".":
+            return []
+        if relative_path == ".." or relative_path.startswith("../"):
+            logging.error(Fore.RED + f"{file} is outside of workspace")
+            return None
+        relative_paths.append(relative_path)
+    return relative_paths
+
+
+def get_path_keys_hashes(relative_paths: list):
+    return [get_path_hashes(relative_path) for relative_path in relative_paths]
+
+
+def is_commit_touching_paths(commit_checksum: str, commit_content: list, relative_paths: list, keys_hashes: list,
+                             filters, c: Constants):
+    if not filters.might_touch(commit_checksum, keys_hashes):
+        trace.count("changed_path_filter_skips")
+        return False
+
+    parent_commit_checksum = get_commit_parent_commit(commit_content)
+    parent_tree_checksum = "" if parent_commit_checksum == "" else get_tree_checksum(parent_commit_checksum, c)
+    for relative_path in relative_paths:
+        if get_path_checksum(commit_content[0], relative_path, c) != \
+                get_path_checksum(parent_tree_checksum, relative_path, c):
+            return True
+    trace.count("changed_path_filter_false_positives")
+    return False
+
+
+def get_path_checksum(tree_checksum: str, relative_path: str, c: Constants):
+    # only trees on the way to path are read
+    path = c.workspace_path
+    parts = relative_path.split("/")
+    for part in parts[:-1]:
+        path = path / part
+        tree_checksum = get_tree_content(tree_checksum, c).get("tree", {}).get(path, "")
+    path = path / parts[-1]
+    tree_content = get_tree_content(tree_checksum, c)
+    return tree_content.get("blob", {}).get(path, tree_content.get("tree", {}).get(path))
+
+
 def get_commit_content(commit_checksum: str, c: Constants):
-    return get_compressed_file_content(c.mygit_objects_path / commit_checksum).split("\n")
+    return list(get_parsed_object(commit_checksum, parse_commit, c))  # callers may change their copy
+
+
+def parse_commit(commit_content: str, c: Constants):
+    return tuple(commit_content.split("\n"))
 
 
 def get_commit_parent_commit(commit_content: list):
@@ -579,16 +1277,23 @@ def print_commit_content_oneline(commit_checksum: str, content: list):
     logging.info(Fore.YELLOW + commit_checksum + " " + Fore.RESET + content[2])
 
 
-def print_internal_log(c: Constants):
-    with Path.open(c.mygit_log_path, "r") as obj:
-        content = obj.read()
-    logging.info(content + "\n")
+def print_internal_log(count: int, since: str, c: Constants):
+    if count is None and since is None:
+        records = iterate_records(c.mygit_log_path)  # streamed, log is never read into memory whole
+    else:
+        try:
+            since_time = None if since is None else parse_since(since)
+        except ValueError:
+            logging.error(Fore.RED + f"couldn't parse time {since}, use ISO format or durations like 2h, 30m, 7d")
+            return
+        records = read_last_records(c.mygit_log_path, count, since_time)
+    for record in records:
+        sys.stdout.write(format_record(record) + "\n")  # logging would write log into itself again
 
 
 # ===Print==============================================================================================================
 def print_compressed_object(checksum: str, c: Constants):
-    object_path = c.mygit_objects_path / checksum
-    if not object_path.exists():
+    if not object_exists(checksum, c):
         logging.error(Fore.RED + "object doesn't exist")
         return
-    logging.info(get_compressed_file_content(object_path) + "\n")
+    logging.info(get_object_content(checksum, c) + "\n")
@@ -0,0 +1,88 @@
+import mmap
+from hashlib import blake2b
+from mygit.constants import Constants
+from pathlib import Path
+from struct import Struct
+
+FILTERS_SIGNATURE = b"MGBF"
+FILTERS_VERSION = 1
+HEADER = Struct(">4sI")  # signature, version
+RECORD = Struct(">20sBI")  # commit, flags, filter size in bytes; filter follows
+PATH_HASHES = Struct(">II")
+BITS_PER_PATH = 10  # with 7 hashes about 1% of untouched paths look touched
+HASH_COUNT = 7
+MIN_FILTER_SIZE = 8
+MAX_CHANGED_PATHS = 512  # bigger commits get no filter, every path may have been touched by them
+TOO_MANY_PATHS = 1
+
+
+def get_changed_path_keys(relative_paths: list):
+    # directories are keys too, so history of a directory can be filtered
+    keys = set()
+    for relative_path in relative_paths:
+        while relative_path != "" and relative_path not in keys:
+            keys.add(relative_path)
+            relative_path = relative_path.rpartition("/")[0]
+    return keys
+
+
+def get_path_hashes(key: str):
+    return PATH_HASHES.unpack(blake2b(bytes(key, encoding="utf-8"), digest_size=PATH_HASHES.size).digest())
+
+
+def get_bit_positions(path_hashes: tuple, bits_count: int):
+    first_hash, second_hash = path_hashes
+    return [(first_hash + i * second_hash) % bits_count for i in range(HASH_COUNT)]
+
+
+def create_filter(keys: set):
+    if len(keys) > MAX_CHANGED_PATHS:
+        return TOO_MANY_PATHS, b""
+
+    bits = bytearray(max(MIN_FILTER_SIZE, (len(keys) * BITS_PER_PATH + 7) // 8))
+    for key in keys:
+        for position in get_bit_positions(get_path_hashes(key), len(bits) * 8):
+            bits[position // 8] |= 1 << position % 8
+    return 0, bytes(bits)
+
+
+def append_changed_path_filter(commit_checksum: str, relative_paths: list, c: Constants):
+    flags, bits = create_filter(get_changed_path_keys(relative_paths))
+    with Path.open(c.changed_path_filters_path, "ab") as filters:
+        if filters.tell() == 0:
+            filters.write(HEADER.pack(FILTERS_SIGNATURE, FILTERS_VERSION))
+        filters.write(RECORD.pack(bytes.fromhex(commit_checksum), flags, len(bits)) + bits)
+
+
+class ChangedPathFilters:
+    def __init__(self, c: Constants):
+        self.data = b""
+        self.records = {}  # commit checksum -> (flags, filter offset, filter size)
+        if c.changed_path_filters_path.exists() and c.changed_path_filters_path.stat().st_size > HEADER.size:
+            with Path.open(c.changed_path_filters_path, "rb") as filters:
+                self.data = mmap.mmap(filters.fileno(), 0, access=mmap.ACCESS_READ)
+            if HEADER.unpack_from(self.data) == (FILTERS_SIGNATURE, FILTERS_VERSION):
+                self.read_records()
+
+    def read_records(self):
+        offset = HEADER.size
+        while offset + RECORD.size <= len(self.data):
+            binary_checksum, flags, size = RECORD.unpack_from(self.data, offset)
+            offset += RECORD.size
+            if offset + size > len(self.data):
+                break  # torn append, commit is treated as one without filter
+            self.records[binary_checksum.hex()] = (flags, offset, size)
+            offset += size
+
+    def might_touch(self, commit_checksum: str, keys_hashes: list):
+        # False only if commit certainly didn't change any of paths, commits without filter may touch anything
+        record = self.records.get(commit_checksum)
+        if record is None or record[0] & TOO_MANY_PATHS:
+            return True
+
+        _, offset, size = record
+        for path_hashes in keys_hashes:
+            if all(self.data[offset + position // 8] & (1 << position % 8)
+                   for position in get_bit_positions(path_hashes, size * 8)):
+                return True
+        return False
@@ -0,0 +1,36 @@
+import json
+import os
+import sys
+from mygit import trace
+from mygit.constants import Constants
+from mygit.ipc import send_request
+from pathlib import Path
+
+COMMAND_TIMEOUT = 600.0
+
+
+def start():
+    if not forward_to_server(Path.cwd(), sys.argv[1:]):
+        from mygit.main import main  # commands and backend are imported only when they run in this process
+        main(Path.cwd(), sys.argv[1:], False)
+
+
+def forward_to_server(workspace_path: Path, sys_args: list):
+    socket_path = Constants(workspace_path).server_socket_path
+    if os.environ.get("MYGIT_NO_SERVER") or trace.is_requested(sys_args) or not socket_path.exists():
+        return False
+    request = {"args": sys_args, "colors": [sys.stdout.isatty(), sys.stderr.isatty()]}  # colorama strips them locally
+    response = send_request(bytes(json.dumps(request), encoding="utf-8"), socket_path, COMMAND_TIMEOUT)
+    if response is None:
+        return False
+    try:
+        response = json.loads(response)
+    except ValueError:
+        return False
+    if response["status"] != "done":
+        return False  # command has to run in this process
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    if response["exit_code"] is not None:
+        sys.exit(response["exit_code"])
+    return True
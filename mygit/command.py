@@ -17,9 +17,18 @@ class Command:
             description=command_description
         )
         self._add_arguments(command_parser)
+        self.command_parser = command_parser
 
     def _add_arguments(self, command_parser: argparse.ArgumentParser):
         pass
 
+    def check_arguments(self, namespace: argparse.Namespace):
+        # called right after parsing, rules argparse can't express end with self.command_parser.error
+        pass
+
     def work(self, namespace: argparse.Namespace, constants: Constants, state: State):
         pass
+
+    def get_touched_paths(self, namespace: argparse.Namespace, constants: Constants):
+        # workspace paths the command reads from index, None if it needs whole index
+        return None
@@ -0,0 +1,58 @@
+import argparse
+import logging
+from colorama import Fore
+from textwrap import dedent
+from mygit.state import State
+from mygit.constants import Constants
+from mygit.command import Command
+from mygit.fsmonitor import run_fsmonitor, query_fsmonitor, stop_fsmonitor
+from mygit.ipc import spawn_daemon
+
+
+class FSMonitor(Command):
+    def __init__(self, subparsers: argparse._SubParsersAction, commands_dict: dict):
+        command_description = dedent(
+            '''
+            Watch workspace with inotify, so status and index -a only look at changed paths
+
+            Usage examples:
+              mygit fsmonitor            run filesystem monitor in foreground until it's stopped
+              mygit fsmonitor --start    run filesystem monitor in background
+              mygit fsmonitor --stop     stop running filesystem monitor
+              mygit fsmonitor --status   show whether filesystem monitor is running
+                                         Note: without monitor, or when it has lost track of changes,
+                                               commands walk the whole workspace as usual
+            ''')
+
+        super().__init__("fsmonitor", command_description, subparsers, commands_dict)
+
+    def _add_arguments(self, command_parser: argparse.ArgumentParser):
+        fsmonitor_group = command_parser.add_mutually_exclusive_group()
+        fsmonitor_group.add_argument('--start', action='store_true', default=False,
+                                     help="run filesystem monitor in background")
+        fsmonitor_group.add_argument('--stop', action='store_true', default=False,
+                                     help="stop filesystem monitor")
+        fsmonitor_group.add_argument('--status', action='store_true', default=False,
+                                     help="show whether filesystem monitor is running")
+
+    def work(self, namespace: argparse.Namespace, constants: Constants, state: State):
+        is_running = query_fsmonitor("", constants) is not None
+        if namespace.status:
+            if is_running:
+                logging.info(Fore.GREEN + "filesystem monitor is running")
+            else:
+                logging.warning(Fore.YELLOW + "filesystem monitor isn't running")
+        elif namespace.stop:
+            if stop_fsmonitor(constants):
+                logging.info(Fore.GREEN + "filesystem monitor is stopped")
+            else:
+                logging.warning(Fore.YELLOW + "filesystem monitor isn't running")
+        elif is_running:
+            logging.warning(Fore.YELLOW + "filesystem monitor is already running")
+        elif namespace.start:
+            if spawn_daemon("fsmonitor", constants.workspace_path, lambda: query_fsmonitor("", constants) is not None):
+                logging.info(Fore.GREEN + "filesystem monitor is started")
+            else:
+                logging.error(Fore.RED + "filesystem monitor didn't start, see log for details")
+        else:
+            run_fsmonitor(constants, state.ignore_rules)
@@ -0,0 +1,39 @@
+import argparse
+from textwrap import dedent
+from mygit.state import State
+from mygit.constants import Constants
+from mygit.command import Command
+from mygit.backend import collect_garbage
+
+
+class Gc(Command):
+    def __init__(self, subparsers: argparse._SubParsersAction, commands_dict: dict):
+        command_description = dedent(
+            '''
+            Remove objects that can't be reached from branches or index
+
+            Usage examples:
+              mygit gc                remove unreachable objects older than two weeks,
+                                      packs holding them are rewritten without them
+                                      Note: index blobs left by interrupted commands are removed too
+
+              mygit gc --grace 1d     remove unreachable objects older than one day (s, m, h, d, w or ISO time)
+
+              mygit gc --now          remove every unreachable object, don't run it next to other commands
+
+              mygit gc -n             only report what would be removed
+            ''')
+
+        super().__init__("gc", command_description, subparsers, commands_dict)
+
+    def _add_arguments(self, command_parser: argparse.ArgumentParser):
+        grace_group = command_parser.add_mutually_exclusive_group()
+        grace_group.add_argument('--grace', default="2w", metavar='DURATION',
+                                 help="keep unreachable objects younger than DURATION (default: 2w)")
+        grace_group.add_argument('--now', action='store_true', default=False,
+                                 help="remove unreachable objects of any age")
+        command_parser.add_argument('-n', '--dry-run', action='store_true', default=False,
+                                    help="report what would be removed without removing it")
+
+    def work(self, namespace: argparse.Namespace, constants: Constants, state: State):
+        collect_garbage("0s" if namespace.now else namespace.grace, namespace.dry_run, constants, state)
@@ -5,7 +5,7 @@ from textwrap import dedent
 from mygit.state import State
 from mygit.constants import Constants
 from mygit.command import Command
-from mygit.backend import index_all_changes, index_input_files
+from mygit.backend import index_all_changes, index_input_files, get_relative_file_paths
 
 
 class Index(Command):
@@ -33,6 +33,11 @@ class Index(Command):
         command_parser.add_argument("files", nargs="*",
                                     help="files or directories to index")
 
+    def get_touched_paths(self, namespace: argparse.Namespace, constants: Constants):
+        if namespace.all or len(namespace.files) == 0:
+            return None
+        return get_relative_file_paths(namespace.files, constants)
+
     def work(self, namespace: argparse.Namespace, constants: Constants, state: State):
         if namespace.all:
             index_all_changes(constants, state)
@@ -2,10 +2,11 @@ import argparse
 import logging
 from colorama import Fore
 from mygit.state import State
-from mygit.constants import Constants
+from mygit.constants import Constants, REPOSITORY_FORMAT
 from mygit.command import Command
-from mygit.backend import index_object, make_commit, get_compressed_file_content,\
-    get_last_commit_index_content, has_collisions_with_service_files
+from mygit.commit_graph import write_empty_commit_graph
+from mygit.backend import index_object, make_commit, get_last_commit_index_content, \
+    has_collisions_with_service_files
 from pathlib import Path
 
 
@@ -21,25 +22,26 @@ class Init(Command):
 
         Path.mkdir(constants.mygit_path)
         Path.mkdir(constants.mygit_objects_path)
+        Path.mkdir(constants.packs_path)
         Path.mkdir(constants.mygit_refs_path)
         Path.mkdir(constants.mygit_branches_path)
         Path.mkdir(constants.mygit_index_dir_path)
         default_branch_name = "master"
         with Path.open(constants.mygit_head_path, "w") as head:
             head.write(default_branch_name)
+        with Path.open(constants.format_path, "w") as repository_format:
+            repository_format.write(str(REPOSITORY_FORMAT))
 
         Path.open(constants.mygit_branches_path / default_branch_name, 'w').close()
         Path.open(constants.mygit_index_path, "w").close()
         Path.open(constants.mygit_log_path, "w").close()
+        write_empty_commit_graph(constants)
 
         with Path.open(constants.mygit_ignore_path, "w") as ignore:
             ignore.write(".mygit")
 
         index_object(constants.mygit_ignore_path, constants, state)
-        state.load_cache(
-            constants,
-            get_compressed_file_content(constants.mygit_index_path),
-            get_last_commit_index_content(constants))
+        state.load_cache(constants, get_last_commit_index_content(constants))
 
         make_commit("init", constants, state)
         logging.info(Fore.GREEN + "new repository is created")
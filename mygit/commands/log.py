@@ -5,7 +5,9 @@ from mygit.constants import Constants
 from mygit.command import Command
 from mygit.backend import print_commit_content, print_commit_content_oneline, \
     get_last_commit_checksum, get_current_branch_path, \
-    get_commit_content, get_commit_parent_commit, print_internal_log
+    get_commit_content, get_commit_parent_commit, print_internal_log, \
+    get_log_paths, get_path_keys_hashes, is_commit_touching_paths
+from mygit.bloom import ChangedPathFilters
 
 
 class Log(Command):
@@ -20,6 +22,10 @@ class Log(Command):
             Usage examples:
               mygit log [-o]    key -o or --oneline changes output style to "$checksum $message" format
               mygit log [-u]    key -u or --usage shows internal log
+              mygit log -- path1 path2 ...      show only commits that changed specified files or directories
+              mygit log -u --tail 20            show last 20 records of internal log
+              mygit log -u --since 2h           show records of last two hours (s, m, h, d, w)
+              mygit log -u --since 2026-10-01   show records since ISO date or time
             ''')
 
         super().__init__("log", command_description, subparsers, commands_dict)
@@ -34,13 +40,31 @@ class Log(Command):
                                default=False,
                                help='show internal log')
 
+        command_parser.add_argument('paths', nargs='*', metavar='path',
+                                    help='show only commits that changed these files or directories')
+        command_parser.add_argument('--tail', type=int, metavar='N',
+                                    help='show only last N records of internal log')
+        command_parser.add_argument('--since', metavar='TIME',
+                                    help='show internal log records since ISO time or duration like 2h')
+
+    def check_arguments(self, namespace: argparse.Namespace):
+        if not namespace.usage and (namespace.tail is not None or namespace.since is not None):
+            self.command_parser.error("--tail and --since filter internal log, use them with -u")
+
     def work(self, namespace: argparse.Namespace, constants: Constants, state: State):
         if namespace.usage:
-            print_internal_log(constants)
+            print_internal_log(namespace.tail, namespace.since, constants)
         else:
+            relative_paths = get_log_paths(namespace.paths, constants)
+            if relative_paths is None:
+                return
+            keys_hashes = get_path_keys_hashes(relative_paths)
+            filters = ChangedPathFilters(constants) if len(relative_paths) > 0 else None
             print_function = print_commit_content_oneline if namespace.oneline else print_commit_content
             commit_checksum = get_last_commit_checksum(get_current_branch_path(constants))
             while commit_checksum != "":
                 commit_content = get_commit_content(commit_checksum, constants)
-                print_function(commit_checksum, commit_content)
+                if filters is None or is_commit_touching_paths(commit_checksum, commit_content, relative_paths,
+                                                               keys_hashes, filters, constants):
+                    print_function(commit_checksum, commit_content)
                 commit_checksum = get_commit_parent_commit(commit_content)
@@ -0,0 +1,31 @@
+import argparse
+from textwrap import dedent
+from mygit.state import State
+from mygit.constants import Constants
+from mygit.command import Command
+from mygit.backend import pack_objects
+
+
+class Pack(Command):
+    def __init__(self, subparsers: argparse._SubParsersAction, commands_dict: dict):
+        command_description = dedent(
+            '''
+            Consolidate loose objects into a single pack file with sorted index
+
+            Usage examples:
+              mygit pack        move every loose object into new pack in .mygit/objects/pack
+                                Note: packed objects are read through memory-mapped pack index
+
+              mygit pack -a     repack loose objects and all existing packs into one pack
+                                Note: new versions of files are stored as deltas against their
+                                      previous versions, so repack everything to get most of it
+            ''')
+
+        super().__init__("pack", command_description, subparsers, commands_dict)
+
+    def _add_arguments(self, command_parser: argparse.ArgumentParser):
+        command_parser.add_argument('-a', '--all', action='store_true', default=False,
+                                    help="repack existing packs too")
+
+    def work(self, namespace: argparse.Namespace, constants: Constants, state: State):
+        pack_objects(namespace.all, constants)
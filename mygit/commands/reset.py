@@ -6,8 +6,7 @@ from mygit.state import State
 from mygit.constants import Constants
 from mygit.command import Command
 from mygit.backend import reset_to_commit_state, delete_indexed_changes, \
-    reset_all_indexed_files_to_commit_state, clean_index, clear_workspace, \
-    expand_tree, get_current_branch_path, get_last_tree_checksum
+    reset_all_indexed_files_to_commit_state, clean_index, reset_workspace_to_commit_state, get_relative_file_paths
 
 
 class Reset(Command):
@@ -41,6 +40,11 @@ class Reset(Command):
         command_parser.add_argument("-i", "--index", nargs="*")
         command_parser.add_argument('--hard', action='store_true', default=False)
 
+    def get_touched_paths(self, namespace: argparse.Namespace, constants: Constants):
+        if namespace.index is None or len(namespace.index) == 0:
+            return None
+        return get_relative_file_paths(namespace.index, constants)
+
     def work(self, namespace: argparse.Namespace, constants: Constants, state: State):
         if namespace.index is not None:
             if len(namespace.index) > 0:
@@ -53,9 +57,8 @@ class Reset(Command):
                 if namespace.hard:
                     reset_all_indexed_files_to_commit_state(constants, state)
                     logging.info(Fore.GREEN + "all indexed files were restored to their last recorded state")
-                clean_index(constants)
+                clean_index(constants, state)
                 logging.info(Fore.GREEN + "index was cleaned")
         else:
-            clear_workspace(constants, state)
-            expand_tree(get_last_tree_checksum(get_current_branch_path(constants), constants), constants)
-            logging.info(Fore.GREEN + "workspace was reset to last commit state")
+            if reset_workspace_to_commit_state(constants, state):
+                logging.info(Fore.GREEN + "workspace was reset to last commit state")
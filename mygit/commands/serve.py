@@ -0,0 +1,58 @@
+import argparse
+import logging
+from colorama import Fore
+from textwrap import dedent
+from mygit.state import State
+from mygit.constants import Constants
+from mygit.command import Command
+from mygit.ipc import spawn_daemon
+from mygit.server import run_server, is_server_running, stop_server
+
+
+class Serve(Command):
+    def __init__(self, subparsers: argparse._SubParsersAction, commands_dict: dict):
+        command_description = dedent(
+            '''
+            Keep repository state in memory and run commands sent by mygit clients
+
+            Usage examples:
+              mygit serve            run server in foreground until it's stopped
+              mygit serve --start    run server in background
+              mygit serve --stop     stop running server
+              mygit serve --status   show whether server is running
+                                     Note: while server runs, every mygit command in this workspace
+                                           is forwarded to it, set MYGIT_NO_SERVER=1 to run them locally
+            ''')
+
+        super().__init__("serve", command_description, subparsers, commands_dict)
+
+    def _add_arguments(self, command_parser: argparse.ArgumentParser):
+        serve_group = command_parser.add_mutually_exclusive_group()
+        serve_group.add_argument('--start', action='store_true', default=False,
+                                 help="run server in background")
+        serve_group.add_argument('--stop', action='store_true', default=False,
+                                 help="stop server")
+        serve_group.add_argument('--status', action='store_true', default=False,
+                                 help="show whether server is running")
+
+    def work(self, namespace: argparse.Namespace, constants: Constants, state: State):
+        is_running = is_server_running(constants)
+        if namespace.status:
+            if is_running:
+                logging.info(Fore.GREEN + "server is running")
+            else:
+                logging.warning(Fore.YELLOW + "server isn't running")
+        elif namespace.stop:
+            if stop_server(constants):
+                logging.info(Fore.GREEN + "server is stopped")
+            else:
+                logging.warning(Fore.YELLOW + "server isn't running")
+        elif is_running:
+            logging.warning(Fore.YELLOW + "server is already running")
+        elif namespace.start:
+            if spawn_daemon("serve", constants.workspace_path, lambda: is_server_running(constants)):
+                logging.info(Fore.GREEN + "server is started")
+            else:
+                logging.error(Fore.RED + "server didn't start, see log for details")
+        else:
+            run_server(constants)
@@ -0,0 +1,23 @@
+import argparse
+from textwrap import dedent
+from mygit.state import State
+from mygit.constants import Constants
+from mygit.command import Command
+from mygit.backend import upgrade_repository
+
+
+class Upgrade(Command):
+    def __init__(self, subparsers: argparse._SubParsersAction, commands_dict: dict):
+        command_description = dedent(
+            '''
+            Rewrite repository created by older mygit version in current repository format
+
+            Usage examples:
+              mygit upgrade     rewrite objects, branches and index so they use current checksums
+                                Note: objects that can't be reached from any branch are left as they are
+            ''')
+
+        super().__init__("upgrade", command_description, subparsers, commands_dict)
+
+    def work(self, namespace: argparse.Namespace, constants: Constants, state: State):
+        upgrade_repository(constants)
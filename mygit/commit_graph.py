@@ -0,0 +1,140 @@
+import mmap
+import os
+from mygit.constants import Constants
+from pathlib import Path
+from struct import Struct
+
+GRAPH_SIGNATURE = b"MGCG"
+GRAPH_VERSION = 2  # version 1 has no lookup table
+HEADER = Struct(">4sI")  # signature, version
+LOOKUP_HEADER = Struct(">I")  # records covered by lookup table, later ones were appended after it was written
+FAN_OUT = Struct(">256I")  # lookup entries whose commit starts with byte <= i
+LOOKUP_ENTRY = Struct(">20sI")  # commit, position, sorted by commit
+RECORD = Struct(">20sI20sQI")  # commit, parent position, tree, timestamp, generation
+NO_PARENT = 0xFFFFFFFF
+MAX_UNINDEXED_RECORDS = 1024  # appended records are searched one by one, lookup table is rewritten past this
+UNINDEXED_RECORDS_SHARE = 64  # and past 1/64 of indexed records, so big graphs aren't rewritten too often
+
+
+class CommitGraph:
+    def __init__(self, c: Constants):
+        self.data = b""
+        self.indexed = 0
+        self.records_offset = HEADER.size
+        if c.commit_graph_path.exists() and c.commit_graph_path.stat().st_size > HEADER.size:
+            with Path.open(c.commit_graph_path, "rb") as graph:
+                self.data = mmap.mmap(graph.fileno(), 0, access=mmap.ACCESS_READ)
+            if HEADER.unpack_from(self.data, 0)[1] > 1:
+                self.indexed = LOOKUP_HEADER.unpack_from(self.data, HEADER.size)[0]
+                self.fan_out = FAN_OUT.unpack_from(self.data, HEADER.size + LOOKUP_HEADER.size)
+                self.lookup_offset = HEADER.size + LOOKUP_HEADER.size + FAN_OUT.size
+                self.records_offset = self.lookup_offset + self.indexed * LOOKUP_ENTRY.size
+        self.count = max(0, (len(self.data) - self.records_offset) // RECORD.size)
+        self.unindexed_positions = None  # binary commit checksum -> position, for records after lookup table
+
+    def find_position(self, commit_checksum: str):
+        binary_checksum = bytes.fromhex(commit_checksum)
+        if self.indexed > 0:
+            low = 0 if binary_checksum[0] == 0 else self.fan_out[binary_checksum[0] - 1]
+            high = self.fan_out[binary_checksum[0]]
+            while low < high:
+                middle = (low + high) // 2
+                middle_checksum, position = LOOKUP_ENTRY.unpack_from(
+                    self.data, self.lookup_offset + middle * LOOKUP_ENTRY.size)
+                if middle_checksum == binary_checksum:
+                    return position
+                if middle_checksum < binary_checksum:
+                    low = middle + 1
+                else:
+                    high = middle
+
+        if self.unindexed_positions is None:
+            self.unindexed_positions = {self.get_record(position)[0]: position
+                                        for position in range(self.indexed, self.count)}
+        return self.unindexed_positions.get(binary_checksum)
+
+    def get_record(self, position: int):
+        return RECORD.unpack_from(self.data, self.records_offset + position * RECORD.size)
+
+    def get_parent_position(self, position: int):
+        return self.get_record(position)[1]
+
+    def get_generation(self, position: int):
+        return self.get_record(position)[4]
+
+    def get_raw_records(self):
+        return [bytes(self.data[offset:offset + RECORD.size]) for offset in
+                range(self.records_offset, self.records_offset + self.count * RECORD.size, RECORD.size)]
+
+
+def write_graph_file(records: list, c: Constants):
+    lookup = sorted((record[:20], position) for position, record in enumerate(records))
+    fan_out = [0] * 256
+    for binary_checksum, _ in lookup:
+        fan_out[binary_checksum[0]] += 1
+    for i in range(1, 256):
+        fan_out[i] += fan_out[i - 1]
+
+    temp_path = c.commit_graph_path.with_name("tmp-" + c.commit_graph_path.name)
+    with Path.open(temp_path, "wb") as graph:
+        graph.write(HEADER.pack(GRAPH_SIGNATURE, GRAPH_VERSION))
+        graph.write(LOOKUP_HEADER.pack(len(records)))
+        graph.write(FAN_OUT.pack(*fan_out))
+        graph.write(b"".join(LOOKUP_ENTRY.pack(*entry) for entry in lookup))
+        graph.write(b"".join(records))
+    os.replace(temp_path, c.commit_graph_path)  # readers keep their mmap of the old file
+
+
+def write_empty_commit_graph(c: Constants):
+    write_graph_file([], c)
+
+
+def write_commit_graph(commits: list, c: Constants):
+    positions = {}
+    generations = []
+    records = []
+    for commit_checksum, parent_commit_checksum, tree_checksum, timestamp in commits:  # parents go first
+        parent_position = positions.get(parent_commit_checksum, NO_PARENT)
+        generations.append(1 if parent_position == NO_PARENT else generations[parent_position] + 1)
+        positions[commit_checksum] = len(generations) - 1
+        records.append(RECORD.pack(bytes.fromhex(commit_checksum), parent_position,
+                                   bytes.fromhex(tree_checksum), timestamp, generations[-1]))
+    write_graph_file(records, c)
+
+
+def append_commit(commit_checksum: str, parent_commit_checksum: str, tree_checksum: str, timestamp: int,
+                  c: Constants):
+    if not c.commit_graph_path.exists():  # readers will walk objects until graph is rebuilt
+        return
+    graph = CommitGraph(c)
+    if graph.find_position(commit_checksum) is not None:
+        return
+
+    parent_position = NO_PARENT
+    generation = 1
+    if parent_commit_checksum != "":
+        parent_position = graph.find_position(parent_commit_checksum)
+        if parent_position is None:  # graph doesn't cover parent's history, readers will walk objects
+            return
+        generation = graph.get_generation(parent_position) + 1
+
+    record = RECORD.pack(bytes.fromhex(commit_checksum), parent_position, bytes.fromhex(tree_checksum), timestamp,
+                         generation)
+    if graph.count - graph.indexed >= max(MAX_UNINDEXED_RECORDS, graph.indexed // UNINDEXED_RECORDS_SHARE):
+        write_graph_file(graph.get_raw_records() + [record], c)
+        return
+    with Path.open(c.commit_graph_path, "ab") as graph_file:
+        graph_file.write(record)
+
+
+def is_ancestor(ancestor_checksum: str, descendant_checksum: str, c: Constants):
+    graph = CommitGraph(c)
+    ancestor_position = graph.find_position(ancestor_checksum)
+    position = graph.find_position(descendant_checksum)
+    if ancestor_position is None or position is None:
+        return None  # unknown to graph
+
+    ancestor_generation = graph.get_generation(ancestor_position)
+    while position != NO_PARENT and graph.get_generation(position) > ancestor_generation:
+        position = graph.get_parent_position(position)
+    return position == ancestor_position
@@ -1,5 +1,7 @@
 from pathlib import Path
 
+REPOSITORY_FORMAT = 6
+
 
 class Constants:
     def __init__(self, workspace_path: Path):
@@ -13,3 +15,11 @@ class Constants:
         self.mygit_objects_path = self.mygit_path / "objects"
         self.mygit_refs_path = self.mygit_path / "refs"
         self.mygit_branches_path = self.mygit_refs_path / "branches"
+        self.fsmonitor_socket_path = self.mygit_path / "fsmonitor.sock"  # exists only while monitor runs
+        self.server_socket_path = self.mygit_path / "server.sock"  # exists only while server runs
+        self.index_journal_path = self.mygit_index_dir_path / "journal"  # exists only until it's folded into index
+        self.head_manifest_path = self.mygit_path / "head-manifest"  # paths of head commit, rebuilt from its tree
+        self.format_path = self.mygit_path / "format"  # repositories of format 1 have no format file
+        self.packs_path = self.mygit_objects_path / "pack"  # created by init or upgrade
+        self.commit_graph_path = self.mygit_objects_path / "commit-graph"  # can be rebuilt from commits
+        self.changed_path_filters_path = self.mygit_objects_path / "changed-paths"  # older commits have no filters
@@ -0,0 +1,96 @@
+BLOCK_SIZE = 16
+COPY = 0
+INSERT = 1
+
+
+def write_varint(result: bytearray, value: int):
+    while value >= 0x80:
+        result.append(value & 0x7f | 0x80)
+        value >>= 7
+    result.append(value)
+
+
+def read_varint(data: bytes, position: int):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if byte < 0x80:
+            return value, position
+
+
+def get_match_length(base: bytes, base_position: int, target: bytes, target_position: int):
+    length = 0
+    step = 4096
+    while step > 0:  # compare big slices first, halve step on mismatch
+        if base_position + length + step <= len(base) and target_position + length + step <= len(target) \
+                and base[base_position + length:base_position + length + step] == \
+                target[target_position + length:target_position + length + step]:
+            length += step
+        else:
+            step //= 2
+    return length
+
+
+def create_delta(base: bytes, target: bytes):
+    blocks = {}
+    for position in range(0, len(base) - BLOCK_SIZE + 1, BLOCK_SIZE):
+        blocks.setdefault(base[position:position + BLOCK_SIZE], position)
+
+    result = bytearray()
+    write_varint(result, len(base))
+    write_varint(result, len(target))
+    insert_start = 0
+    position = 0
+    while position <= len(target) - BLOCK_SIZE:
+        base_position = blocks.get(target[position:position + BLOCK_SIZE])
+        if base_position is None:
+            position += 1
+            continue
+
+        while position > insert_start and base_position > 0 and target[position - 1] == base[base_position - 1]:
+            position -= 1
+            base_position -= 1
+        length = get_match_length(base, base_position, target, position)
+        add_insert(result, target[insert_start:position])
+        result.append(COPY)
+        write_varint(result, base_position)
+        write_varint(result, length)
+        position += length
+        insert_start = position
+
+    add_insert(result, target[insert_start:])
+    return bytes(result)
+
+
+def add_insert(result: bytearray, data: bytes):
+    if len(data) > 0:
+        result.append(INSERT)
+        write_varint(result, len(data))
+        result.extend(data)
+
+
+def apply_delta(base: bytes, delta: bytes):
+    base_size, position = read_varint(delta, 0)
+    target_size, position = read_varint(delta, position)
+    if base_size != len(base):
+        raise ValueError("delta was created for another base")
+
+    result = bytearray()
+    while position < len(delta):
+        operation = delta[position]
+        if operation == COPY:
+            offset, position = read_varint(delta, position + 1)
+            length, position = read_varint(delta, position)
+            result.extend(base[offset:offset + length])
+        else:
+            length, position = read_varint(delta, position + 1)
+            result.extend(delta[position:position + length])
+            position += length
+
+    if len(result) != target_size:
+        raise ValueError("delta produced object of unexpected size")
+    return bytes(result)
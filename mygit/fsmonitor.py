@@ -0,0 +1,172 @@
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+from colorama import Fore
+from mygit.constants import Constants
+from mygit.ignore import IgnoreRules
+from mygit.ipc import REQUEST_TIMEOUT, receive_message, send_request, create_server, wait_for_socket_removal
+from mygit.walk import walk, get_relative_prefix
+from pathlib import Path
+from struct import Struct
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+DIRECTORY_ENTRY_CHANGES = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT = Struct("iIII")  # watch descriptor, mask, cookie, name length
+
+STOP_REQUEST = "stop"
+FULL_WALK = "full"
+CHANGES = "changes"
+
+
+class FileSystemMonitor:
+    def __init__(self, c: Constants, ignore_rules: IgnoreRules):
+        import ctypes.util  # commands only query monitor, bindings are needed by monitor itself
+        from uuid import uuid4
+        self.c = c
+        self.ignore_rules = ignore_rules
+        self.monitor_id = uuid4().hex  # tokens of previous monitors can't be trusted
+        self.sequence = 0
+        self.first_valid_sequence = 0  # older tokens missed overflowed events or were issued for other ignore rules
+        self.journal = {}  # relative path -> sequence of its last change
+        self.watches = {}  # watch descriptor -> relative prefix of watched directory
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watch_tree(c.workspace_path)
+
+    def watch_tree(self, dir_path: Path):
+        for directory_path, _, _, _ in walk(dir_path, self.ignore_rules):
+            watch_descriptor = self.libc.inotify_add_watch(self.fd, bytes(directory_path), WATCH_MASK)
+            if watch_descriptor >= 0:  # directory could be removed already, its parent reports that
+                self.watches[watch_descriptor] = get_relative_prefix(directory_path, self.c.workspace_path)
+
+    def read_events(self):
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(data):
+                watch_descriptor, mask, _, name_length = EVENT.unpack_from(data, offset)
+                name = os.fsdecode(data[offset + EVENT.size:offset + EVENT.size + name_length].rstrip(b"\0"))
+                offset += EVENT.size + name_length
+                self.handle_event(watch_descriptor, mask, name)
+
+    def handle_event(self, watch_descriptor: int, mask: int, name: str):
+        self.sequence += 1
+        if mask & IN_Q_OVERFLOW:
+            self.invalidate_tokens()
+        elif mask & IN_IGNORED:
+            self.watches.pop(watch_descriptor, None)
+        elif watch_descriptor in self.watches and name != "":
+            if mask & IN_ISDIR and not mask & DIRECTORY_ENTRY_CHANGES:
+                return  # directory's own attributes don't matter, its files report themselves
+            relative_path = self.watches[watch_descriptor] + name
+            self.journal[relative_path] = self.sequence
+            path = self.c.workspace_path / relative_path
+            if path == self.c.mygit_ignore_path:
+                with Path.open(path, "r") as ignored:
+                    self.ignore_rules = IgnoreRules(self.c.workspace_path, ignored.readlines())
+                self.watch_tree(self.c.workspace_path)
+                self.invalidate_tokens()
+            elif mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and \
+                    not self.ignore_rules.matches_relative(relative_path, name, True):
+                self.watch_tree(path)  # its content is walked by clients, it could appear before the watch
+
+    def invalidate_tokens(self):
+        self.first_valid_sequence = self.sequence
+        self.journal.clear()
+
+    def answer(self, token: str):
+        self.read_events()  # kernel queues events before changing syscalls return, so nothing is missed
+        new_token = f"{self.monitor_id} {self.sequence}"
+        parts = token.split(" ")
+        if len(parts) != 2 or parts[0] != self.monitor_id or int(parts[1]) < self.first_valid_sequence:
+            return new_token, None
+        since = int(parts[1])
+        return new_token, sorted(path for path, sequence in self.journal.items() if sequence > since)
+
+    def close(self):
+        os.close(self.fd)
+
+
+def run_fsmonitor(c: Constants, ignore_rules: IgnoreRules):
+    try:
+        monitor = FileSystemMonitor(c, ignore_rules)
+    except OSError as e:
+        logging.error(Fore.RED + f"couldn't start filesystem monitor: {e}")
+        return
+    try:
+        server = create_server(c.fsmonitor_socket_path)
+    except OSError as e:
+        logging.error(Fore.RED + f"couldn't start filesystem monitor: {e}")
+        monitor.close()
+        return
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    logging.info(Fore.GREEN + f"filesystem monitor is watching {len(monitor.watches)} directories")
+    try:
+        while True:
+            readable, _, _ = select.select([monitor.fd, server], [], [])
+            if monitor.fd in readable:
+                monitor.read_events()
+            if server in readable and not serve_query(server, monitor):
+                break
+    finally:
+        server.close()
+        if c.fsmonitor_socket_path.exists():
+            Path.unlink(c.fsmonitor_socket_path)
+        monitor.close()
+    logging.info(Fore.GREEN + "filesystem monitor is stopped")
+
+
+def serve_query(server: socket.socket, monitor: FileSystemMonitor):
+    connection, _ = server.accept()
+    with connection:
+        connection.settimeout(REQUEST_TIMEOUT)
+        try:
+            request = os.fsdecode(receive_message(connection, b"\n")).rstrip("\n")
+            if request == STOP_REQUEST:
+                connection.sendall(bytes(STOP_REQUEST, encoding="utf-8"))
+                return False
+            new_token, changed_paths = monitor.answer(request)
+            fields = [new_token, FULL_WALK] if changed_paths is None else [new_token, CHANGES] + changed_paths
+            connection.sendall(os.fsencode("\0".join(fields)))
+        except (OSError, ValueError):
+            pass  # client has gone, it will walk workspace itself
+    return True
+
+
+def query_fsmonitor(token: str, c: Constants):
+    response = send_request(os.fsencode(token), c.fsmonitor_socket_path)
+    if response is None:
+        return None  # monitor isn't running
+    fields = os.fsdecode(response).split("\0")
+    if len(fields) < 2:
+        return None
+    if fields[1] == FULL_WALK:
+        return fields[0], None
+    return fields[0], [c.workspace_path / path for path in fields[2:]]
+
+
+def stop_fsmonitor(c: Constants):
+    stop_request = bytes(STOP_REQUEST, encoding="utf-8")
+    if send_request(stop_request, c.fsmonitor_socket_path) != stop_request:
+        return False
+    wait_for_socket_removal(c.fsmonitor_socket_path)
+    return True
@@ -0,0 +1,106 @@
+import os
+import sys
+from hashlib import sha1
+from pathlib import Path
+from tempfile import mkstemp
+from threading import Lock
+from zlib import compressobj
+
+CHUNK_SIZE = 1024 * 1024
+PARALLEL_MIN_FILES = 64
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+HASH_ATTEMPTS = 3  # file changed while it's read is read again, but not forever
+
+
+def get_object_header(object_type: str, size: int):
+    return bytes(f"{object_type} {size}\0", encoding="utf-8")
+
+
+def hash_object(content_raw: bytes, object_type: str):
+    return sha1(get_object_header(object_type, len(content_raw)) + content_raw).hexdigest()
+
+
+def hash_stream(source, target=None):
+    for _ in range(HASH_ATTEMPTS):
+        size = os.fstat(source.fileno()).st_size
+        checksum = sha1(get_object_header("blob", size))
+        compressor = compressobj(-1) if target is not None else None
+        read_size = 0
+        chunk = source.read(CHUNK_SIZE)
+        while chunk:
+            read_size += len(chunk)
+            checksum.update(chunk)
+            if compressor is not None:
+                target.write(compressor.compress(chunk))
+            chunk = source.read(CHUNK_SIZE)
+
+        if read_size == size:
+            if compressor is not None:
+                target.write(compressor.flush())
+            return checksum.hexdigest()
+
+        source.seek(0)  # file was changed while it was read, header is wrong
+        if target is not None:
+            target.seek(0)
+            target.truncate()
+    return None  # file keeps changing, caller skips it
+
+
+def checksum_file(file_path: str):
+    with open(file_path, "rb") as source:
+        return hash_stream(source)
+
+
+def store_file(job: tuple):
+    file_path, committed_checksum, index_dir_path = job
+    temp_descriptor, temp_path = mkstemp(dir=index_dir_path, suffix=".tmp")
+    try:
+        with open(temp_descriptor, "wb") as blob, open(file_path, "rb") as source:
+            checksum = hash_stream(source, blob)
+        if checksum is None:
+            return None
+
+        blob_index_path = Path(index_dir_path) / checksum
+        if checksum != committed_checksum and not blob_index_path.exists():
+            os.replace(temp_path, blob_index_path)  # identical blobs may be stored by several workers at once
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+    return checksum
+
+
+class Progress:
+    def __init__(self, title: str, total: int):
+        self.title = title
+        self.total = total
+        self.done = 0
+        self.percent = -1
+        self.lock = Lock()
+        self.is_shown = total >= PARALLEL_MIN_FILES and sys.stderr.isatty()  # not written into log file
+
+    def advance(self):
+        with self.lock:
+            self.done += 1
+            percent = self.done * 100 // self.total
+            if self.is_shown and percent != self.percent:
+                self.percent = percent
+                sys.stderr.write(f"\r{self.title}: {percent}% ({self.done}/{self.total})")
+                if self.done == self.total:
+                    sys.stderr.write("\n")
+                sys.stderr.flush()
+
+
+def should_run_in_parallel(workers: int, jobs_count: int, jobs_size: int):
+    return workers > 1 and jobs_count > 1 and (jobs_count >= PARALLEL_MIN_FILES or jobs_size >= PARALLEL_MIN_BYTES)
+
+
+def run_jobs(function, jobs: list, workers: int, use_processes: bool, jobs_size: int = 0):
+    if not should_run_in_parallel(workers, len(jobs), jobs_size):
+        return [function(job) for job in jobs]
+
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor  # pools cost more to import than to skip
+    if use_processes:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(function, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(function, jobs))
@@ -0,0 +1,87 @@
+import re
+from pathlib import Path
+
+
+class IgnoreRules:
+    def __init__(self, workspace_path: Path, patterns: list):
+        self.workspace_path = workspace_path
+        self.rules = []  # (regex, is_negated, is_anchored, is_only_for_directories)
+        for pattern in patterns:
+            rule = compile_rule(pattern)
+            if rule is not None:
+                self.rules.append(rule)
+        self.rules.reverse()  # last matching pattern decides
+
+    def matches(self, path: Path, is_dir: bool):
+        if len(self.rules) == 0:
+            return False
+        relative_path = path.relative_to(self.workspace_path).as_posix()
+        return self.matches_relative(relative_path, relative_path.rsplit("/", 1)[-1], is_dir)
+
+    def matches_relative(self, relative_path: str, name: str, is_dir: bool):
+        for regex, is_negated, is_anchored, is_only_for_directories in self.rules:
+            if is_only_for_directories and not is_dir:
+                continue
+            if regex.fullmatch(relative_path if is_anchored else name):
+                return not is_negated
+        return False
+
+    def matches_with_parents(self, path: Path, is_dir: bool):
+        if len(self.rules) == 0:
+            return False
+        # files inside ignored directory can't be brought back, walkers never see them
+        relative_path = path.relative_to(self.workspace_path).as_posix()
+        parts = relative_path.split("/")
+        for i in range(1, len(parts) + 1):
+            if self.matches_relative("/".join(parts[:i]), parts[i - 1], is_dir or i < len(parts)):
+                return True
+        return False
+
+
+def compile_rule(pattern: str):
+    pattern = pattern.rstrip("\n").rstrip()
+    if pattern == "" or pattern.startswith("#"):
+        return None
+
+    is_negated = pattern.startswith("!")
+    if is_negated:
+        pattern = pattern[1:]
+    is_only_for_directories = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    is_anchored = "/" in pattern  # patterns without slash match name on any depth
+    pattern = pattern.lstrip("/")
+    if pattern == "":
+        return None
+    return re.compile(translate_pattern(pattern)), is_negated, is_anchored, is_only_for_directories
+
+
+def translate_pattern(pattern: str):
+    regex = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            regex.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            regex.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            regex.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and pattern.find("]", i + 2) != -1:
+            end = pattern.find("]", i + 2)
+            characters = pattern[i + 1:end]
+            if characters.startswith("!"):
+                characters = "^" + characters[1:]
+            regex.append("[" + characters.replace("\\", "\\\\") + "]")
+            i = end + 1
+        elif pattern[i] == "\\" and i + 1 < len(pattern):
+            regex.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            regex.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(regex)
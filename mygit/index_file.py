@@ -0,0 +1,197 @@
+import mmap
+import os
+from pathlib import Path
+from struct import Struct
+from zlib import decompress
+
+INDEX_SIGNATURE = b"MGIX"
+INDEX_VERSION = 2  # version 1 has no cache-tree
+HEADER = Struct(">4sIII")  # signature, version, entries, fsmonitor token length
+OFFSET = Struct(">I")  # offsets of entries sorted by path, binary search jumps over them
+ENTRY = Struct(">20s20sQQQQIHH")  # indexed checksum, cached checksum, mtime, ctime, size, inode, mode, flags, path length
+CACHE_TREE_HEADER = Struct(">20sI")  # commit the trees were built on, directories
+CACHE_TREE_ENTRY = Struct(">20sIH")  # tree checksum, tree entries, directory path length
+NO_CHECKSUM = bytes(20)
+
+INDEXED = 1
+DELETED = 2  # deletion is indexed, there's no blob
+CACHED = 4  # stat data and cached checksum are valid
+TOKEN = 8  # journal record holding new fsmonitor token instead of path
+JOURNAL_MIN_FOLD_SIZE = 64 * 1024  # journal is folded into base once it's bigger than this and quarter of base
+
+
+class IndexFile:
+    def __init__(self, index_path: Path):
+        self.data = b""
+        self.count = 0
+        self.token = ""
+        self.cache_tree = {}  # relative directory -> (tree checksum, tree entries), "" is workspace
+        self.cache_tree_commit = ""
+        self.legacy_content = None  # zlib-compressed text written before format 6
+        if not index_path.exists() or index_path.stat().st_size == 0:
+            return
+        with Path.open(index_path, "rb") as index:
+            if index.read(len(INDEX_SIGNATURE)) != INDEX_SIGNATURE:
+                index.seek(0)
+                self.legacy_content = decompress(index.read()).decode()
+                return
+            self.data = mmap.mmap(index.fileno(), 0, access=mmap.ACCESS_READ)
+        _, version, self.count, token_length = HEADER.unpack_from(self.data, 0)
+        if version not in (1, INDEX_VERSION):
+            raise ValueError(f"{index_path} has unknown index version {version}")
+        self.token = self.data[HEADER.size:HEADER.size + token_length].decode()
+        self.offsets_start = HEADER.size + token_length
+        if version > 1:
+            self.read_cache_tree()
+
+    def read_cache_tree(self):
+        offset = self.offsets_start + self.count * OFFSET.size  # entries go in order, section follows the last
+        if self.count > 0:
+            offset = unpack_entry(self.data, OFFSET.unpack_from(self.data, offset - OFFSET.size)[0])[1]
+        commit, directories = CACHE_TREE_HEADER.unpack_from(self.data, offset)
+        self.cache_tree_commit = "" if commit == NO_CHECKSUM else commit.hex()
+        offset += CACHE_TREE_HEADER.size
+        for _ in range(directories):
+            checksum, entries, path_length = CACHE_TREE_ENTRY.unpack_from(self.data, offset)
+            offset += CACHE_TREE_ENTRY.size
+            self.cache_tree[os.fsdecode(self.data[offset:offset + path_length])] = (checksum.hex(), entries)
+            offset += path_length
+
+    def get_path(self, position: int):
+        offset = OFFSET.unpack_from(self.data, self.offsets_start + position * OFFSET.size)[0]
+        path_length = ENTRY.unpack_from(self.data, offset)[8]
+        return self.data[offset + ENTRY.size:offset + ENTRY.size + path_length]
+
+    def get_entry(self, position: int):
+        offset = OFFSET.unpack_from(self.data, self.offsets_start + position * OFFSET.size)[0]
+        return unpack_entry(self.data, offset)[0]
+
+    def find(self, relative_path: str):
+        # returns (indexed checksum or None, (cached checksum, stat key) or None) without reading other entries
+        key = os.fsencode(relative_path)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_path(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self.get_path(low) == key:
+            return self.get_entry(low)[1:]
+        return None, None
+
+    def __iter__(self):
+        for position in range(self.count):
+            yield self.get_entry(position)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+
+def unpack_entry(data, offset: int):
+    indexed, cached, mtime, ctime, size, inode, mode, flags, path_length = ENTRY.unpack_from(data, offset)
+    relative_path = os.fsdecode(data[offset + ENTRY.size:offset + ENTRY.size + path_length])
+    indexed_checksum = None
+    if flags & DELETED:
+        indexed_checksum = "deleted"
+    elif flags & INDEXED:
+        indexed_checksum = indexed.hex()
+    cache = (cached.hex(), (mtime, ctime, size, inode, mode)) if flags & CACHED else None
+    return (relative_path, indexed_checksum, cache), offset + ENTRY.size + path_length
+
+
+def pack_entry(relative_path: str, indexed_checksum, cache):
+    indexed = NO_CHECKSUM
+    flags = 0
+    if indexed_checksum == "deleted":
+        flags = DELETED
+    elif indexed_checksum is not None:
+        indexed = bytes.fromhex(indexed_checksum)
+        flags = INDEXED
+    cached = NO_CHECKSUM
+    stat_key = (0, 0, 0, 0, 0)
+    if cache is not None:
+        cached = bytes.fromhex(cache[0])
+        stat_key = cache[1]
+        flags |= CACHED
+    path_raw = os.fsencode(relative_path)
+    return ENTRY.pack(indexed, cached, *stat_key, flags, len(path_raw)) + path_raw
+
+
+def write_index_file(index_path: Path, indexed_paths: dict, stat_cache: dict, token: str, cache_tree: dict,
+                     cache_tree_commit: str):
+    # dictionaries are keyed by relative posix paths
+    token_raw = token.encode()
+    records = []
+    for relative_path in sorted(set(indexed_paths) | set(stat_cache), key=os.fsencode):
+        records.append(pack_entry(relative_path, indexed_paths.get(relative_path), stat_cache.get(relative_path)))
+
+    offset = HEADER.size + len(token_raw) + len(records) * OFFSET.size
+    offsets = []
+    for record in records:
+        offsets.append(OFFSET.pack(offset))
+        offset += len(record)
+
+    temp_path = index_path.with_name("tmp-" + index_path.name)
+    with Path.open(temp_path, "wb") as index:
+        index.write(HEADER.pack(INDEX_SIGNATURE, INDEX_VERSION, len(records), len(token_raw)))
+        index.write(token_raw)
+        index.write(b"".join(offsets))
+        index.write(b"".join(records))
+        commit = NO_CHECKSUM if cache_tree_commit == "" else bytes.fromhex(cache_tree_commit)
+        index.write(CACHE_TREE_HEADER.pack(commit, len(cache_tree)))
+        for directory in sorted(cache_tree):
+            checksum, entries = cache_tree[directory]
+            directory_raw = os.fsencode(directory)
+            index.write(CACHE_TREE_ENTRY.pack(bytes.fromhex(checksum), entries, len(directory_raw)) + directory_raw)
+    os.replace(temp_path, index_path)  # readers keep their mmap of the old file
+
+
+def append_index_journal(journal_path: Path, entries: list, token: str = None):
+    # entries are (relative path, indexed checksum or None, cache or None), entry without both removes path
+    records = [pack_entry(*entry) for entry in entries]
+    if token is not None:
+        token_raw = token.encode()
+        records.append(ENTRY.pack(NO_CHECKSUM, NO_CHECKSUM, 0, 0, 0, 0, 0, TOKEN, len(token_raw)) + token_raw)
+    if journal_path.exists():
+        with Path.open(journal_path, "rb") as journal:
+            complete_size = get_complete_journal_size(journal.read())
+        if complete_size != journal_path.stat().st_size:
+            os.truncate(journal_path, complete_size)  # torn entry would misalign everything appended after it
+    with Path.open(journal_path, "ab") as journal:
+        journal.write(b"".join(records))
+
+
+def get_complete_journal_size(data: bytes):
+    offset = 0
+    while offset + ENTRY.size <= len(data):
+        end = offset + ENTRY.size + ENTRY.unpack_from(data, offset)[8]
+        if end > len(data):
+            break
+        offset = end
+    return offset
+
+
+def read_index_journal(journal_path: Path):
+    # token records are yielded as (None, token, None)
+    if not journal_path.exists():
+        return
+    with Path.open(journal_path, "rb") as journal:
+        data = journal.read()
+    data = data[:get_complete_journal_size(data)]  # append was interrupted, its entry wasn't recorded
+    offset = 0
+    while offset < len(data):
+        flags, path_length = ENTRY.unpack_from(data, offset)[7:]
+        if flags & TOKEN:
+            yield None, data[offset + ENTRY.size:offset + ENTRY.size + path_length].decode(), None
+            offset += ENTRY.size + path_length
+            continue
+        entry, offset = unpack_entry(data, offset)
+        yield entry
+
+
+def is_journal_full(index_path: Path, journal_path: Path):
+    if not journal_path.exists():
+        return False
+    return journal_path.stat().st_size > max(JOURNAL_MIN_FOLD_SIZE, index_path.stat().st_size // 4)
@@ -0,0 +1,69 @@
+import os
+import socket
+import sys
+import time
+from pathlib import Path
+
+REQUEST_TIMEOUT = 2.0
+START_TIMEOUT = 10
+
+
+def receive_message(connection: socket.socket, end: bytes = None):
+    chunks = []
+    while True:
+        chunk = connection.recv(64 * 1024)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        if end is not None and chunk.endswith(end):
+            break
+    return b"".join(chunks)
+
+
+def send_request(request: bytes, socket_path: Path, timeout: float = REQUEST_TIMEOUT):
+    if not socket_path.exists():
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(timeout)
+            connection.connect(str(socket_path))
+            connection.sendall(request + b"\n")
+            return receive_message(connection)
+    except OSError:
+        return None  # daemon isn't running, its socket could be left after kill
+
+
+def create_server(socket_path: Path):
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        if socket_path.exists():
+            Path.unlink(socket_path)  # left by daemon that was killed
+        server.bind(str(socket_path))
+        server.listen()
+    except OSError:
+        server.close()
+        raise
+    return server
+
+
+def wait_for_socket_removal(socket_path: Path):
+    deadline = time.monotonic() + REQUEST_TIMEOUT
+    while socket_path.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)  # daemon removes its socket on the way out
+
+
+def spawn_daemon(command_name: str, workspace_path: Path, is_running):
+    import subprocess  # client imports this module on every run, only daemons are spawned
+    environment = dict(os.environ)
+    package_path = str(Path(__file__).resolve().parent.parent)
+    environment["PYTHONPATH"] = os.pathsep.join(filter(None, [package_path, environment.get("PYTHONPATH")]))
+    subprocess.Popen([sys.executable, "-c", "import mygit.main; mygit.main.start()", command_name],
+                     cwd=workspace_path, env=environment, start_new_session=True,
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if is_running():
+            return True
+        time.sleep(0.05)
+    return False
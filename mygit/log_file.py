@@ -0,0 +1,159 @@
+import json
+import logging
+import os
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+
+LOG_MAX_BYTES = 4 * 1024 * 1024  # log is rotated when it grows past this size
+LOG_BACKUP_COUNT = 3  # mygit.log.1 is the newest rotated file, mygit.log.3 the oldest
+READ_BLOCK_SIZE = 64 * 1024
+COLOR_PATTERN = re.compile("\x1b\\[[0-9;]*m")
+DURATION_UNITS = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+UTC_OFFSET_PATTERN = re.compile(r"([+-]\d\d):(\d\d)$")  # strptime of python 3.6 takes offset without colon
+ISO_TIME_FORMATS = [date_format + time_format + zone_format
+                    for date_format in ("%Y-%m-%d",)
+                    for time_format in ("", "T%H:%M", "T%H:%M:%S", "T%H:%M:%S.%f")
+                    for zone_format in ("", "%z")]
+
+command_name = None  # recorded with every message, server changes it for every request
+
+
+class RecordFormatter(logging.Formatter):
+    # one JSON record per line, so multi-line messages can't break tail reads
+    def format(self, record: logging.LogRecord):
+        return json.dumps({
+            "time": datetime.fromtimestamp(record.created).astimezone().isoformat(timespec="milliseconds"),
+            "command": command_name,
+            "level": record.levelname,
+            "message": COLOR_PATTERN.sub("", record.getMessage()),
+        })
+
+
+class RotatingLogHandler(logging.FileHandler):
+    # logging.handlers costs more to import than this, and every command writes the log
+    def __init__(self, log_path: Path, max_bytes: int = LOG_MAX_BYTES, backup_count: int = LOG_BACKUP_COUNT):
+        super().__init__(log_path, delay=True)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.setFormatter(RecordFormatter())
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            line = self.format(record) + self.terminator
+            if self.stream is None:
+                self.stream = self._open()
+            size = self.stream.tell()  # append mode starts at the end of file
+            if size > 0 and size + len(line) > self.max_bytes:
+                self.rotate()
+            self.stream.write(line)
+            self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def rotate(self):
+        self.stream.close()
+        self.stream = None
+        for number in range(self.backup_count - 1, 0, -1):
+            backup_path = get_backup_path(self.baseFilename, number)
+            if os.path.exists(backup_path):
+                os.replace(backup_path, get_backup_path(self.baseFilename, number + 1))
+        if self.backup_count > 0:
+            os.replace(self.baseFilename, get_backup_path(self.baseFilename, 1))
+        else:
+            os.truncate(self.baseFilename, 0)
+        self.stream = self._open()
+
+
+def get_backup_path(log_path, number: int):
+    return f"{log_path}.{number}"
+
+
+def get_log_paths(log_path: Path):
+    # newest first
+    paths = [log_path]
+    for number in range(1, LOG_BACKUP_COUNT + 1):
+        backup_path = Path(get_backup_path(log_path, number))
+        if not backup_path.exists():
+            break
+        paths.append(backup_path)
+    return paths
+
+
+def parse_since(text: str):
+    # "2h", "30m", "7d" are counted back from now, anything else is ISO date or time
+    match = re.fullmatch(r"(\d+)([smhdw])", text.strip())
+    if match is not None:
+        return datetime.now().astimezone() - timedelta(**{DURATION_UNITS[match.group(2)]: int(match.group(1))})
+    moment = parse_iso_time(text)
+    return moment.astimezone() if moment.tzinfo is None else moment
+
+
+def parse_iso_time(text: str):
+    text = UTC_OFFSET_PATTERN.sub(r"\1\2", text.strip().replace(" ", "T", 1))
+    if text.endswith("Z"):
+        text = text[:-1] + "+0000"
+    for time_format in ISO_TIME_FORMATS:
+        try:
+            return datetime.strptime(text, time_format)
+        except ValueError:
+            continue
+    raise ValueError(f"{text} isn't ISO date or time")
+
+
+def parse_record(line: str):
+    try:
+        record = json.loads(line)
+        record["time"] = parse_iso_time(record["time"])
+        return record
+    except (ValueError, KeyError, TypeError):
+        return {"time": None, "command": None, "level": None, "message": line}  # written before records had format
+
+
+def format_record(record: dict):
+    if record["time"] is None:
+        return record["message"]
+    return f"{record['time'].isoformat(sep=' ', timespec='seconds')} {record['command']} " \
+           f"{record['level']}: {record['message']}"
+
+
+def iterate_lines_backwards(file_path: Path):
+    with Path.open(file_path, "rb") as file:
+        position = file.seek(0, os.SEEK_END)
+        tail = b""
+        while position > 0:
+            read_size = min(READ_BLOCK_SIZE, position)
+            position -= read_size
+            file.seek(position)
+            lines = (file.read(read_size) + tail).split(b"\n")
+            tail = lines[0]  # may continue in previous block
+            for line in reversed(lines[1:]):
+                if line != b"":
+                    yield line.decode("utf-8", errors="replace")
+        if tail != b"":
+            yield tail.decode("utf-8", errors="replace")
+
+
+def read_last_records(log_path: Path, count: int = None, since: datetime = None):
+    # newest records are read first and only as far back as asked, result is in chronological order
+    records = []
+    for file_path in get_log_paths(log_path):
+        if not file_path.exists():
+            break
+        for line in iterate_lines_backwards(file_path):
+            if count is not None and len(records) >= count:
+                return records[::-1]
+            record = parse_record(line)
+            if since is not None and (record["time"] is None or record["time"] < since):
+                return records[::-1]
+            records.append(record)
+    return records[::-1]
+
+
+def iterate_records(log_path: Path):
+    for file_path in reversed(get_log_paths(log_path)):
+        if not file_path.exists():
+            continue
+        with Path.open(file_path, "r", errors="replace") as log:
+            for line in log:
+                yield parse_record(line.rstrip("\n"))
@@ -1,40 +1,68 @@
 import argparse
 import logging
+import os
 import sys
 
 from colorama import init as colorama_init, deinit as colorama_deinit, Fore
-from mygit.backend import is_init, get_compressed_file_content, get_last_commit_index_content
-from mygit.commands.branch import Branch
-from mygit.commands.checkout import Checkout
-from mygit.commands.commit import Commit
-from mygit.commands.index import Index
-from mygit.commands.init import Init
-from mygit.commands.log import Log
-from mygit.commands.merge import Merge
-from mygit.commands.print import Print
-from mygit.commands.reset import Reset
-from mygit.commands.status import Status
-from mygit.constants import Constants
+from importlib import import_module
+from mygit import log_file, trace
+from mygit.constants import Constants, REPOSITORY_FORMAT
+from mygit.client import forward_to_server
 from mygit.state import State
 from pathlib import Path
 from textwrap import dedent
 
+COMMANDS = {  # command name -> (module, class), modules are imported only for commands that are built
+    "init": ("mygit.commands.init", "Init"),
+    "status": ("mygit.commands.status", "Status"),
+    "log": ("mygit.commands.log", "Log"),
+    "index": ("mygit.commands.index", "Index"),
+    "branch": ("mygit.commands.branch", "Branch"),
+    "checkout": ("mygit.commands.checkout", "Checkout"),
+    "print": ("mygit.commands.print", "Print"),
+    "merge": ("mygit.commands.merge", "Merge"),
+    "reset": ("mygit.commands.reset", "Reset"),
+    "commit": ("mygit.commands.commit", "Commit"),
+    "upgrade": ("mygit.commands.upgrade", "Upgrade"),
+    "pack": ("mygit.commands.pack", "Pack"),
+    "gc": ("mygit.commands.gc", "Gc"),
+    "fsmonitor": ("mygit.commands.fsmonitor", "FSMonitor"),
+    "serve": ("mygit.commands.serve", "Serve"),
+}
+
 
 def start():
     main(Path.cwd(), sys.argv[1:])
 
 
-def main(workspace_path: Path, sys_args: list):
-    colorama_init()
+def main(workspace_path: Path, sys_args: list, can_be_forwarded: bool = True):
+    if can_be_forwarded and forward_to_server(workspace_path, sys_args):
+        return
 
     parser = create_parser()
     subparsers = parser.add_subparsers(dest="command", title="mygit tools")
-    commands = create_commands(subparsers)
+    command_name = find_command_name(sys_args)
+    commands = create_commands(subparsers, [command_name] if command_name in COMMANDS else COMMANDS)
     namespace = parser.parse_args(sys_args)
+    if namespace.command in commands:
+        commands[namespace.command].check_arguments(namespace)
+    trace_report_path = trace.get_report_path(namespace.trace, namespace.trace_file)
+    start_time = trace.start(trace_report_path, namespace.profile)
+    try:
+        run_command(commands, namespace, workspace_path)
+    finally:
+        trace.finish(namespace.command, start_time, trace_report_path, namespace.profile)
+
+
+def run_command(commands: dict, namespace: argparse.Namespace, workspace_path: Path):
+    from mygit.backend import is_init  # help and usage errors are printed before backend is imported
+    colorama_init()
     constants = Constants(workspace_path)
     state = State()
+    state.workers = namespace.jobs
 
-    log_handlers = ([logging.FileHandler(constants.mygit_log_path), logging.StreamHandler()]
+    log_file.command_name = namespace.command
+    log_handlers = ([log_file.RotatingLogHandler(constants.mygit_log_path), logging.StreamHandler()]
                     if is_init(constants)
                     else [logging.StreamHandler()])
 
@@ -47,7 +75,7 @@ def main(workspace_path: Path, sys_args: list):
     else:
         if is_init(constants):
             handle_command(commands, namespace, constants, state)
-        elif namespace.command == "init":
+        elif namespace.command in ("init", "upgrade"):
             commands[namespace.command].work(namespace, constants, state)
         else:
             logging.warning(Fore.YELLOW + "directory doesn't contain a repository. Use 'mygit init' to create new one")
@@ -55,6 +83,28 @@ def main(workspace_path: Path, sys_args: list):
     colorama_deinit()
 
 
+def parse_jobs(text: str):
+    try:
+        jobs = int(text)
+    except ValueError:
+        jobs = 0
+    if jobs < 1:
+        raise argparse.ArgumentTypeError(f"number of workers has to be a positive integer, not '{text}'")
+    return jobs
+
+
+def get_default_jobs():
+    cores = os.cpu_count() or 1
+    jobs = os.environ.get("MYGIT_JOBS")
+    if jobs is None:
+        return cores
+    try:
+        return parse_jobs(jobs)
+    except argparse.ArgumentTypeError as e:  # logging isn't configured yet
+        sys.stderr.write(f"MYGIT_JOBS is ignored: {e}, using {cores} workers\n")
+        return cores
+
+
 def create_parser():
     parser = argparse.ArgumentParser(
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -80,36 +130,77 @@ def create_parser():
               branch       List, create, or delete branches
               merge        Join two development histories together
               checkout     Switch branches
+
+            maintain the repository:
+              pack         Pack loose objects
+              gc           Remove unreachable objects
+              upgrade      Rewrite repository in current format
+              fsmonitor    Watch workspace for changes
+              serve        Keep repository state warm for frequent commands
             ''')
     )
+    parser.add_argument("-j", "--jobs", type=parse_jobs, default=get_default_jobs(),
+                        help="number of workers used for hashing, compression and writing out files "
+                             "(default: $MYGIT_JOBS or number of cores)")
+    parser.add_argument("--trace", action="store_true",
+                        help="print time of command phases and I/O counters as JSON to stderr at exit "
+                             "(also $MYGIT_TRACE=1)")
+    parser.add_argument("--trace-file", metavar="PATH",
+                        help="write the trace report into PATH instead of stderr (also $MYGIT_TRACE=PATH)")
+    parser.add_argument("--profile", metavar="PATH", default=os.environ.get("MYGIT_PROFILE"),
+                        help="dump cProfile statistics of the command into PATH (also $MYGIT_PROFILE)")
 
     return parser
 
 
-def create_commands(subparsers: argparse._SubParsersAction):
+def find_command_name(sys_args: list):
+    i = 0
+    while i < len(sys_args):
+        if sys_args[i] in ("-h", "--help"):
+            return None  # top-level help lists every command
+        if sys_args[i] in ("-j", "--jobs", "--trace-file", "--profile"):
+            i += 1
+        elif not sys_args[i].startswith("-"):
+            return sys_args[i]
+        i += 1
+    return None
+
+
+def create_commands(subparsers: argparse._SubParsersAction, command_names=COMMANDS):
     commands = {}
 
-    Init(subparsers, commands)
-    Status(subparsers, commands)
-    Log(subparsers, commands)
-    Index(subparsers, commands)
-    Branch(subparsers, commands)
-    Checkout(subparsers, commands)
-    Print(subparsers, commands)
-    Merge(subparsers, commands)
-    Reset(subparsers, commands)
-    Commit(subparsers, commands)
+    for command_name in command_names:
+        module_name, class_name = COMMANDS[command_name]
+        getattr(import_module(module_name), class_name)(subparsers, commands)
 
     return commands
 
 
-def handle_command(commands: dict, namespace: argparse.Namespace, constants: Constants, state: State):
-    state.load_cache(
-        constants,
-        get_compressed_file_content(constants.mygit_index_path),
-        get_last_commit_index_content(constants))
+def load_state(constants: Constants, state: State):
+    from mygit.backend import get_last_commit_index_content
+    state.load_cache(constants, get_last_commit_index_content(constants))
+
+
+def load_paths_state(constants: Constants, state: State, relative_paths: list):
+    from mygit.backend import get_last_commit_index_content
+    state.load_paths(constants, relative_paths, get_last_commit_index_content(constants))
 
+
+def handle_command(commands: dict, namespace: argparse.Namespace, constants: Constants, state: State,
+                   state_loader=None):
+    from mygit.backend import get_repository_format
     if namespace.command == "init":
         logging.warning(Fore.YELLOW + "directory already contains the repository")
-    else:
+    elif namespace.command == "upgrade":
         commands[namespace.command].work(namespace, constants, state)
+    elif get_repository_format(constants) < REPOSITORY_FORMAT:
+        logging.error(Fore.RED + "repository was created by older mygit version, use 'mygit upgrade' first")
+    else:
+        command = commands[namespace.command]
+        touched_paths = command.get_touched_paths(namespace, constants) if state_loader is None else None
+        with trace.phase("load state"):
+            if touched_paths is not None:
+                load_paths_state(constants, state, touched_paths)
+            else:
+                (state_loader or load_state)(constants, state)
+        command.work(namespace, constants, state)
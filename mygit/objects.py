@@ -0,0 +1,156 @@
+import os
+from collections import OrderedDict
+from mygit import trace
+from mygit.constants import Constants
+from mygit.hashing import CHUNK_SIZE, hash_object
+from mygit.pack import find_packed_object
+from pathlib import Path
+from string import hexdigits
+from zlib import decompress, decompressobj, compress
+
+OBJECT_CACHE_MAX_BYTES = 32 * 1024 * 1024  # estimated memory of parsed objects kept by one process
+PARSED_LINE_OVERHEAD = 384  # tree entry becomes Path, checksum string and dict slot, ~450 bytes in total
+
+
+class ObjectCache:
+    # objects never change under their checksum, so entries stay valid across commands of one process
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()  # key -> (value, size), least recently used first
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            trace.count("object_cache_misses")
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        trace.count("object_cache_hits")
+        return entry[0]
+
+    def put(self, key: tuple, value, size: int):
+        if size > self.max_bytes or key in self.entries:
+            return
+        self.entries[key] = (value, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.size -= evicted_size
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+
+object_cache = ObjectCache(OBJECT_CACHE_MAX_BYTES)
+
+
+def is_checksum(text: str):
+    return len(text) == 40 and all(symbol in hexdigits for symbol in text)
+
+
+def get_object_path(checksum: str, c: Constants):
+    return c.mygit_objects_path / checksum[:2] / checksum[2:]
+
+
+def object_exists(checksum: str, c: Constants):
+    if not is_checksum(checksum):
+        return False
+    return find_packed_object(checksum, c)[0] is not None or get_object_path(checksum, c).exists()
+
+
+def read_object(checksum: str, c: Constants):
+    trace.count("objects_read")
+    pack, location = find_packed_object(checksum, c)
+    if pack is not None:
+        trace.count("bytes_read", location[1])
+        return pack.read_record(*location)
+    with Path.open(get_object_path(checksum, c), "rb") as obj:
+        content = obj.read()
+    trace.count("bytes_read", len(content))
+    return decompress(content)
+
+
+def iterate_object_chunks(checksum: str, c: Constants):
+    trace.count("objects_read")
+    pack, location = find_packed_object(checksum, c)
+    if pack is not None:
+        trace.count("bytes_read", location[1])
+        yield from pack.iterate_record_chunks(*location, CHUNK_SIZE)
+        return
+
+    decompressor = decompressobj()
+    with Path.open(get_object_path(checksum, c), "rb") as obj:
+        chunk = obj.read(CHUNK_SIZE)
+        while chunk:
+            trace.count("bytes_read", len(chunk))
+            yield decompressor.decompress(chunk)
+            chunk = obj.read(CHUNK_SIZE)
+    yield decompressor.flush()
+
+
+def get_object_content(checksum: str, c: Constants):
+    return read_object(checksum, c).decode()
+
+
+def get_parsed_object(checksum: str, parse, c: Constants):
+    # parsed value is shared by every caller, it must not be changed; trees hold workspace paths, so it's in key
+    key = (checksum, parse, c.workspace_path)
+    value = object_cache.get(key)
+    if value is None:
+        content_raw = read_object(checksum, c)
+        value = parse(content_raw.decode(), c)
+        object_cache.put(key, value, get_parsed_size(content_raw))
+    return value
+
+
+def get_parsed_size(content_raw: bytes):
+    return len(content_raw) + PARSED_LINE_OVERHEAD * (content_raw.count(b"\n") + 1)
+
+
+def freshen_object(checksum: str, c: Constants):
+    # rewritten object becomes young again, so gc grace period protects it from removal
+    pack = find_packed_object(checksum, c)[0]
+    if pack is not None:
+        os.utime(pack.pack_path)
+        return True
+    object_path = get_object_path(checksum, c)
+    if object_path.exists():
+        os.utime(object_path)
+        return True
+    return False
+
+
+def write_object(content_raw: bytes, object_type: str, c: Constants):
+    checksum = hash_object(content_raw, object_type)
+    trace.count("bytes_hashed", len(content_raw))
+    if not freshen_object(checksum, c):
+        trace.count("objects_written")
+        trace.count("bytes_compressed", len(content_raw))
+        object_path = get_object_path(checksum, c)
+        object_path.parent.mkdir(exist_ok=True)
+        with Path.open(object_path, "wb") as obj:
+            obj.write(compress(content_raw, -1))
+
+    return checksum
+
+
+def move_into_objects(compressed_file_path: Path, checksum: str, c: Constants):
+    if freshen_object(checksum, c):
+        Path.unlink(compressed_file_path)
+        return
+    trace.count("objects_written")
+    object_path = get_object_path(checksum, c)
+    object_path.parent.mkdir(exist_ok=True)
+    compressed_file_path.replace(object_path)
+
+
+def iterate_loose_objects(c: Constants):
+    for fan_out_path in c.mygit_objects_path.iterdir():
+        if len(fan_out_path.name) == 2 and fan_out_path.is_dir():
+            for object_path in fan_out_path.iterdir():
+                yield fan_out_path.name + object_path.name
@@ -0,0 +1,214 @@
+import mmap
+import os
+from collections import OrderedDict
+from hashlib import sha1
+from mygit.constants import Constants
+from mygit.delta import create_delta, apply_delta
+from pathlib import Path
+from struct import Struct
+from threading import Lock
+from zlib import compress, decompress, decompressobj
+
+PACK_SIGNATURE = b"MGPK"
+INDEX_SIGNATURE = b"MGPI"
+PACK_VERSION = 1
+HEADER = Struct(">4sII")  # signature, version, objects count
+FAN_OUT = Struct(">256I")
+ENTRY = Struct(">20sQQ")  # binary checksum, record offset in pack, record length
+FULL_RECORD = 0
+DELTA_RECORD = 1  # record kind is followed by binary checksum of base object in the same pack
+
+MAX_DELTA_DEPTH = 10
+DELTA_WINDOW = 4
+DELTA_MIN_SIZE = 64
+DELTA_BASE_CACHE_SIZE = 64 * 1024 * 1024
+
+packs_lock = Lock()  # workspace is expanded by several threads
+packs_registry = {}
+delta_base_cache = OrderedDict()
+delta_base_cache_size = 0
+
+
+class Pack:
+    def __init__(self, index_path: Path):
+        self.name = index_path.stem
+        self.index_path = index_path
+        self.pack_path = index_path.with_suffix(".pack")
+        with Path.open(index_path, "rb") as index:
+            self.index = mmap.mmap(index.fileno(), 0, access=mmap.ACCESS_READ)
+        with Path.open(self.pack_path, "rb") as pack:
+            self.pack = mmap.mmap(pack.fileno(), 0, access=mmap.ACCESS_READ)
+
+        signature, version, self.count = HEADER.unpack_from(self.index, 0)
+        if signature != INDEX_SIGNATURE or version != PACK_VERSION:
+            raise ValueError(f"{index_path} is not a mygit pack index")
+        self.fan_out = FAN_OUT.unpack_from(self.index, HEADER.size)
+        self.entries_offset = HEADER.size + FAN_OUT.size
+
+    def get_checksum(self, position: int):
+        entry_offset = self.entries_offset + position * ENTRY.size
+        return self.index[entry_offset:entry_offset + 20]
+
+    def find(self, binary_checksum: bytes):
+        low = 0 if binary_checksum[0] == 0 else self.fan_out[binary_checksum[0] - 1]
+        high = self.fan_out[binary_checksum[0]]
+        while low < high:
+            middle = (low + high) // 2
+            middle_checksum = self.get_checksum(middle)
+            if middle_checksum < binary_checksum:
+                low = middle + 1
+            elif middle_checksum > binary_checksum:
+                high = middle
+            else:
+                _, offset, length = ENTRY.unpack_from(self.index, self.entries_offset + middle * ENTRY.size)
+                return offset, length
+        return None
+
+    def iterate_checksums(self):
+        for position in range(self.count):
+            yield self.get_checksum(position).hex()
+
+    def iterate_record_chunks(self, offset: int, length: int, chunk_size: int):
+        if self.pack[offset] == DELTA_RECORD:
+            yield self.read_record(offset, length)
+            return
+
+        decompressor = decompressobj()
+        for chunk_offset in range(offset + 1, offset + length, chunk_size):  # first byte is record kind
+            yield decompressor.decompress(self.pack[chunk_offset:min(chunk_offset + chunk_size, offset + length)])
+        yield decompressor.flush()
+
+    def read_record(self, offset: int, length: int):
+        if self.pack[offset] == FULL_RECORD:
+            return decompress(self.pack[offset + 1:offset + length])
+
+        base = self.read_delta_base(self.pack[offset + 1:offset + 21])
+        return apply_delta(base, decompress(self.pack[offset + 21:offset + length]))
+
+    def read_delta_base(self, binary_checksum: bytes):
+        global delta_base_cache_size
+        with packs_lock:
+            if binary_checksum in delta_base_cache:  # objects are addressed by content, so cache outlives packs
+                delta_base_cache.move_to_end(binary_checksum)
+                return delta_base_cache[binary_checksum]
+
+        base = self.read_record(*self.find(binary_checksum))
+        with packs_lock:
+            if binary_checksum not in delta_base_cache:
+                delta_base_cache[binary_checksum] = base
+                delta_base_cache_size += len(base)
+            while delta_base_cache_size > DELTA_BASE_CACHE_SIZE and len(delta_base_cache) > 1:
+                delta_base_cache_size -= len(delta_base_cache.popitem(last=False)[1])
+        return base
+
+    def close(self):
+        self.index.close()
+        self.pack.close()
+
+
+def get_packs(c: Constants):
+    if not c.packs_path.exists():
+        return []
+    packs_path_stat = c.packs_path.stat()
+    packs_path_key = (packs_path_stat.st_ino, packs_path_stat.st_mtime_ns)  # changes when packs are added/removed
+    with packs_lock:
+        registered = packs_registry.get(c.packs_path)
+        if registered is None or registered[0] != packs_path_key:
+            if registered is not None:
+                for pack in registered[1]:
+                    pack.close()
+            packs = [Pack(index_path) for index_path in sorted(c.packs_path.glob("pack-*.idx"))]
+            registered = packs_registry[c.packs_path] = (packs_path_key, packs)
+        return registered[1]
+
+
+def find_packed_object(checksum: str, c: Constants):
+    binary_checksum = bytes.fromhex(checksum)
+    for pack in get_packs(c):
+        location = pack.find(binary_checksum)
+        if location is not None:
+            return pack, location
+    return None, None
+
+
+def find_delta_bases(blob_history: list, checksums: set):
+    candidates = {}
+    recent_blobs_by_name = {}
+    for name, blob_checksum, previous_blob_checksum in blob_history:
+        if blob_checksum in candidates or blob_checksum not in checksums:
+            continue
+
+        bases = [previous_blob_checksum] if previous_blob_checksum in checksums else []
+        recent_blobs = recent_blobs_by_name.setdefault(name, [])
+        bases.extend(base for base in reversed(recent_blobs) if base not in bases)
+        candidates[blob_checksum] = bases[:DELTA_WINDOW]
+        recent_blobs.append(blob_checksum)
+        del recent_blobs[:-DELTA_WINDOW]
+
+    return candidates  # blobs are ordered as they appeared in history, so bases come before their targets
+
+
+def choose_deltas(candidates: dict, read_object):
+    deltas = {}
+    depths = {}
+    for target_checksum in candidates:
+        depths[target_checksum] = 0
+        bases = [base for base in candidates[target_checksum] if depths.get(base, MAX_DELTA_DEPTH) < MAX_DELTA_DEPTH]
+        if len(bases) == 0:
+            continue
+        target = read_object(target_checksum)
+        if len(target) < DELTA_MIN_SIZE:
+            continue
+
+        best_delta = None
+        for base_checksum in bases:
+            delta = create_delta(read_object(base_checksum), target)
+            if len(delta) < len(target) // 2 and (best_delta is None or len(delta) < len(best_delta[1])):
+                best_delta = (base_checksum, delta)
+        if best_delta is not None:
+            deltas[target_checksum] = (bytes.fromhex(best_delta[0]), compress(best_delta[1], -1))
+            depths[target_checksum] = depths[best_delta[0]] + 1
+
+    return deltas
+
+
+def create_pack(checksums: list, read_compressed_object, c: Constants, deltas: dict = None):
+    deltas = deltas or {}
+    checksums = sorted(checksums)
+    pack_name = "pack-" + sha1(b"".join(bytes.fromhex(checksum) for checksum in checksums)).hexdigest()
+    pack_path = c.packs_path / (pack_name + ".pack")
+    index_path = c.packs_path / (pack_name + ".idx")
+    temp_pack_path = pack_path.with_name("tmp-" + pack_path.name)
+    temp_index_path = index_path.with_name("tmp-" + index_path.name)
+
+    entries = []
+    with Path.open(temp_pack_path, "wb") as pack:
+        pack.write(HEADER.pack(PACK_SIGNATURE, PACK_VERSION, len(checksums)))
+        for checksum in checksums:
+            if checksum in deltas:
+                base_checksum, compressed_delta = deltas[checksum]
+                entries.append((bytes.fromhex(checksum), pack.tell(), 21 + len(compressed_delta)))
+                pack.write(bytes([DELTA_RECORD]))
+                pack.write(base_checksum)
+                pack.write(compressed_delta)
+            else:
+                compressed = read_compressed_object(checksum)
+                entries.append((bytes.fromhex(checksum), pack.tell(), 1 + len(compressed)))
+                pack.write(bytes([FULL_RECORD]))
+                pack.write(compressed)
+
+    fan_out = [0] * 256
+    for binary_checksum, _, _ in entries:
+        fan_out[binary_checksum[0]] += 1
+    for i in range(1, 256):
+        fan_out[i] += fan_out[i - 1]
+
+    with Path.open(temp_index_path, "wb") as index:
+        index.write(HEADER.pack(INDEX_SIGNATURE, PACK_VERSION, len(entries)))
+        index.write(FAN_OUT.pack(*fan_out))
+        for entry in entries:
+            index.write(ENTRY.pack(*entry))
+
+    os.replace(temp_pack_path, pack_path)
+    os.replace(temp_index_path, index_path)  # index goes last, readers look for packs by their indexes
+    return pack_name
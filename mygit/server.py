@@ -0,0 +1,157 @@
+import json
+import logging
+import select
+import signal
+import sys
+from colorama import Fore
+from contextlib import redirect_stdout, redirect_stderr
+from io import StringIO
+from mygit import log_file
+from mygit.backend import get_last_commit_index_content
+from mygit.constants import Constants
+from mygit.ipc import receive_message, send_request, create_server, wait_for_socket_removal
+from mygit.state import State
+from pathlib import Path
+
+STOP_REQUEST = "stop"
+PING_REQUEST = "ping"
+LOCAL_COMMANDS = ("serve", "fsmonitor", "init", "upgrade")  # they manage processes or repository layout
+READ_ONLY_COMMANDS = ("log", "print")
+
+
+class WarmState:
+    def __init__(self, c: Constants):
+        self.c = c
+        self.state = None
+        self.stamp = None
+
+    def get_stamp(self):
+        # index, ignore rules and refs; tiny files are compared by content, timestamps can be too coarse
+        stamp = []
+        for path in (self.c.mygit_index_path, self.c.index_journal_path, self.c.mygit_ignore_path,
+                     self.c.format_path):
+            if not path.exists():
+                stamp.append(None)
+                continue
+            path_stat = path.stat()
+            stamp.append((path_stat.st_mtime_ns, path_stat.st_ctime_ns, path_stat.st_size, path_stat.st_ino))
+        with Path.open(self.c.mygit_head_path, "r") as head:
+            branch_name = head.read()
+        stamp.append(branch_name)
+        with Path.open(self.c.mygit_branches_path / branch_name, "r") as branch:
+            stamp.append(branch.read())
+        return tuple(stamp)
+
+    def load(self, c: Constants, state: State):
+        stamp = self.get_stamp()
+        if self.state is None or stamp != self.stamp:
+            self.state = State()
+            self.state.load_cache(c, get_last_commit_index_content(c))
+            self.stamp = stamp
+        state.copy_cache_from(self.state)
+
+    def keep(self, command_name: str, state: State):
+        if command_name == "status":  # it writes down only what it has found, so its state matches disk
+            self.state = State()
+            self.state.copy_cache_from(state)
+            self.state.index_timestamp = self.c.mygit_index_path.stat().st_mtime_ns
+            self.stamp = self.get_stamp()
+        elif command_name not in READ_ONLY_COMMANDS:
+            self.state = None
+
+
+def run_server(c: Constants):
+    from mygit.main import create_parser, create_commands, handle_command  # server builds every command once
+    parser = create_parser()
+    subparsers = parser.add_subparsers(dest="command", title="mygit tools")
+    commands = create_commands(subparsers)
+    warm_state = WarmState(c)
+
+    try:
+        server = create_server(c.server_socket_path)
+    except OSError as e:
+        logging.error(Fore.RED + f"couldn't start server: {e}")
+        return
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    logging.info(Fore.GREEN + f"server is listening on {c.server_socket_path.relative_to(c.workspace_path)}")
+    try:
+        while True:
+            select.select([server], [], [])
+            connection, _ = server.accept()
+            with connection:
+                try:
+                    request = json.loads(receive_message(connection, b"\n"))
+                    if request.get("control") == STOP_REQUEST:
+                        connection.sendall(bytes(json.dumps({"status": STOP_REQUEST}), encoding="utf-8"))
+                        break
+                    if request.get("control") == PING_REQUEST:
+                        response = {"status": PING_REQUEST}
+                    else:
+                        response = execute_request(request["args"], c, parser, commands, handle_command, warm_state,
+                                                   request.get("colors", [False, False]))
+                    connection.sendall(bytes(json.dumps(response), encoding="utf-8"))
+                except (OSError, ValueError, KeyError):
+                    pass  # client has gone or sent garbage
+    finally:
+        server.close()
+        if c.server_socket_path.exists():
+            Path.unlink(c.server_socket_path)
+    logging.info(Fore.GREEN + "server is stopped")
+
+
+def execute_request(args: list, c: Constants, parser, commands: dict, handle_command, warm_state: WarmState,
+                    colors: list):
+    # colors tell whether client's stdout and stderr are terminals, output for pipes has no color codes
+    stdout = StringIO()
+    stderr = StringIO()
+    response = {"status": "done", "stdout": "", "stderr": "", "exit_code": None}
+    handler = logging.StreamHandler(stderr)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logging.getLogger().addHandler(handler)
+    try:
+        with redirect_stdout(stdout), redirect_stderr(stderr):  # argparse writes help and errors itself
+            try:
+                namespace = parser.parse_args(args)
+                if namespace.command in commands:
+                    commands[namespace.command].check_arguments(namespace)
+            except SystemExit as e:
+                response["exit_code"] = e.code
+                return response
+            if namespace.command in LOCAL_COMMANDS:
+                response["status"] = "local"
+                return response
+
+            state = State()
+            state.workers = namespace.jobs
+            log_file.command_name = namespace.command  # records in log are attributed to forwarded command
+            if namespace.command is None:
+                logging.warning(Fore.YELLOW + "write command or use 'mygit -h' for help")
+            else:
+                try:
+                    handle_command(commands, namespace, c, state, warm_state.load)
+                finally:
+                    warm_state.keep(namespace.command, state)
+    except Exception as e:
+        warm_state.state = None
+        logging.error(Fore.RED + f"server failed to run command: {e!r}")
+    finally:
+        log_file.command_name = "serve"
+        logging.getLogger().removeHandler(handler)
+        stdout_is_tty, stderr_is_tty = colors
+        response["stdout"] = stdout.getvalue() if stdout_is_tty else log_file.COLOR_PATTERN.sub("", stdout.getvalue())
+        response["stderr"] = stderr.getvalue() if stderr_is_tty else log_file.COLOR_PATTERN.sub("", stderr.getvalue())
+    return response
+
+
+def is_server_running(c: Constants):
+    response = send_request(bytes(json.dumps({"control": PING_REQUEST}), encoding="utf-8"), c.server_socket_path)
+    return response is not None
+
+
+def stop_server(c: Constants):
+    response = send_request(bytes(json.dumps({"control": STOP_REQUEST}), encoding="utf-8"), c.server_socket_path)
+    if response is None:
+        return False
+    wait_for_socket_removal(c.server_socket_path)
+    return True
@@ -1,50 +1,132 @@
 from mygit.constants import Constants
+from mygit.ignore import IgnoreRules
+from mygit.index_file import IndexFile, read_index_journal
 from pathlib import Path
 
 
 class State:
     def __init__(self):
-        self.ignored_paths = set()
+        self.ignore_rules = IgnoreRules(Path(), [])
         self.current_indexed_paths = {}
         self.last_commit_indexed_path = {}
+        self.workspace_stat_cache = {}
+        self.stat_cache_is_changed = False
+        self.changed_index_paths = set()  # their entries are appended to index journal on next write
+        self.index_needs_rewrite = False  # journal can't record the change, whole index is written
+        self.is_partial = False  # only some paths were read from index, changes go to journal only
+        self.cache_tree = {}  # relative directory -> (tree checksum, tree entries) on top of cache_tree_commit
+        self.cache_tree_commit = ""
+        self.index_timestamp = 0
+        self.fsmonitor_token = ""
+        self.fsmonitor_token_is_changed = False  # new token is appended to index journal on next write
+        self.workers = 1
 
         self.status_is_checked = False
         self.status_indexed_paths = []
         self.status_indexed_but_changed_paths = []
         self.status_not_indexed_paths = []
 
-    def load_cache(self, c: Constants, current_index_file_content: str, last_commit_index_file_content: str):
-        self.__create_ignored_paths(c)
-        self.__create_index(self.current_indexed_paths, current_index_file_content, c)
+    def copy_cache_from(self, other: "State"):
+        self.ignore_rules = other.ignore_rules
+        self.current_indexed_paths = dict(other.current_indexed_paths)
+        self.last_commit_indexed_path = dict(other.last_commit_indexed_path)
+        self.workspace_stat_cache = dict(other.workspace_stat_cache)
+        self.index_timestamp = other.index_timestamp
+        self.fsmonitor_token = other.fsmonitor_token
+        self.cache_tree = dict(other.cache_tree)
+        self.cache_tree_commit = other.cache_tree_commit
+
+    def invalidate_cache_tree(self, relative_path: str):
+        directory = relative_path
+        while directory != "":
+            directory = directory.rpartition("/")[0]
+            self.cache_tree.pop(directory, None)
+
+    def load_cache(self, c: Constants, last_commit_index_file_content: str):
+        self.__create_ignore_rules(c)
+        self.__create_current_index(c)
         self.__create_index(self.last_commit_indexed_path, last_commit_index_file_content, c)
 
-    def __create_ignored_paths(self, c: Constants):
+    def load_paths(self, c: Constants, relative_paths: list, last_commit_index_file_content: str):
+        # index entries of other paths aren't read, binary search finds the given ones in mapped index
+        self.is_partial = True
+        self.__create_ignore_rules(c)
+        if c.mygit_index_path.exists():
+            self.index_timestamp = c.mygit_index_path.stat().st_mtime_ns
+        index = IndexFile(c.mygit_index_path)
+        self.fsmonitor_token = index.token
+        for relative_path in relative_paths:
+            indexed_checksum, cache = index.find(relative_path)
+            path = c.workspace_path / relative_path
+            if indexed_checksum is not None:
+                self.current_indexed_paths[path] = indexed_checksum
+            if cache is not None:
+                self.workspace_stat_cache[path] = cache
+        index.close()
+        self.__replay_index_journal(c, set(relative_paths))
+        self.__create_index(self.last_commit_indexed_path, last_commit_index_file_content, c)
+
+    def __create_ignore_rules(self, c: Constants):
         with Path.open(c.mygit_ignore_path, "r") as ignored:
-            for path in ignored.readlines():
-                absolute_path = c.workspace_path / path.strip()
-                if path == "\n" or not absolute_path.exists():
-                    continue
-                if absolute_path.is_file():
-                    self.__add_file_in_ignored(absolute_path)
-                else:
-                    self.__add_directory_in_ignored(absolute_path)
-
-    def __add_file_in_ignored(self, file_path: Path):
-        self.ignored_paths.add(file_path)
-
-    def __add_directory_in_ignored(self, dir_path: Path):
-        self.__add_file_in_ignored(dir_path)
-        for child in dir_path.iterdir():
-            if child.is_file():
-                self.__add_file_in_ignored(child)
+            self.ignore_rules = IgnoreRules(c.workspace_path, ignored.readlines())
+
+    def __create_current_index(self, c: Constants):
+        if c.mygit_index_path.exists():
+            self.index_timestamp = c.mygit_index_path.stat().st_mtime_ns
+        index = IndexFile(c.mygit_index_path)
+        if index.legacy_content is not None:
+            self.__create_legacy_current_index(index.legacy_content, c)
+            self.index_needs_rewrite = True
+            return
+
+        self.fsmonitor_token = index.token
+        self.cache_tree = index.cache_tree
+        self.cache_tree_commit = index.cache_tree_commit
+        for relative_path, indexed_checksum, cache in index:
+            path = c.workspace_path / relative_path
+            if indexed_checksum is not None:
+                self.current_indexed_paths[path] = indexed_checksum
+            if cache is not None:
+                self.workspace_stat_cache[path] = cache
+        index.close()
+        self.__replay_index_journal(c)
+
+    def __replay_index_journal(self, c: Constants, relative_paths: set = None):
+        for relative_path, indexed_checksum, cache in read_index_journal(c.index_journal_path):  # later entry wins
+            if relative_path is None:
+                self.fsmonitor_token = indexed_checksum  # token record
+                continue
+            if relative_paths is not None and relative_path not in relative_paths:
+                continue
+            path = c.workspace_path / relative_path
+            if self.current_indexed_paths.pop(path, None) != indexed_checksum:
+                self.invalidate_cache_tree(relative_path)
+            self.workspace_stat_cache.pop(path, None)
+            if indexed_checksum is not None:
+                self.current_indexed_paths[path] = indexed_checksum
+            if cache is not None:
+                self.workspace_stat_cache[path] = cache
+
+    def __create_legacy_current_index(self, content: str, c: Constants):
+        if content == "":
+            return
+
+        for buffer in content.split("\n"):
+            record = buffer.split(" ", 2)
+            if len(record) == 2:  # index written before stat cache was introduced: "path checksum"
+                self.current_indexed_paths[c.workspace_path / record[0]] = record[1]
+            elif record[0] == "i":
+                self.current_indexed_paths[c.workspace_path / record[2]] = record[1]
+            elif record[0] == "f":
+                self.fsmonitor_token = record[1] + " " + record[2]
             else:
-                self.__add_directory_in_ignored(child)
+                record = buffer.split(" ", 7)
+                stat_key = tuple(int(value) for value in record[2:7])
+                self.workspace_stat_cache[c.workspace_path / record[7]] = (record[1], stat_key)
 
     @staticmethod
     def __create_index(index: dict, content: str, c: Constants):
         if content != "":
             for buffer in content.split("\n"):
-                pair_path_blob = buffer.split()
-                blob_path = c.workspace_path / pair_path_blob[0]
-                blob_checksum = pair_path_blob[1]
-                index[blob_path] = blob_checksum
+                path, blob_checksum = buffer.rsplit(" ", 1)  # path could contain spaces
+                index[c.workspace_path / path] = blob_checksum
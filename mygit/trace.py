@@ -0,0 +1,104 @@
+import json
+import os
+import sys
+from time import perf_counter
+
+TRACE_OPTIONS = ("--trace", "--trace-file", "--profile")
+
+enabled = False  # checked by every timer and counter, so disabled tracing costs one global lookup
+phases = {}  # name -> [seconds, calls], nested phases are counted in their parents too
+counters = {}
+profiler = None
+
+
+class Phase:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = perf_counter()
+
+    def __exit__(self, *exception):
+        timer = phases.setdefault(self.name, [0.0, 0])
+        timer[0] += perf_counter() - self.start
+        timer[1] += 1
+
+
+class DisabledPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exception):
+        pass
+
+
+DISABLED_PHASE = DisabledPhase()
+
+
+def phase(name: str):
+    return Phase(name) if enabled else DISABLED_PHASE
+
+
+def count(name: str, value: int = 1):
+    if enabled:
+        counters[name] = counters.get(name, 0) + value
+
+
+def is_requested(sys_args: list):
+    # forwarded commands are traced by nobody, so tracing keeps command in this process
+    if os.environ.get("MYGIT_TRACE", "0") not in ("", "0") or os.environ.get("MYGIT_PROFILE"):
+        return True
+    return any(arg.split("=", 1)[0] in TRACE_OPTIONS for arg in sys_args)
+
+
+def get_report_path(trace: bool, trace_file: str):
+    # "-" is stderr; $MYGIT_TRACE is 1 for stderr or a file path
+    if trace_file is not None:
+        return trace_file
+    if trace:
+        return "-"
+    variable = os.environ.get("MYGIT_TRACE", "0")
+    if variable in ("", "0"):
+        return None
+    return "-" if variable == "1" else variable
+
+
+def start(report_path: str, profile_path: str):
+    global enabled, profiler
+    phases.clear()
+    counters.clear()
+    enabled = report_path is not None or profile_path is not None
+    if profile_path is not None:
+        import cProfile  # profiler is imported only when it is asked for
+        profiler = cProfile.Profile()
+        profiler.enable()
+    return perf_counter()
+
+
+def finish(command_name: str, start_time: float, report_path: str, profile_path: str):
+    global enabled, profiler
+    wall_time = perf_counter() - start_time
+    enabled = False
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(profile_path)
+        profiler = None
+    if report_path is None:
+        return
+
+    report = json.dumps({
+        "command": command_name,
+        "wall_time": wall_time,
+        "phases": {name: {"time": phases[name][0], "calls": phases[name][1]} for name in sorted(phases)},
+        "counters": dict(sorted(counters.items())),
+    }, indent=2)
+    if report_path == "-":
+        sys.stderr.write(report + "\n")
+    else:
+        with open(report_path, "w") as report_file:
+            report_file.write(report + "\n")
@@ -0,0 +1,36 @@
+import os
+from mygit import trace
+from mygit.ignore import IgnoreRules
+from pathlib import Path
+
+
+def walk(dir_path: Path, ignore_rules: IgnoreRules, with_stat: bool = False):
+    # yields (directory, [(file, stat or None)], [subdirectory], [ignored child]) with parents before children,
+    # entry types come from scandir, so only files are stat'ed and only when asked
+    pending = [(dir_path, get_relative_prefix(dir_path, ignore_rules.workspace_path))]
+    while len(pending) > 0:
+        directory_path, prefix = pending.pop()
+        files = []
+        directories = []
+        ignored = []
+        with os.scandir(directory_path) as entries:
+            for entry in entries:
+                is_dir = entry.is_dir()
+                path = directory_path / entry.name
+                if ignore_rules.matches_relative(prefix + entry.name, entry.name, is_dir):
+                    ignored.append(path)
+                elif is_dir:
+                    directories.append(path)
+                    pending.append((path, prefix + entry.name + "/"))
+                else:
+                    files.append((path, entry.stat() if with_stat else None))
+        trace.count("directories_read")
+        if with_stat:
+            trace.count("files_stated", len(files))
+        yield directory_path, files, directories, ignored
+
+
+def get_relative_prefix(dir_path: Path, workspace_path: Path):
+    if dir_path == workspace_path:
+        return ""
+    return dir_path.relative_to(workspace_path).as_posix() + "/"
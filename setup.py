@@ -6,6 +6,6 @@ setup(
     author='7Bpencil',
     author_email='efagot32@gmail.com',
     description='small git-like vcs',
-    entry_points={'console_scripts': ['mygit = mygit.main:start']},
+    entry_points={'console_scripts': ['mygit = mygit.client:start']},
     packages=find_packages()
 )
@@ -0,0 +1,78 @@
+import logging
+import mygit.backend as backend
+import mygit.main as mygit
+import pytest
+import tempfile
+
+from test_utils import *
+from mygit.bloom import ChangedPathFilters, create_filter, get_changed_path_keys, get_path_hashes, \
+    MAX_CHANGED_PATHS, TOO_MANY_PATHS
+from mygit.constants import Constants
+from mygit.log_file import COLOR_PATTERN
+from pathlib import Path
+from shlex import split as shlex_split
+
+
+class TestBloom:
+    def setup_class(self):
+        self.cwd = tempfile.TemporaryDirectory()
+        self.cwd_path = Path(self.cwd.name)
+        self.constants = Constants(self.cwd_path)
+
+    def teardown_class(self):
+        self.cwd.cleanup()
+        pass
+
+    def teardown_method(self, method):
+        clean_directory(self.cwd_path)
+        pass
+
+    def create_history(self):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        write_file(self.cwd_path, "src/a.txt", "a")
+        write_file(self.cwd_path, "src/b.txt", "b")
+        write_file(self.cwd_path, "docs/c.txt", "c")
+        commits = {"first": commit(self.cwd_path, "first")}
+        write_file(self.cwd_path, "src/a.txt", "a2")
+        commits["second"] = commit(self.cwd_path, "second")
+        write_file(self.cwd_path, "docs/c.txt", "c2")
+        commits["third"] = commit(self.cwd_path, "third")
+        Path.unlink(self.cwd_path / "src" / "b.txt")
+        commits["fourth"] = commit(self.cwd_path, "fourth")
+        return commits
+
+    def get_logged_messages(self, caplog, args: str):
+        caplog.clear()
+        mygit.main(self.cwd_path, shlex_split(f"log -o {args}"))
+        return [COLOR_PATTERN.sub("", record.getMessage()).rsplit(" ", 1)[1] for record in caplog.records]
+
+    def test_log_is_limited_to_paths(self, caplog):
+        caplog.set_level(logging.INFO)
+        self.create_history()
+        assert self.get_logged_messages(caplog, "-- src/a.txt") == ["second", "first"]
+        assert self.get_logged_messages(caplog, "-- src/") == ["fourth", "second", "first"]
+        assert self.get_logged_messages(caplog, "docs src/b.txt") == ["fourth", "third", "first"]
+        assert self.get_logged_messages(caplog, "-- missing.txt") == []
+        assert len(self.get_logged_messages(caplog, "-- .")) == 5  # init commit too
+
+    def test_filters_skip_untouched_commits(self):
+        commits = self.create_history()
+        filters = ChangedPathFilters(self.constants)
+        a_hashes = [get_path_hashes("src/a.txt")]
+        assert filters.might_touch(commits["second"], a_hashes)
+        assert not filters.might_touch(commits["third"], a_hashes)
+        assert not filters.might_touch(commits["fourth"], a_hashes)
+        assert filters.might_touch(commits["fourth"], [get_path_hashes("src")])
+        assert filters.might_touch("0" * 40, a_hashes)  # commit without filter may touch anything
+
+    def test_log_without_filters(self, caplog):
+        caplog.set_level(logging.INFO)
+        self.create_history()
+        Path.unlink(self.constants.changed_path_filters_path)
+        assert self.get_logged_messages(caplog, "-- src/a.txt") == ["second", "first"]
+
+    def test_big_commits_have_no_filter(self):
+        assert get_changed_path_keys(["a/b/c.txt", "a/d.txt"]) == {"a/b/c.txt", "a/b", "a", "a/d.txt"}
+        assert create_filter({f"file{i}" for i in range(MAX_CHANGED_PATHS + 1)}) == (TOO_MANY_PATHS, b"")
+        flags, bits = create_filter({"a"})
+        assert flags == 0 and len(bits) == 8
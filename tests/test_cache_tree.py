@@ -0,0 +1,96 @@
+import mygit.backend as backend
+import mygit.main as mygit
+import pytest
+import tempfile
+
+from test_utils import *
+from mygit.constants import Constants
+from mygit.state import State
+from pathlib import Path
+from shlex import split as shlex_split
+
+
+class TestCacheTree:
+    def setup_class(self):
+        self.cwd = tempfile.TemporaryDirectory()
+        self.cwd_path = Path(self.cwd.name)
+        self.constants = Constants(self.cwd_path)
+
+    def teardown_class(self):
+        self.cwd.cleanup()
+        pass
+
+    def teardown_method(self, method):
+        clean_directory(self.cwd_path)
+        pass
+
+    def load_state(self):
+        state = State()
+        state.load_cache(self.constants, backend.get_last_commit_index_content(self.constants))
+        return state
+
+    def get_last_tree_checksum(self):
+        return backend.get_last_tree_checksum(backend.get_current_branch_path(self.constants), self.constants)
+
+    def create_history(self):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        for directory in ("src/lib", "src/app", "docs"):
+            for i in range(3):
+                write_file(self.cwd_path, f"{directory}/file{i}.txt", f"{directory} {i}")
+        commit(self.cwd_path, "first")
+
+    def test_commit_fills_cache_tree(self):
+        self.create_history()
+        state = self.load_state()
+        assert state.cache_tree_commit == backend.get_last_commit_checksum(
+            backend.get_current_branch_path(self.constants))
+        assert sorted(state.cache_tree) == ["", "docs", "src", "src/app", "src/lib"]
+        assert state.cache_tree[""][0] == self.get_last_tree_checksum()
+        assert state.cache_tree["src"][1] == 2  # app and lib trees
+
+    def test_indexing_invalidates_only_ancestors(self):
+        self.create_history()
+        write_file(self.cwd_path, "src/lib/file1.txt", "changed")
+        mygit.main(self.cwd_path, shlex_split("index src/lib/file1.txt"))  # goes into index journal
+
+        state = self.load_state()
+        assert sorted(state.cache_tree) == ["docs", "src/app"]
+
+        mygit.main(self.cwd_path, shlex_split("reset -i src/lib/file1.txt"))
+        assert sorted(self.load_state().cache_tree) == ["docs", "src/app"]  # reset can't bring trees back
+
+    def test_commit_writes_only_changed_trees(self, monkeypatch):
+        self.create_history()
+        write_file(self.cwd_path, "src/lib/file1.txt", "changed")
+        mygit.main(self.cwd_path, shlex_split("index src/lib/file1.txt"))
+
+        written_trees = []
+        original_write_object = backend.write_object
+
+        def counting_write_object(content_raw: bytes, object_type: str, c: Constants):
+            if object_type == "tree":
+                written_trees.append(content_raw)
+            return original_write_object(content_raw, object_type, c)
+        monkeypatch.setattr("mygit.backend.write_object", counting_write_object)
+
+        mygit.main(self.cwd_path, shlex_split("commit second"))
+        assert len(written_trees) == 3  # src/lib, src and workspace
+
+        state = self.load_state()
+        cached_tree_checksum = state.cache_tree[""][0]
+        state.cache_tree.clear()
+        assert backend.create_tree(state.cache_tree_commit, {}, self.constants, state) == cached_tree_checksum
+        assert cached_tree_checksum == self.get_last_tree_checksum()
+
+    def test_cache_tree_of_other_commit_is_ignored(self):
+        self.create_history()
+        mygit.main(self.cwd_path, shlex_split("checkout -n dev"))
+        write_file(self.cwd_path, "docs/file0.txt", "changed")
+        commit(self.cwd_path, "second")
+        mygit.main(self.cwd_path, shlex_split("checkout master"))
+
+        write_file(self.cwd_path, "src/app/file0.txt", "changed")
+        commit(self.cwd_path, "third")
+        tree = backend.get_tree_content(self.get_last_tree_checksum(), self.constants)
+        docs_tree = backend.get_tree_content(tree["tree"][self.cwd_path / "docs"], self.constants)
+        assert docs_tree["blob"][self.cwd_path / "docs" / "file0.txt"] == get_blob_checksum(b"docs 0")
@@ -0,0 +1,127 @@
+import mygit.backend as backend
+import mygit.main as mygit
+import os
+import pytest
+import tempfile
+
+from test_utils import *
+from mygit.constants import Constants
+from mygit.state import State
+from pathlib import Path
+from shlex import split as shlex_split
+
+
+class TestCheckout:
+    def setup_class(self):
+        self.cwd = tempfile.TemporaryDirectory()
+        self.cwd_path = Path(self.cwd.name)
+        self.constants = Constants(self.cwd_path)
+
+    def teardown_class(self):
+        self.cwd.cleanup()
+        pass
+
+    def teardown_method(self, method):
+        clean_directory(self.cwd_path)
+        pass
+
+    def read_file(self, name: str):
+        with Path.open(self.cwd_path / name, "r") as test_file:
+            return test_file.read()
+
+    def create_branches(self):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        write_file(self.cwd_path, "src/main.py", "print('hello world')")
+        write_file(self.cwd_path, "src/lib/util.py", "x = 1")
+        write_file(self.cwd_path, "readme.md", "hello world")
+        commit(self.cwd_path, "first")
+        mygit.main(self.cwd_path, shlex_split("checkout -n dev"))
+
+        write_file(self.cwd_path, "readme.md", "goodbye world")
+        (self.cwd_path / "src" / "lib" / "util.py").unlink()
+        write_file(self.cwd_path, "docs/guide.md", "read me")
+        commit(self.cwd_path, "second")
+
+    def set_old_mtime(self, name: str):
+        os.utime(self.cwd_path / name, ns=(10 ** 9, 10 ** 9))
+
+    def test_checkout_touches_only_changed_files(self):
+        self.create_branches()
+        self.set_old_mtime("src/main.py")
+
+        mygit.main(self.cwd_path, shlex_split("checkout master"))
+        assert (self.cwd_path / "src" / "main.py").stat().st_mtime_ns == 10 ** 9  # unchanged file was kept
+        assert self.read_file("readme.md") == "hello world"
+        assert self.read_file("src/lib/util.py") == "x = 1"
+        assert not (self.cwd_path / "docs").exists()  # emptied directory was removed
+
+        mygit.main(self.cwd_path, shlex_split("checkout dev"))
+        assert (self.cwd_path / "src" / "main.py").stat().st_mtime_ns == 10 ** 9
+        assert self.read_file("readme.md") == "goodbye world"
+        assert self.read_file("docs/guide.md") == "read me"
+        assert not (self.cwd_path / "src" / "lib").exists()
+        state = get_current_state(self.constants)
+        assert state.status_not_indexed_paths == []
+
+    def test_merge_touches_only_changed_files(self):
+        self.create_branches()
+        mygit.main(self.cwd_path, shlex_split("checkout master"))
+        self.set_old_mtime("src/main.py")
+
+        mygit.main(self.cwd_path, shlex_split("merge dev"))
+        assert (self.cwd_path / "src" / "main.py").stat().st_mtime_ns == 10 ** 9
+        assert self.read_file("readme.md") == "goodbye world"
+        assert not (self.cwd_path / "src" / "lib").exists()
+        state = get_current_state(self.constants)
+        assert state.status_not_indexed_paths == []
+
+    def test_reset_restores_only_changed_files(self):
+        self.create_branches()
+        self.set_old_mtime("src/main.py")
+        write_file(self.cwd_path, "readme.md", "changed")
+        write_file(self.cwd_path, "new/file.txt", "not tracked")
+        (self.cwd_path / "docs" / "guide.md").unlink()
+
+        mygit.main(self.cwd_path, shlex_split("reset"))
+        assert (self.cwd_path / "src" / "main.py").stat().st_mtime_ns == 10 ** 9
+        assert self.read_file("readme.md") == "goodbye world"
+        assert self.read_file("docs/guide.md") == "read me"
+        assert not (self.cwd_path / "new").exists()
+        state = get_current_state(self.constants)
+        assert state.status_not_indexed_paths == []
+
+    def test_parallel_checkout_of_many_files(self, monkeypatch):
+        monkeypatch.setattr("mygit.hashing.PARALLEL_MIN_FILES", 4)
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        mygit.main(self.cwd_path, shlex_split("checkout -n dev"))
+        for i in range(40):
+            write_file(self.cwd_path, f"dir{i % 4}/file{i}.txt", f"content {i}")
+        commit(self.cwd_path, "many")
+        mygit.main(self.cwd_path, shlex_split("checkout master"))
+        assert not (self.cwd_path / "dir0").exists()
+
+        mygit.main(self.cwd_path, shlex_split("-j 4 checkout dev"))
+        for i in range(40):
+            assert self.read_file(f"dir{i % 4}/file{i}.txt") == f"content {i}"
+        state = get_current_state(self.constants)
+        assert state.status_not_indexed_paths == []
+
+    def test_write_errors_are_reported_in_path_order(self, monkeypatch, caplog):
+        monkeypatch.setattr("mygit.hashing.PARALLEL_MIN_FILES", 4)
+        self.create_branches()
+        mygit.main(self.cwd_path, shlex_split("checkout master"))
+
+        original_expand_blob = backend.expand_blob
+
+        def failing_expand_blob(blob_checksum: str, target_filename: Path, c: Constants):
+            if target_filename.suffix == ".md":
+                raise OSError(28, "No space left on device")
+            original_expand_blob(blob_checksum, target_filename, c)
+        monkeypatch.setattr("mygit.backend.expand_blob", failing_expand_blob)
+
+        caplog.clear()
+        mygit.main(self.cwd_path, shlex_split("-j 4 checkout dev"))
+        errors = [record.getMessage() for record in caplog.records if "couldn't write" in record.getMessage()]
+        assert len(errors) == 2
+        assert "docs/guide.md" in errors[0] and "readme.md" in errors[1]
+        assert backend.get_current_branch_name(self.constants) == "master"  # head stays on failed checkout
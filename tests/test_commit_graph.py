@@ -0,0 +1,93 @@
+import mygit.backend as backend
+import mygit.main as mygit
+import pytest
+import tempfile
+
+from test_utils import *
+from mygit.commit_graph import CommitGraph, NO_PARENT, is_ancestor, write_empty_commit_graph
+from mygit.constants import Constants
+from mygit.state import State
+from pathlib import Path
+from shlex import split as shlex_split
+
+
+class TestCommitGraph:
+    def setup_class(self):
+        self.cwd = tempfile.TemporaryDirectory()
+        self.cwd_path = Path(self.cwd.name)
+        self.constants = Constants(self.cwd_path)
+
+    def teardown_class(self):
+        self.cwd.cleanup()
+        pass
+
+    def teardown_method(self, method):
+        clean_directory(self.cwd_path)
+        pass
+
+    def create_history(self):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        commits = [backend.get_last_commit_checksum(backend.get_current_branch_path(self.constants))]
+        for i in range(3):
+            write_file(self.cwd_path, "readme.md", f"version {i}")
+            commits.append(commit(self.cwd_path, f"version{i}"))
+        return commits
+
+    def test_commits_are_appended_to_graph(self):
+        commits = self.create_history()
+
+        graph = CommitGraph(self.constants)
+        assert graph.count == len(commits)
+        for generation, commit_checksum in enumerate(commits, start=1):
+            position = graph.find_position(commit_checksum)
+            assert position is not None
+            assert graph.get_generation(position) == generation
+            parent_position = graph.get_parent_position(position)
+            assert parent_position == (NO_PARENT if generation == 1 else graph.find_position(commits[generation - 2]))
+            assert graph.get_record(position)[2].hex() == backend.get_tree_checksum(commit_checksum, self.constants)
+            assert graph.find_position(graph.get_record(position)[2].hex()) is None  # trees aren't commits
+
+    def test_ancestry_checks(self):
+        commits = self.create_history()
+
+        assert is_ancestor(commits[0], commits[-1], self.constants)
+        assert is_ancestor(commits[1], commits[2], self.constants)
+        assert is_ancestor(commits[2], commits[2], self.constants)
+        assert not is_ancestor(commits[-1], commits[0], self.constants)
+        assert is_ancestor("0" * 40, commits[0], self.constants) is None  # unknown commits are left to callers
+
+    def test_merge_falls_back_to_objects_without_graph(self):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        mygit.main(self.cwd_path, shlex_split("checkout -n dev"))
+        with Path.open(self.cwd_path / "readme.md", "w") as test_file:
+            test_file.write("hello world")
+        commit(self.cwd_path, "second")
+        mygit.main(self.cwd_path, shlex_split("checkout master"))
+
+        write_empty_commit_graph(self.constants)
+        mygit.main(self.cwd_path, shlex_split("merge dev"))
+        with Path.open(self.cwd_path / "readme.md", "r") as test_file:
+            assert test_file.read() == "hello world"
+
+    def test_graph_is_rebuilt_from_history(self):
+        commits = self.create_history()
+        appended_records = CommitGraph(self.constants).get_raw_records()
+
+        backend.rebuild_commit_graph(self.constants)
+        graph = CommitGraph(self.constants)
+        assert graph.get_raw_records() == appended_records
+        assert graph.indexed == len(commits)  # rebuilt graph has every record in lookup table
+        assert is_ancestor(commits[0], commits[-1], self.constants)
+
+    def test_lookup_table_is_rewritten(self, monkeypatch):
+        monkeypatch.setattr("mygit.commit_graph.MAX_UNINDEXED_RECORDS", 2)
+        commits = self.create_history()
+        graph = CommitGraph(self.constants)
+        assert (graph.count, graph.indexed) == (4, 3)  # init commit, two appended, then rewrite with third
+
+        for position, commit_checksum in enumerate(commits):
+            assert graph.find_position(commit_checksum) == position
+        assert graph.unindexed_positions == {bytes.fromhex(commits[3]): 3}  # only tail was read record by record
+        assert graph.find_position("0" * 40) is None
+        assert graph.find_position("f" * 40) is None
+
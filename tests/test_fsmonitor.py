@@ -0,0 +1,140 @@
+import mygit.backend as backend
+import mygit.main as mygit
+import os
+import pytest
+import sys
+import tempfile
+
+from test_utils import *
+from mygit.constants import Constants
+from mygit.fsmonitor import query_fsmonitor
+from mygit.state import State
+from pathlib import Path
+from shlex import split as shlex_split
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="filesystem monitor uses inotify")
+class TestFSMonitor:
+    def setup_class(self):
+        self.cwd = tempfile.TemporaryDirectory()
+        self.cwd_path = Path(self.cwd.name)
+        self.constants = Constants(self.cwd_path)
+
+    def teardown_class(self):
+        self.cwd.cleanup()
+        pass
+
+    def teardown_method(self, method):
+        mygit.main(self.cwd_path, shlex_split("fsmonitor --stop"))
+        clean_directory(self.cwd_path)
+        pass
+
+    def create_repository(self):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        for i in range(10):
+            write_file(self.cwd_path, f"src/module{i}.py", f"x = {i}")
+        commit(self.cwd_path, "first")
+        mygit.main(self.cwd_path, shlex_split("fsmonitor --start"))
+        assert query_fsmonitor("", self.constants) is not None
+
+    def get_status_walking(self, monkeypatch):
+        walked_directories = []
+        original_scandir = os.scandir
+
+        def scandir(path):
+            walked_directories.append(Path(path))
+            return original_scandir(path)
+        monkeypatch.setattr(os, "scandir", scandir)
+        state = get_current_state(self.constants)
+        monkeypatch.undo()
+        return state, walked_directories
+
+    def test_status_looks_only_at_changed_paths(self, monkeypatch):
+        self.create_repository()
+        state, walked_directories = self.get_status_walking(monkeypatch)  # takes first token
+        assert self.cwd_path in walked_directories
+        assert state.status_not_indexed_paths == []
+
+        write_file(self.cwd_path, "src/module3.py", "x = 'changed'")
+        (self.cwd_path / "src" / "module5.py").unlink()
+        write_file(self.cwd_path, "docs/guide/intro.md", "hello")
+
+        state, walked_directories = self.get_status_walking(monkeypatch)
+        assert sorted(walked_directories) == [self.cwd_path / "docs", self.cwd_path / "docs" / "guide"]  # only new
+        assert sorted(state.status_not_indexed_paths) == [
+            "deleted: src/module5.py", "modified: docs/guide/intro.md", "modified: src/module3.py"]
+
+        state, walked_directories = self.get_status_walking(monkeypatch)
+        assert walked_directories == []
+        assert len(state.status_not_indexed_paths) == 3
+
+    def test_index_all_uses_monitor(self, monkeypatch):
+        self.create_repository()
+        get_current_state(self.constants)
+        write_file(self.cwd_path, "src/module1.py", "x = 'changed'")
+        write_file(self.cwd_path, "src/new.py", "y = 1")
+
+        mygit.main(self.cwd_path, shlex_split("index -a"))
+        state = get_current_state(self.constants)
+        assert sorted(path.name for path in state.current_indexed_paths) == ["module1.py", "new.py"]
+        assert state.status_not_indexed_paths == []
+
+    def test_ignore_rules_change_needs_full_walk(self, monkeypatch):
+        self.create_repository()
+        get_current_state(self.constants)
+        write_file(self.cwd_path, "build/out.o", "binary")
+        with Path.open(self.constants.mygit_ignore_path, "a") as ignore:
+            ignore.write("\nbuild/\n")
+
+        state, walked_directories = self.get_status_walking(monkeypatch)
+        assert self.cwd_path in walked_directories
+        assert state.status_not_indexed_paths == ["modified: .mygit_ignore"]
+
+    def test_status_order_does_not_depend_on_monitor(self):
+        self.create_repository()
+        get_current_state(self.constants)  # takes first token
+        for path in ("src/module7.py", "docs/intro.md", "src/module1.py", "build.py", "docs/api/index.md"):
+            write_file(self.cwd_path, path, "changed")
+        (self.cwd_path / "src" / "module4.py").unlink()
+
+        monitored = get_current_state(self.constants).status_not_indexed_paths
+        mygit.main(self.cwd_path, shlex_split("fsmonitor --stop"))
+        walked = get_current_state(self.constants).status_not_indexed_paths
+        assert monitored == walked
+        assert walked[:5] == ["modified: build.py", "modified: docs/api/index.md", "modified: docs/intro.md",
+                              "modified: src/module1.py", "modified: src/module7.py"]
+
+    def test_status_walks_workspace_without_monitor(self, monkeypatch):
+        self.create_repository()
+        get_current_state(self.constants)
+        mygit.main(self.cwd_path, shlex_split("fsmonitor --stop"))
+        write_file(self.cwd_path, "src/module2.py", "x = 'changed'")
+
+        state, walked_directories = self.get_status_walking(monkeypatch)
+        assert self.cwd_path in walked_directories
+        assert state.status_not_indexed_paths == ["modified: src/module2.py"]
+        assert state.fsmonitor_token == ""
+
+    def test_token_is_appended_to_journal(self, monkeypatch):
+        self.create_repository()
+        get_current_state(self.constants)  # takes first token, index is rewritten with the new stat cache
+        index_stat = self.constants.mygit_index_path.stat()
+        write_file(self.cwd_path, "src/module4.py", "x = 'changed'")
+
+        stated_paths = []
+        original_exists = Path.exists
+
+        def exists(path):
+            stated_paths.append(path)
+            return original_exists(path)
+        monkeypatch.setattr(Path, "exists", exists)
+        state = get_current_state(self.constants)
+        monkeypatch.undo()
+        assert state.status_not_indexed_paths == ["modified: src/module4.py"]
+        assert not any(path.parent.name == "src" for path in stated_paths)  # committed files are trusted
+
+        assert self.constants.mygit_index_path.stat().st_ino == index_stat.st_ino  # index wasn't rewritten
+        assert self.constants.index_journal_path.exists()
+        reloaded_state = State()
+        reloaded_state.load_cache(self.constants, "")
+        assert reloaded_state.fsmonitor_token == state.fsmonitor_token != ""
@@ -0,0 +1,117 @@
+import logging
+import mygit.backend as backend
+import mygit.main as mygit
+import os
+import pytest
+import tempfile
+
+from test_utils import *
+from mygit.constants import Constants
+from mygit.objects import object_exists, iterate_loose_objects, get_object_path, write_object
+from mygit.pack import get_packs
+from pathlib import Path
+from shlex import split as shlex_split
+
+
+class TestGc:
+    def setup_class(self):
+        self.cwd = tempfile.TemporaryDirectory()
+        self.cwd_path = Path(self.cwd.name)
+        self.constants = Constants(self.cwd_path)
+
+    def teardown_class(self):
+        self.cwd.cleanup()
+        pass
+
+    def teardown_method(self, method):
+        clean_directory(self.cwd_path)
+        pass
+
+    def create_removed_branch(self):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        write_file(self.cwd_path, "src/main.txt", "main")
+        master_commit = commit(self.cwd_path, "first")
+        mygit.main(self.cwd_path, shlex_split("checkout -n dev"))
+        write_file(self.cwd_path, "src/dev/feature.txt", "feature")
+        dev_commit = commit(self.cwd_path, "feature")
+        mygit.main(self.cwd_path, shlex_split("checkout master"))
+        mygit.main(self.cwd_path, shlex_split("branch -r dev"))
+        return master_commit, dev_commit
+
+    def test_removed_branch_is_collected(self):
+        master_commit, dev_commit = self.create_removed_branch()
+        feature_blob = get_blob_checksum(b"feature")
+        mygit.main(self.cwd_path, shlex_split("gc"))  # everything is younger than grace period
+        assert object_exists(dev_commit, self.constants) and object_exists(feature_blob, self.constants)
+
+        mygit.main(self.cwd_path, shlex_split("gc --now"))
+        assert not object_exists(dev_commit, self.constants)
+        assert not object_exists(feature_blob, self.constants)
+        assert object_exists(master_commit, self.constants)
+        assert object_exists(get_blob_checksum(b"main"), self.constants)
+        assert len(list(iterate_loose_objects(self.constants))) == 7  # init and first commits, three trees, two blobs
+
+        write_file(self.cwd_path, "src/main.txt", "changed")
+        commit(self.cwd_path, "second")
+        assert not backend.has_uncommitted_changes(self.constants, get_current_state(self.constants))
+
+    def test_orphan_index_blobs_are_collected(self):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        write_file(self.cwd_path, "file.txt", "indexed")
+        mygit.main(self.cwd_path, shlex_split("index file.txt"))
+        orphan_paths = [self.constants.mygit_index_dir_path / get_blob_checksum(b"orphan"),
+                        self.constants.mygit_index_dir_path / "interrupted.tmp"]  # left by killed commands
+        for orphan_path in orphan_paths:
+            Path.open(orphan_path, "wb").close()
+
+        mygit.main(self.cwd_path, shlex_split("gc --now"))
+        assert not any(orphan_path.exists() for orphan_path in orphan_paths)
+        assert (self.constants.mygit_index_dir_path / get_blob_checksum(b"indexed")).exists()
+        commit(self.cwd_path, "first")
+        assert object_exists(get_blob_checksum(b"indexed"), self.constants)
+
+    def test_packs_are_rewritten(self, caplog):
+        caplog.set_level(logging.INFO)
+        master_commit, dev_commit = self.create_removed_branch()
+        mygit.main(self.cwd_path, shlex_split("pack -a"))
+        old_pack_names = [pack.name for pack in get_packs(self.constants)]
+
+        mygit.main(self.cwd_path, shlex_split("gc --now -n"))
+        assert "would remove 0 loose objects, 5 packed objects" in caplog.messages[-1]
+        assert [pack.name for pack in get_packs(self.constants)] == old_pack_names
+        removed_size = caplog.messages[-1].rsplit("(", 1)[1]
+
+        mygit.main(self.cwd_path, shlex_split("gc --now"))
+        assert caplog.messages[-1].rsplit("(", 1)[1] == removed_size  # dry run reports the same size
+        packs = get_packs(self.constants)
+        assert len(packs) == 1 and packs[0].name not in old_pack_names
+        assert not object_exists(dev_commit, self.constants)
+        assert backend.get_tree_content(backend.get_tree_checksum(master_commit, self.constants), self.constants)
+
+    def test_rewritten_objects_are_kept(self):
+        master_commit, dev_commit = self.create_removed_branch()
+        feature_blob = get_blob_checksum(b"feature")
+        for checksum in iterate_loose_objects(self.constants):
+            os.utime(get_object_path(checksum, self.constants), (0, 0))  # everything is older than grace period
+
+        assert write_object(b"feature", "blob", self.constants) == feature_blob  # command is writing it again
+        mygit.main(self.cwd_path, shlex_split("gc --grace 1d"))
+        assert object_exists(feature_blob, self.constants)
+        assert not object_exists(dev_commit, self.constants)
+
+    def test_parallel_marking(self, monkeypatch):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        for i in range(20):
+            write_file(self.cwd_path, f"dir{i}/file.txt", f"file {i}")
+        commit(self.cwd_path, "first")
+        mygit.main(self.cwd_path, shlex_split("checkout -n dev"))
+        write_file(self.cwd_path, "dir0/file.txt", "changed")
+        dev_commit = commit(self.cwd_path, "second")
+        mygit.main(self.cwd_path, shlex_split("checkout master"))
+        serial_reachable = backend.mark_reachable_objects(self.constants, get_current_state(self.constants))
+
+        monkeypatch.setattr("mygit.hashing.PARALLEL_MIN_FILES", 2)
+        state = get_current_state(self.constants)
+        state.workers = 2
+        assert backend.mark_reachable_objects(self.constants, state) == serial_reachable
+        assert dev_commit in serial_reachable and len(serial_reachable) == 3 + 24 + 22  # commits, trees, blobs
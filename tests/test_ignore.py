@@ -0,0 +1,90 @@
+import logging
+import mygit.backend as backend
+import mygit.main as mygit
+import os
+import pytest
+import tempfile
+
+from test_utils import *
+from mygit.constants import Constants
+from mygit.ignore import IgnoreRules
+from mygit.state import State
+from pathlib import Path
+from shlex import split as shlex_split
+
+
+class TestIgnore:
+    def setup_class(self):
+        self.cwd = tempfile.TemporaryDirectory()
+        self.cwd_path = Path(self.cwd.name)
+        self.constants = Constants(self.cwd_path)
+
+    def teardown_class(self):
+        self.cwd.cleanup()
+        pass
+
+    def teardown_method(self, method):
+        clean_directory(self.cwd_path)
+        pass
+
+    def test_patterns(self):
+        rules = IgnoreRules(self.cwd_path, [
+            "# comment\n", "\n", ".mygit\n", "*.o\n", "!keep.o\n", "build/\n", "/local.cfg\n",
+            "docs/**/*.tmp\n", "cache?\n", "log[0-9]\n"])
+
+        def matches(name: str, is_dir: bool = False):
+            return rules.matches(self.cwd_path / name, is_dir)
+
+        assert matches(".mygit", is_dir=True)
+        assert matches("main.o") and matches("src/deep/main.o")
+        assert not matches("keep.o") and not matches("src/keep.o")  # negated by later pattern
+        assert not matches("main.oo") and not matches("main.c")
+        assert matches("build", is_dir=True) and matches("src/build", is_dir=True)
+        assert not matches("build")  # only directories
+        assert matches("local.cfg") and not matches("src/local.cfg")  # anchored to workspace
+        assert matches("docs/a.tmp") and matches("docs/a/b/c.tmp") and not matches("a.tmp")
+        assert matches("cache1") and not matches("cache12")
+        assert matches("log7") and not matches("logs")
+        assert rules.matches_with_parents(self.cwd_path / "build" / "keep.o", False)  # parent can't be re-included
+
+    def test_ignored_directories_are_not_walked(self, monkeypatch):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        with Path.open(self.constants.mygit_ignore_path, "a") as ignore:
+            ignore.write("\nnode_modules/\n*.log\n!important.log\n")
+        for i in range(20):
+            write_file(self.cwd_path, f"node_modules/package{i}/index.js", "module.exports = {}")
+        write_file(self.cwd_path, "src/main.py", "print('hello world')")
+        write_file(self.cwd_path, "src/debug.log", "debug")
+        write_file(self.cwd_path, "src/important.log", "important")
+
+        walked_directories = []
+        original_scandir = os.scandir
+
+        def scandir(path):
+            walked_directories.append(Path(path))
+            return original_scandir(path)
+        monkeypatch.setattr(os, "scandir", scandir)
+
+        mygit.main(self.cwd_path, shlex_split("index -a"))
+        assert self.cwd_path / "src" in walked_directories
+        assert not any("node_modules" in path.parts or ".mygit" in path.parts for path in walked_directories)
+        monkeypatch.undo()
+
+        state = get_current_state(self.constants)
+        assert sorted(path.name for path in state.current_indexed_paths) == [".mygit_ignore", "important.log", "main.py"]
+        assert state.status_not_indexed_paths == []
+
+    def test_ignored_file_is_not_indexed(self, caplog):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        with Path.open(self.constants.mygit_ignore_path, "a") as ignore:
+            ignore.write("\nbuild/\n")
+        write_file(self.cwd_path, "build/out.txt", "output")
+
+        caplog.clear()
+        mygit.main(self.cwd_path, shlex_split("index build/out.txt"))
+        assert any("file has been ignored" in record.getMessage() for record in caplog.records)
+
+        caplog.clear()
+        caplog.set_level(logging.INFO)
+        mygit.main(self.cwd_path, shlex_split("status --ignored"))
+        assert [record.getMessage() for record in caplog.records][-2:] == [".mygit", "build"]
@@ -1,7 +1,10 @@
 import mygit.backend as backend
 import mygit.main as mygit
+import mygit.hashing as hashing
+import os
 import pytest
 import tempfile
+import tracemalloc
 
 from test_utils import *
 from hashlib import sha1
@@ -35,8 +38,7 @@ class TestInit:
             test_file.write("hello world")
 
         with Path.open(test_file_path, "rb") as test_file:
-            content = compress(test_file.read(), -1)
-            test_file_checksum = sha1(content).hexdigest()
+            test_file_checksum = get_blob_checksum(test_file.read())
 
         state = get_current_state(self.constants)
         assert state.status_not_indexed_paths == ['modified: readme.md']
@@ -57,8 +59,7 @@ class TestInit:
             test_file.write("hello world")
 
         with Path.open(test_file_path, "rb") as test_file:
-            content = compress(test_file.read(), -1)
-            test_file_checksum = sha1(content).hexdigest()
+            test_file_checksum = get_blob_checksum(test_file.read())
 
         mygit.main(self.cwd_path, shlex_split("index readme.md"))  # index test file
         mygit.main(self.cwd_path, shlex_split("commit upd_readme"))  # fix file content
@@ -108,6 +109,88 @@ class TestInit:
         assert state.current_indexed_paths == {}
         assert state.status_indexed_paths == []  # we saved all changes
 
+    def test_index_all_in_parallel(self, monkeypatch):
+        monkeypatch.setattr("mygit.hashing.PARALLEL_MIN_FILES", 2)  # small workspace is worth a pool now
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+
+        expected_checksums = {}
+        for i in range(8):
+            test_file_path = self.cwd_path / f"dir{i % 3}" / f"file{i}.txt"
+            test_file_path.parent.mkdir(exist_ok=True)
+            with Path.open(test_file_path, "w") as test_file:
+                test_file.write(f"content {i}" * (i + 1))
+            with Path.open(test_file_path, "rb") as test_file:
+                expected_checksums[test_file_path] = get_blob_checksum(test_file.read())
+
+        state = get_current_state(self.constants)
+        assert len(state.status_not_indexed_paths) == 8
+
+        mygit.main(self.cwd_path, shlex_split("-j 4 index -a"))  # hash and compress with 4 worker processes
+
+        state = get_current_state(self.constants)
+        assert state.status_not_indexed_paths == []
+        assert state.current_indexed_paths == expected_checksums
+        for checksum in expected_checksums.values():
+            assert (self.constants.mygit_index_dir_path / checksum).exists()
+
+    def test_jobs_are_validated(self, monkeypatch, capsys):
+        monkeypatch.setenv("MYGIT_JOBS", "many")
+        assert mygit.create_parser().parse_args([]).jobs == (os.cpu_count() or 1)
+        assert "MYGIT_JOBS is ignored" in capsys.readouterr().err
+        monkeypatch.setenv("MYGIT_JOBS", "3")
+        assert mygit.create_parser().parse_args([]).jobs == 3
+        with pytest.raises(SystemExit):
+            mygit.create_parser().parse_args(["-j", "0"])
+
+    def test_index_large_file_in_chunks(self, monkeypatch):
+        monkeypatch.setattr("mygit.hashing.CHUNK_SIZE", 1000)  # force many chunks
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+
+        test_file_path = self.cwd_path / "asset.bin"
+        content = os.urandom(50000) + b"repeated data " * 10000
+        with Path.open(test_file_path, "wb") as test_file:
+            test_file.write(content)
+        test_file_checksum = get_blob_checksum(content)
+
+        mygit.main(self.cwd_path, shlex_split("index asset.bin"))
+
+        state = get_current_state(self.constants)
+        assert state.current_indexed_paths.get(test_file_path) == test_file_checksum
+        with Path.open(self.constants.mygit_index_dir_path / test_file_checksum, "rb") as blob:
+            assert decompress(blob.read()) == content
+        assert [path.name for path in self.constants.mygit_index_dir_path.glob("*.tmp")] == []
+
+    def test_hash_file_in_bounded_memory(self):
+        test_file_path = self.cwd_path / "asset.bin"
+        with Path.open(test_file_path, "wb") as test_file:
+            for _ in range(32):
+                test_file.write(os.urandom(1024 * 1024))
+
+        tracemalloc.start()
+        hashing.checksum_file(str(test_file_path))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert peak < 8 * hashing.CHUNK_SIZE  # doesn't depend on 32 MiB file size
+
+    def test_file_changing_while_read_is_skipped(self, monkeypatch, caplog):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        test_file_path = self.cwd_path / "growing.log"
+        with Path.open(test_file_path, "wb") as test_file:
+            test_file.write(b"first line\n")
+        original_fstat = os.fstat
+
+        def growing_fstat(descriptor: int):  # file always seems to be appended to while it's read
+            file_stat = original_fstat(descriptor)
+            return os.stat_result(file_stat[:6] + (file_stat.st_size + 1,) + file_stat[7:])
+        monkeypatch.setattr("mygit.hashing.os.fstat", growing_fstat)
+
+        mygit.main(self.cwd_path, shlex_split("index growing.log"))
+        assert "growing.log keeps changing while it's read, skipped" in caplog.text
+        monkeypatch.undo()
+        state = get_current_state(self.constants)
+        assert test_file_path not in state.current_indexed_paths
+        assert [path.name for path in self.constants.mygit_index_dir_path.glob("*.tmp")] == []
+
     def test_index_new_dir(self):
         pass
 
@@ -0,0 +1,182 @@
+import mygit.backend as backend
+import mygit.main as mygit
+import os
+import pytest
+import tempfile
+
+from test_utils import *
+from mygit.constants import Constants
+from mygit.index_file import IndexFile, INDEX_SIGNATURE, ENTRY
+from mygit.state import State
+from pathlib import Path
+from shlex import split as shlex_split
+from zlib import compress
+
+
+class TestIndexFile:
+    def setup_class(self):
+        self.cwd = tempfile.TemporaryDirectory()
+        self.cwd_path = Path(self.cwd.name)
+        self.constants = Constants(self.cwd_path)
+
+    def teardown_class(self):
+        self.cwd.cleanup()
+        pass
+
+    def teardown_method(self, method):
+        clean_directory(self.cwd_path)
+        pass
+
+    def fold_journal(self):
+        state = get_current_state(self.constants)
+        state.index_needs_rewrite = True
+        backend.write_down_index(self.constants, state)
+        assert not self.constants.index_journal_path.exists()
+
+    def test_index_is_binary_and_sorted(self):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        for name in ("b.txt", "a.txt", "c.txt"):
+            write_file(self.cwd_path, name, name)
+        mygit.main(self.cwd_path, shlex_split("index -a"))
+        self.fold_journal()
+
+        with Path.open(self.constants.mygit_index_path, "rb") as index:
+            assert index.read(len(INDEX_SIGNATURE)) == INDEX_SIGNATURE
+        index = IndexFile(self.constants.mygit_index_path)
+        paths = [relative_path for relative_path, _, _ in index]
+        assert paths == sorted(paths)
+        assert {"a.txt", "b.txt", "c.txt"} <= set(paths)
+        index.close()
+
+    def test_single_path_lookup(self):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        for i in range(20):
+            write_file(self.cwd_path, f"docs/page{i}.md", f"page {i}")
+        write_file(self.cwd_path, "readme.md", "hello world")
+        mygit.main(self.cwd_path, shlex_split("index readme.md"))
+        self.fold_journal()
+
+        index = IndexFile(self.constants.mygit_index_path)
+        indexed_checksum, cache = index.find("readme.md")
+        assert indexed_checksum == get_blob_checksum(b"hello world")
+        assert cache[0] == indexed_checksum
+        indexed_checksum, cache = index.find("docs/page7.md")  # folding checked status, it caches every file
+        assert indexed_checksum is None
+        assert cache[0] == get_blob_checksum(b"page 7")
+        assert index.find("missing.md") == (None, None)
+        index.close()
+
+    def test_single_path_commands_read_only_their_entries(self, monkeypatch):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        for i in range(20):
+            write_file(self.cwd_path, f"docs/page{i}.md", f"page {i}")
+        mygit.main(self.cwd_path, shlex_split("index docs"))
+        self.fold_journal()
+
+        def iterate_entries(index):
+            raise AssertionError("whole index was read")
+        monkeypatch.setattr(IndexFile, "__iter__", iterate_entries)
+        write_file(self.cwd_path, "readme.md", "hello world")
+        mygit.main(self.cwd_path, shlex_split("index readme.md"))
+        mygit.main(self.cwd_path, shlex_split("reset -i docs/page3.md"))
+        monkeypatch.undo()
+
+        state = get_current_state(self.constants)
+        indexed_names = sorted(path.name for path in state.current_indexed_paths)
+        assert indexed_names == sorted(["readme.md"] + [f"page{i}.md" for i in range(20) if i != 3])
+        assert state.current_indexed_paths[self.cwd_path / "readme.md"] == get_blob_checksum(b"hello world")
+
+    def test_paths_with_spaces(self):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        Path.mkdir(self.cwd_path / "my docs")
+        write_file(self.cwd_path, "my docs/read me.md", "hello world")
+        mygit.main(self.cwd_path, shlex_split("index 'my docs/read me.md'"))
+
+        state = get_current_state(self.constants)
+        assert state.current_indexed_paths == {
+            self.cwd_path / "my docs" / "read me.md": get_blob_checksum(b"hello world")}
+        assert state.status_indexed_paths == ["modified: my docs/read me.md"]
+        assert state.status_not_indexed_paths == []
+
+    def test_upgrade_converts_text_index(self):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        write_file(self.cwd_path, "readme.md", "hello world")
+        mygit.main(self.cwd_path, shlex_split("index readme.md"))
+        checksum = get_blob_checksum(b"hello world")
+        with Path.open(self.constants.mygit_index_path, "wb") as index:
+            index.write(compress(bytes(f"i {checksum} readme.md", encoding="utf-8"), -1))
+        with Path.open(self.constants.format_path, "w") as format_file:
+            format_file.write("5")
+
+        mygit.main(self.cwd_path, shlex_split("upgrade"))
+        assert backend.get_repository_format(self.constants) == 6
+        with Path.open(self.constants.mygit_index_path, "rb") as index:
+            assert index.read(len(INDEX_SIGNATURE)) == INDEX_SIGNATURE
+        state = get_current_state(self.constants)
+        assert state.current_indexed_paths == {self.cwd_path / "readme.md": checksum}
+
+    def test_staging_one_file_at_a_time_appends_to_journal(self):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        for i in range(10):
+            write_file(self.cwd_path, f"file{i}.txt", f"file {i}")
+        self.fold_journal()
+        index_stat = self.constants.mygit_index_path.stat()
+
+        for i in range(10):
+            mygit.main(self.cwd_path, shlex_split(f"index file{i}.txt"))
+        mygit.main(self.cwd_path, shlex_split("reset -i file3.txt"))
+        assert self.constants.index_journal_path.exists()
+        assert self.constants.mygit_index_path.stat().st_ino == index_stat.st_ino  # base wasn't rewritten
+        assert self.constants.mygit_index_path.stat().st_mtime_ns == index_stat.st_mtime_ns
+
+        state = get_current_state(self.constants)
+        assert sorted(path.name for path in state.current_indexed_paths) == \
+            [f"file{i}.txt" for i in range(10) if i != 3]
+        assert state.status_not_indexed_paths == ["modified: file3.txt"]
+
+    def test_journal_is_folded_when_it_grows(self, monkeypatch):
+        monkeypatch.setattr("mygit.index_file.JOURNAL_MIN_FOLD_SIZE", 0)
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        for i in range(3):
+            write_file(self.cwd_path, f"file{i}.txt", f"file {i}")
+            mygit.main(self.cwd_path, shlex_split(f"index file{i}.txt"))  # reads only its path, can't fold
+        index = IndexFile(self.constants.mygit_index_path)
+        assert len([entry for entry in index if entry[1] is not None]) == 0
+        index.close()
+
+        write_file(self.cwd_path, "file3.txt", "file 3")
+        mygit.main(self.cwd_path, shlex_split("index -a"))
+        assert not self.constants.index_journal_path.exists()  # whole state was loaded, journal was folded
+        state = State()
+        state.load_cache(self.constants, "")
+        index = IndexFile(self.constants.mygit_index_path)
+        assert len([entry for entry in index if entry[1] is not None]) == 4
+        index.close()
+        assert len(state.current_indexed_paths) == 4
+
+    def test_interrupted_journal_append_is_ignored(self):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        write_file(self.cwd_path, "readme.md", "hello world")
+        mygit.main(self.cwd_path, shlex_split("index readme.md"))
+        with Path.open(self.constants.index_journal_path, "rb") as journal:
+            entry = journal.read()
+        with Path.open(self.constants.index_journal_path, "ab") as journal:
+            journal.write(entry[:-3])
+
+        state = get_current_state(self.constants)
+        assert state.current_indexed_paths == {self.cwd_path / "readme.md": get_blob_checksum(b"hello world")}
+
+    def test_append_after_interrupted_append(self):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        write_file(self.cwd_path, "a.txt", "a")
+        mygit.main(self.cwd_path, shlex_split("index a.txt"))
+        journal_size = self.constants.index_journal_path.stat().st_size
+        os.truncate(self.constants.index_journal_path, journal_size - 3)  # append of a.txt was torn
+
+        write_file(self.cwd_path, "b" * 20 + ".txt", "b")
+        mygit.main(self.cwd_path, shlex_split(f"index {'b' * 20}.txt"))
+        assert self.constants.index_journal_path.stat().st_size == ENTRY.size + 24  # torn entry was cut off
+
+        state = get_current_state(self.constants)
+        assert state.current_indexed_paths == {self.cwd_path / ("b" * 20 + ".txt"): get_blob_checksum(b"b")}
+
@@ -58,3 +58,15 @@ class TestInit:
 
         mygit.main(self.cwd_path, shlex_split("init"))  # let's try
         assert not backend.is_init(self.constants)  # doesn't want to work in such environment
+
+    def test_missing_service_files(self, caplog):
+        for remove in (lambda: Path.unlink(self.constants.mygit_ignore_path),
+                       lambda: remove_directory(self.constants.mygit_index_dir_path),
+                       lambda: Path.unlink(self.constants.mygit_index_path)):
+            mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+            remove()
+            assert not backend.is_init(self.constants)
+            caplog.clear()
+            mygit.main(self.cwd_path, shlex_split("status"))
+            assert "directory doesn't contain a repository" in caplog.text
+            clean_directory(self.cwd_path)
@@ -0,0 +1,111 @@
+import json
+import logging
+import mygit.log_file as log_file
+import mygit.main as mygit
+import pytest
+import tempfile
+
+from test_utils import *
+from datetime import datetime, timedelta, timezone
+from mygit.constants import Constants
+from pathlib import Path
+from shlex import split as shlex_split
+
+
+class TestLogFile:
+    def setup_class(self):
+        self.cwd = tempfile.TemporaryDirectory()
+        self.cwd_path = Path(self.cwd.name)
+        self.constants = Constants(self.cwd_path)
+
+    def teardown_class(self):
+        self.cwd.cleanup()
+        pass
+
+    def teardown_method(self, method):
+        clean_directory(self.cwd_path)
+        pass
+
+    def write_records(self, count: int, max_bytes: int = log_file.LOG_MAX_BYTES):
+        handler = log_file.RotatingLogHandler(self.cwd_path / "test.log", max_bytes)
+        logger = logging.getLogger("test_log_file")
+        logger.propagate = False
+        logger.addHandler(handler)
+        try:
+            for i in range(count):
+                logger.error(f"record {i}\nsecond line")
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+        return self.cwd_path / "test.log"
+
+    def test_records_are_rotated(self):
+        log_path = self.write_records(200, max_bytes=4096)
+        assert log_path.stat().st_size <= 4096
+        assert [path.name for path in log_file.get_log_paths(log_path)] == \
+            ["test.log", "test.log.1", "test.log.2", "test.log.3"]
+        assert not (self.cwd_path / "test.log.4").exists()
+
+        with Path.open(log_path, "r") as log:
+            record = json.loads(log.readline())
+        assert record["level"] == "ERROR" and record["message"].endswith("\nsecond line")
+
+        records = list(log_file.iterate_records(log_path))
+        messages = [record["message"].split("\n")[0] for record in records]
+        assert messages == [f"record {i}" for i in range(200 - len(messages), 200)]  # oldest ones are dropped
+
+    def test_tail_reads_from_end(self, monkeypatch):
+        monkeypatch.setattr("mygit.log_file.READ_BLOCK_SIZE", 100)  # records cross block borders
+        log_path = self.write_records(200, max_bytes=4096)
+        records = log_file.read_last_records(log_path, 30)  # more than the last file keeps
+        assert [record["message"].split("\n")[0] for record in records] == [f"record {i}" for i in range(170, 200)]
+
+        now = datetime.now().astimezone()
+        assert len(log_file.read_last_records(log_path, since=now + timedelta(seconds=1))) == 0
+        assert len(log_file.read_last_records(log_path, since=now - timedelta(hours=1))) == \
+            len(list(log_file.iterate_records(log_path)))
+
+    def test_legacy_lines(self, monkeypatch):
+        monkeypatch.setattr("mygit.log_file.command_name", "status")
+        log_path = self.cwd_path / "test.log"
+        with Path.open(log_path, "w") as log:
+            log.write("plain message\n")
+        self.write_records(1)
+        records = log_file.read_last_records(log_path, 5)
+        assert log_file.format_record(records[0]) == "plain message"
+        assert log_file.format_record(records[1]).endswith(" status ERROR: record 0\nsecond line")
+        assert len(log_file.read_last_records(log_path, since=log_file.parse_since("1h"))) == 1
+
+    def test_iso_times(self):
+        utc = timezone.utc
+        assert log_file.parse_iso_time("2026-10-01") == datetime(2026, 10, 1)
+        assert log_file.parse_iso_time("2026-10-01 12:30") == datetime(2026, 10, 1, 12, 30)
+        assert log_file.parse_iso_time("2026-10-01T12:30:05Z") == datetime(2026, 10, 1, 12, 30, 5, tzinfo=utc)
+        assert log_file.parse_iso_time("2026-10-01T15:30:05.250+03:00") == \
+            datetime(2026, 10, 1, 12, 30, 5, 250000, tzinfo=utc)
+        assert log_file.parse_since("2026-10-01T12:30+00:00") == datetime(2026, 10, 1, 12, 30, tzinfo=utc)
+        with pytest.raises(ValueError):
+            log_file.parse_iso_time("yesterday")
+
+    def test_log_command_tail(self, capsys):
+        mygit.main(self.cwd_path, shlex_split("init"))
+        with Path.open(self.constants.mygit_log_path, "w") as log:
+            for i in range(10):
+                log.write(json.dumps({"time": f"2026-01-{i + 1:02}T10:00:00+00:00", "command": "commit",
+                                      "level": "INFO", "message": f"record {i}"}) + "\n")
+        capsys.readouterr()
+
+        mygit.main(self.cwd_path, shlex_split("log -u --tail 2"))
+        assert capsys.readouterr().out == "2026-01-09 10:00:00+00:00 commit INFO: record 8\n" \
+                                          "2026-01-10 10:00:00+00:00 commit INFO: record 9\n"
+        mygit.main(self.cwd_path, shlex_split("log -u --since 2026-01-10T00:00+00:00"))
+        assert capsys.readouterr().out == "2026-01-10 10:00:00+00:00 commit INFO: record 9\n"
+        mygit.main(self.cwd_path, shlex_split("log -u"))
+        assert len(capsys.readouterr().out.splitlines()) == 10
+
+        for args in ("log --tail 2", "log -o --since 2h"):  # history has no internal log filters
+            with pytest.raises(SystemExit) as exit_info:
+                mygit.main(self.cwd_path, shlex_split(args))
+            assert exit_info.value.code == 2
+            output = capsys.readouterr()
+            assert "use them with -u" in output.err and output.out == ""
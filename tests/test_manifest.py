@@ -0,0 +1,83 @@
+import mygit.backend as backend
+import mygit.main as mygit
+import os
+import pytest
+import tempfile
+
+from test_utils import *
+from mygit.constants import Constants
+from mygit.state import State
+from pathlib import Path
+from shlex import split as shlex_split
+
+
+class TestManifest:
+    def setup_class(self):
+        self.cwd = tempfile.TemporaryDirectory()
+        self.cwd_path = Path(self.cwd.name)
+        self.constants = Constants(self.cwd_path)
+
+    def teardown_class(self):
+        self.cwd.cleanup()
+        pass
+
+    def teardown_method(self, method):
+        clean_directory(self.cwd_path)
+        pass
+
+    def count_objects(self):
+        return len(list(self.constants.mygit_objects_path.glob("??/*")))
+
+    def create_history(self):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        for directory in ("src/lib", "docs"):
+            for i in range(3):
+                write_file(self.cwd_path, f"{directory}/file{i}.txt", f"{directory} {i}")
+        commit(self.cwd_path, "first")
+
+    def test_commit_stores_no_manifest_object(self):
+        self.create_history()
+        objects = self.count_objects()
+        write_file(self.cwd_path, "src/lib/file1.txt", "changed")
+        commit(self.cwd_path, "second")
+
+        assert self.count_objects() == objects + 5  # blob, src/lib, src and workspace trees, commit
+        commit_checksum = backend.get_last_commit_checksum(backend.get_current_branch_path(self.constants))
+        assert backend.get_commit_content(commit_checksum, self.constants)[1] == ""
+
+    def test_head_manifest_is_rebuilt_from_tree(self):
+        self.create_history()
+        expected = get_current_state(self.constants).last_commit_indexed_path
+        assert len(expected) == 7  # ignore file and six committed files
+        assert expected[self.cwd_path / "src" / "lib" / "file2.txt"] == get_blob_checksum(b"src/lib 2")
+
+        Path.unlink(self.constants.head_manifest_path)
+        assert get_current_state(self.constants).last_commit_indexed_path == expected
+        assert self.constants.head_manifest_path.exists()
+
+        mygit.main(self.cwd_path, shlex_split("checkout -n dev"))
+        write_file(self.cwd_path, "docs/new.txt", "new")
+        commit(self.cwd_path, "second")
+        mygit.main(self.cwd_path, shlex_split("checkout master"))  # manifest belongs to dev now
+        assert get_current_state(self.constants).last_commit_indexed_path == expected
+
+    def test_damaged_head_manifest_is_rebuilt(self):
+        self.create_history()
+        expected = get_current_state(self.constants).last_commit_indexed_path
+        manifest_size = self.constants.head_manifest_path.stat().st_size
+        os.truncate(self.constants.head_manifest_path, manifest_size // 2)  # write was interrupted
+
+        assert get_current_state(self.constants).last_commit_indexed_path == expected
+        assert self.constants.head_manifest_path.stat().st_size == manifest_size
+        assert not any(path.name.startswith("tmp-") for path in self.constants.mygit_path.iterdir())
+
+    def test_paths_with_spaces_are_committed(self):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        write_file(self.cwd_path, "my docs/read me.md", "hello world")
+        commit(self.cwd_path, "first")
+        Path.unlink(self.constants.head_manifest_path)
+
+        state = get_current_state(self.constants)
+        assert state.last_commit_indexed_path[self.cwd_path / "my docs" / "read me.md"] == \
+            get_blob_checksum(b"hello world")
+        assert state.status_not_indexed_paths == []
@@ -0,0 +1,81 @@
+import mygit.backend as backend
+import mygit.main as mygit
+import mygit.objects as objects
+import tempfile
+
+from test_utils import *
+from mygit.constants import Constants
+from mygit.objects import ObjectCache
+from pathlib import Path
+from shlex import split as shlex_split
+
+
+class TestObjectCache:
+    def setup_class(self):
+        self.cwd = tempfile.TemporaryDirectory()
+        self.cwd_path = Path(self.cwd.name)
+        self.constants = Constants(self.cwd_path)
+
+    def teardown_class(self):
+        self.cwd.cleanup()
+        pass
+
+    def teardown_method(self, method):
+        clean_directory(self.cwd_path)
+        objects.object_cache.clear()
+        pass
+
+    def create_history(self):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        for i in range(3):
+            write_file(self.cwd_path, f"src/file{i}.txt", f"version {i}")
+            commit_checksum = commit(self.cwd_path, f"version{i}")
+        return commit_checksum
+
+    def test_cache_is_bounded_by_bytes(self):
+        cache = ObjectCache(10)
+        cache.put(("a",), "a", 4)
+        cache.put(("b",), "b", 4)
+        assert cache.get(("a",)) == "a"  # b is least recently used now
+        cache.put(("c",), "c", 4)
+        assert cache.get(("b",)) is None
+        assert cache.get(("a",)) == "a" and cache.get(("c",)) == "c"
+        cache.put(("d",), "d", 11)  # bigger than whole cache
+        assert cache.get(("d",)) is None
+        assert (cache.hits, cache.misses, cache.size) == (3, 2, 8)
+
+    def test_objects_are_read_once(self, monkeypatch):
+        commit_checksum = self.create_history()
+        objects.object_cache.clear()
+        read_checksums = []
+        original_read_object = objects.read_object
+
+        def counting_read_object(checksum: str, c: Constants):
+            read_checksums.append(checksum)
+            return original_read_object(checksum, c)
+        monkeypatch.setattr("mygit.objects.read_object", counting_read_object)
+
+        mygit.main(self.cwd_path, shlex_split("log"))
+        mygit.main(self.cwd_path, shlex_split("log -o"))
+        assert len(read_checksums) == 4  # every commit once, init commit too
+        assert len(read_checksums) == len(set(read_checksums))
+
+        tree_checksum = backend.get_tree_checksum(commit_checksum, self.constants)
+        assert backend.get_tree_content(tree_checksum, self.constants) is \
+            backend.get_tree_content(tree_checksum, self.constants)
+        assert len(read_checksums) == 5
+
+    def test_commit_content_is_copied(self):
+        commit_checksum = self.create_history()
+        content = backend.get_commit_content(commit_checksum, self.constants)
+        content[2] = "changed"
+        assert backend.get_commit_content(commit_checksum, self.constants)[2] == "version2"
+
+    def test_parsed_size_is_charged(self):
+        commit_checksum = self.create_history()
+        tree_checksum = backend.get_tree_checksum(commit_checksum, self.constants)
+        objects.object_cache.clear()
+        backend.get_tree_content(tree_checksum, self.constants)
+        content_raw = objects.read_object(tree_checksum, self.constants)
+        entries = len(content_raw.split(b"\n"))
+        assert objects.object_cache.size == len(content_raw) + objects.PARSED_LINE_OVERHEAD * entries
@@ -0,0 +1,132 @@
+import mygit.backend as backend
+import mygit.main as mygit
+import pytest
+import tempfile
+
+from test_utils import *
+from mygit.constants import Constants
+from mygit.objects import iterate_loose_objects, object_exists, read_object
+from mygit.pack import get_packs, choose_deltas
+from mygit.state import State
+from pathlib import Path
+from shlex import split as shlex_split
+
+
+class TestPack:
+    def setup_class(self):
+        self.cwd = tempfile.TemporaryDirectory()
+        self.cwd_path = Path(self.cwd.name)
+        self.constants = Constants(self.cwd_path)
+
+    def teardown_class(self):
+        self.cwd.cleanup()
+        pass
+
+    def teardown_method(self, method):
+        clean_directory(self.cwd_path)
+        pass
+
+    def create_history(self):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+
+        (self.cwd_path / "src").mkdir()
+        with Path.open(self.cwd_path / "src" / "main.py", "w") as test_file:
+            test_file.write("print('hello world')")
+        commit(self.cwd_path, "first")
+        mygit.main(self.cwd_path, shlex_split("checkout -n dev"))
+
+        with Path.open(self.cwd_path / "readme.md", "w") as test_file:
+            test_file.write("hello world")
+        commit(self.cwd_path, "second")
+
+    def test_pack_moves_loose_objects(self):
+        self.create_history()
+        loose_objects = list(iterate_loose_objects(self.constants))
+        contents = {checksum: read_object(checksum, self.constants) for checksum in loose_objects}
+
+        mygit.main(self.cwd_path, shlex_split("pack"))
+
+        assert list(iterate_loose_objects(self.constants)) == []
+        packs = get_packs(self.constants)
+        assert len(packs) == 1
+        assert sorted(packs[0].iterate_checksums()) == sorted(loose_objects)
+        for checksum in contents:
+            assert object_exists(checksum, self.constants)
+            assert read_object(checksum, self.constants) == contents[checksum]
+        assert not object_exists("0" * 40, self.constants)
+
+    def test_packed_objects_are_used_by_commands(self):
+        self.create_history()
+        mygit.main(self.cwd_path, shlex_split("pack"))
+
+        state = get_current_state(self.constants)
+        assert state.status_not_indexed_paths == []
+
+        mygit.main(self.cwd_path, shlex_split("checkout master"))  # workspace is expanded from pack
+        assert not (self.cwd_path / "readme.md").exists()
+        with Path.open(self.cwd_path / "src" / "main.py", "r") as test_file:
+            assert test_file.read() == "print('hello world')"
+
+        mygit.main(self.cwd_path, shlex_split("merge dev"))  # ancestry is read from pack
+        with Path.open(self.cwd_path / "readme.md", "r") as test_file:
+            assert test_file.read() == "hello world"
+
+    def test_new_objects_stay_loose_next_to_pack(self):
+        self.create_history()
+        mygit.main(self.cwd_path, shlex_split("pack"))
+
+        with Path.open(self.cwd_path / "readme.md", "a") as test_file:
+            test_file.write("goodbye!")
+        commit(self.cwd_path, "third")
+
+        assert len(list(iterate_loose_objects(self.constants))) > 0
+        state = get_current_state(self.constants)
+        assert state.status_not_indexed_paths == []
+
+        mygit.main(self.cwd_path, shlex_split("pack"))
+        assert list(iterate_loose_objects(self.constants)) == []
+        assert len(get_packs(self.constants)) == 2
+        state = get_current_state(self.constants)
+        assert state.status_not_indexed_paths == []
+
+    def test_repack_stores_new_versions_as_deltas(self):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+
+        test_file_path = self.cwd_path / "config.txt"
+        lines = [f"option{i} = {i}\n" for i in range(2000)]
+        versions = []
+        for version in range(4):
+            lines[version * 100] = f"option{version * 100} = changed in version {version}\n"
+            versions.append("".join(lines))
+            with Path.open(test_file_path, "w") as test_file:
+                test_file.write(versions[-1])
+            mygit.main(self.cwd_path, shlex_split("index config.txt"))
+            mygit.main(self.cwd_path, shlex_split(f"commit version{version}"))
+        loose_size = sum(path.stat().st_size for path in self.constants.mygit_objects_path.glob("*/*"))
+
+        mygit.main(self.cwd_path, shlex_split("pack -a"))
+
+        packs = get_packs(self.constants)
+        assert len(packs) == 1
+        pack_size = packs[0].pack_path.stat().st_size
+        assert pack_size < loose_size // 2  # three of four versions became small deltas
+        for content in versions:
+            assert object_exists(get_blob_checksum(bytes(content, encoding="utf-8")), self.constants)
+            assert read_object(get_blob_checksum(bytes(content, encoding="utf-8")), self.constants) \
+                == bytes(content, encoding="utf-8")
+
+        state = get_current_state(self.constants)
+        assert state.status_not_indexed_paths == []
+
+    def test_delta_chains_are_limited(self, monkeypatch):
+        monkeypatch.setattr("mygit.pack.MAX_DELTA_DEPTH", 2)
+        candidates = {f"{i:040x}": [f"{i - 1:040x}"] if i > 0 else [] for i in range(6)}
+        contents = {checksum: bytes(f"line {checksum}\n", encoding="utf-8") * 20 for checksum in candidates}
+        deltas = choose_deltas(candidates, lambda checksum: contents[checksum])
+
+        depths = {}
+        for checksum in candidates:
+            base = deltas.get(checksum, (None,))[0]
+            depths[checksum] = 0 if base is None else depths[base.hex()] + 1
+        assert max(depths.values()) == 2
+        assert len(deltas) == 4  # every third object is stored in full
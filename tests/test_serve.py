@@ -0,0 +1,93 @@
+import mygit.backend as backend
+import mygit.main as mygit
+import pytest
+import sys
+import tempfile
+
+from test_utils import *
+from mygit.constants import Constants
+from mygit.server import is_server_running
+from mygit.state import State
+from pathlib import Path
+from shlex import split as shlex_split
+
+
+class TestServe:
+    def setup_class(self):
+        self.cwd = tempfile.TemporaryDirectory()
+        self.cwd_path = Path(self.cwd.name)
+        self.constants = Constants(self.cwd_path)
+
+    def teardown_class(self):
+        self.cwd.cleanup()
+        pass
+
+    def teardown_method(self, method):
+        mygit.main(self.cwd_path, shlex_split("serve --stop"))
+        clean_directory(self.cwd_path)
+        pass
+
+    def start_server(self, capsys):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        mygit.main(self.cwd_path, shlex_split("serve --start"))
+        assert is_server_running(self.constants)
+        capsys.readouterr()
+
+    def test_commands_are_forwarded_to_server(self, capsys):
+        self.start_server(capsys)
+        mygit.main(self.cwd_path, shlex_split("status"))
+        assert "nothing to commit" in capsys.readouterr().err
+
+        write_file(self.cwd_path, "readme.md", "hello world")
+        mygit.main(self.cwd_path, shlex_split("status"))
+        assert "modified: readme.md" in capsys.readouterr().err
+
+        mygit.main(self.cwd_path, shlex_split("index readme.md"))
+        mygit.main(self.cwd_path, shlex_split("commit first"))
+        mygit.main(self.cwd_path, shlex_split("status"))
+        assert "nothing to commit" in capsys.readouterr().err
+
+        state = get_current_state(self.constants)  # server has written everything down
+        assert state.last_commit_indexed_path[self.cwd_path / "readme.md"] == get_blob_checksum(b"hello world")
+        assert state.status_not_indexed_paths == []
+
+    def test_forwarded_output_has_no_colors_for_pipes(self, capsys):
+        self.start_server(capsys)
+        write_file(self.cwd_path, "readme.md", "hello world")
+        mygit.main(self.cwd_path, shlex_split("status"))  # captured streams aren't terminals
+        output = capsys.readouterr()
+        assert "modified: readme.md" in output.err
+        assert "\x1b[" not in output.err and "\x1b[" not in output.out
+
+    def test_server_notices_changes_made_without_it(self, capsys, monkeypatch):
+        self.start_server(capsys)
+        write_file(self.cwd_path, "readme.md", "hello world")
+        mygit.main(self.cwd_path, shlex_split("status"))  # state is warm now
+        capsys.readouterr()
+
+        monkeypatch.setenv("MYGIT_NO_SERVER", "1")
+        mygit.main(self.cwd_path, shlex_split("index readme.md"))
+        monkeypatch.delenv("MYGIT_NO_SERVER")
+
+        mygit.main(self.cwd_path, shlex_split("status --indexed"))
+        assert "readme.md" in capsys.readouterr().err
+
+    def test_parser_output_is_forwarded(self, capsys):
+        self.start_server(capsys)
+        with pytest.raises(SystemExit) as exit_info:
+            mygit.main(self.cwd_path, shlex_split("status --unknown-option"))
+        assert exit_info.value.code == 2
+        assert "unrecognized arguments" in capsys.readouterr().err
+
+        with pytest.raises(SystemExit) as exit_info:
+            mygit.main(self.cwd_path, shlex_split("serve -h"))  # local commands run in client
+        assert exit_info.value.code == 0
+        assert "Keep repository state in memory" in capsys.readouterr().out
+
+    def test_client_runs_command_itself_without_server(self, capsys):
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        write_file(self.cwd_path, "readme.md", "hello world")
+        mygit.main(self.cwd_path, shlex_split("serve --stop"))
+        mygit.main(self.cwd_path, shlex_split("index readme.md"))
+        state = get_current_state(self.constants)
+        assert list(state.current_indexed_paths) == [self.cwd_path / "readme.md"]
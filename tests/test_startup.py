@@ -0,0 +1,85 @@
+import json
+import mygit.main as mygit
+import os
+import subprocess
+import sys
+import tempfile
+
+from test_utils import *
+from pathlib import Path
+from shlex import split as shlex_split
+
+LAZY_IMPORT_SHARE = 0.9  # of eager startup in the same interpreter, status takes about 0.85 of it
+HEAVY_MODULES = ("subprocess", "multiprocessing", "concurrent.futures.process", "uuid", "mygit.server")
+
+
+class TestStartup:
+    def setup_class(self):
+        self.cwd = tempfile.TemporaryDirectory()
+        self.cwd_path = Path(self.cwd.name)
+
+    def teardown_class(self):
+        self.cwd.cleanup()
+        pass
+
+    def teardown_method(self, method):
+        clean_directory(self.cwd_path)
+        pass
+
+    def run_mygit(self, args: str, python_options: list = (), epilogue: str = ""):
+        # fresh interpreter, modules imported by other tests don't count
+        script = "import json, sys\n" \
+                 "import mygit.client\n" \
+                 f"sys.argv = ['mygit'] + {shlex_split(args)!r}\n" \
+                 "try:\n" \
+                 "    mygit.client.start()\n" \
+                 "except SystemExit:\n" \
+                 "    pass\n" \
+                 f"{epilogue}" \
+                 "print(json.dumps(sorted(sys.modules)))\n"
+        environment = dict(os.environ)
+        environment["PYTHONPATH"] = str(Path(mygit.__file__).resolve().parent.parent)
+        environment["MYGIT_NO_SERVER"] = "1"
+        result = subprocess.run([sys.executable, *python_options, "-c", script], cwd=self.cwd_path, env=environment,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        return json.loads(result.stdout.splitlines()[-1]), result.stderr
+
+    def test_only_selected_command_is_imported(self):
+        mygit.main(self.cwd_path, shlex_split("init"), False)
+        modules, _ = self.run_mygit("-j 2 status")
+        assert [module for module in modules if module.startswith("mygit.commands.")] == ["mygit.commands.status"]
+        for module in HEAVY_MODULES:
+            assert module not in modules
+
+    def test_help_lists_every_command(self):
+        modules, _ = self.run_mygit("-h")
+        assert len([module for module in modules if module.startswith("mygit.commands.")]) == len(mygit.COMMANDS)
+
+    def test_usage_error_of_command(self):
+        mygit.main(self.cwd_path, shlex_split("init"), False)
+        modules, error = self.run_mygit("status --unknown")
+        assert "unrecognized arguments: --unknown" in error
+        assert [module for module in modules if module.startswith("mygit.commands.")] == ["mygit.commands.status"]
+
+    def test_status_import_time_is_within_limit(self):
+        mygit.main(self.cwd_path, shlex_split("init"), False)
+        # after status, import what eager startup used to: every command and heavy module
+        epilogue = "import importlib, mygit.main\n" \
+                   "print('eager imports', file=sys.stderr)\n" \
+                   "for module_name, _ in mygit.main.COMMANDS.values():\n" \
+                   "    importlib.import_module(module_name)\n" \
+                   f"for module_name in {HEAVY_MODULES!r}:\n" \
+                   "    importlib.import_module(module_name)\n"
+        _, report = self.run_mygit("status", ["-X", "importtime"], epilogue)
+        lazy_time = None
+        import_time = 0
+        is_counted = False
+        for line in report.splitlines():
+            if line == "eager imports":
+                lazy_time = import_time
+            elif line.startswith("import time:") and "|" in line:
+                _, cumulative, name = line.split("|")
+                is_counted = is_counted or name.strip() == "mygit.client"  # interpreter startup doesn't count
+                if is_counted and not name.startswith("  ") and cumulative.strip().isdigit():  # top-level only
+                    import_time += int(cumulative)
+        assert 0 < lazy_time < import_time * LAZY_IMPORT_SHARE
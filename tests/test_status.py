@@ -0,0 +1,82 @@
+import mygit.backend as backend
+import mygit.main as mygit
+import pytest
+import tempfile
+
+from test_utils import *
+from mygit.constants import Constants
+from mygit.state import State
+from pathlib import Path
+from shlex import split as shlex_split
+
+
+class TestStatus:
+    def setup_class(self):
+        self.cwd = tempfile.TemporaryDirectory()
+        self.cwd_path = Path(self.cwd.name)
+        self.constants = Constants(self.cwd_path)
+
+    def teardown_class(self):
+        self.cwd.cleanup()
+        pass
+
+    def teardown_method(self, method):
+        clean_directory(self.cwd_path)
+        pass
+
+    def create_committed_file(self) -> Path:
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+
+        test_file_path = self.cwd_path / "readme.md"
+        with Path.open(test_file_path, "w") as test_file:  # create test file
+            test_file.write("hello world")
+
+        mygit.main(self.cwd_path, shlex_split("index readme.md"))
+        mygit.main(self.cwd_path, shlex_split("commit created_readme"))
+        return test_file_path
+
+    def load_state(self) -> State:
+        state = State()
+        state.load_cache(self.constants, backend.get_last_commit_index_content(self.constants))
+        return state
+
+    def test_status_records_stat_info(self):
+        test_file_path = self.create_committed_file()
+
+        state = get_current_state(self.constants)
+        assert state.status_not_indexed_paths == []
+
+        state = self.load_state()  # stat info survived in index file
+        checksum, stat_key = state.workspace_stat_cache[test_file_path]
+        assert checksum == state.last_commit_indexed_path[test_file_path]
+        assert stat_key == backend.get_stat_key(test_file_path.stat())
+
+    def test_status_trusts_matching_stat_info(self):
+        test_file_path = self.create_committed_file()
+
+        state = self.load_state()
+        file_stat = test_file_path.stat()
+        state.workspace_stat_cache[test_file_path] = ("0" * 40, backend.get_stat_key(file_stat))
+        state.index_timestamp = file_stat.st_mtime_ns + 1
+        backend.check_status(self.constants, state)
+        assert state.status_not_indexed_paths == ['modified: readme.md']  # file wasn't opened, cache was trusted
+
+    def test_status_rehashes_racily_clean_file(self):
+        test_file_path = self.create_committed_file()
+
+        state = self.load_state()
+        file_stat = test_file_path.stat()
+        state.workspace_stat_cache[test_file_path] = ("0" * 40, backend.get_stat_key(file_stat))
+        state.index_timestamp = file_stat.st_mtime_ns  # file changed in the same tick the index was written
+        backend.check_status(self.constants, state)
+        assert state.status_not_indexed_paths == []
+
+    def test_status_notices_changed_stat_info(self):
+        test_file_path = self.create_committed_file()
+        get_current_state(self.constants)  # fill stat cache
+
+        with Path.open(test_file_path, "a") as test_file:  # change test file
+            test_file.write("goodbye!")
+
+        state = get_current_state(self.constants)
+        assert state.status_not_indexed_paths == ['modified: readme.md']
@@ -0,0 +1,95 @@
+import json
+import mygit.main as mygit
+import mygit.trace as trace
+import pstats
+import tempfile
+
+from test_utils import *
+from mygit.constants import Constants
+from mygit.objects import get_object_path
+from mygit.pack import find_packed_object
+from pathlib import Path
+from shlex import split as shlex_split
+
+
+class TestTrace:
+    def setup_class(self):
+        self.cwd = tempfile.TemporaryDirectory()
+        self.cwd_path = Path(self.cwd.name)
+        self.constants = Constants(self.cwd_path)
+        self.reports = tempfile.TemporaryDirectory()
+        self.report_path = Path(self.reports.name) / "trace.json"
+
+    def teardown_class(self):
+        self.cwd.cleanup()
+        self.reports.cleanup()
+        pass
+
+    def teardown_method(self, method):
+        clean_directory(self.cwd_path)
+        pass
+
+    def create_files(self, count: int):
+        mygit.main(self.cwd_path, shlex_split("init"), False)
+        for i in range(count):
+            with Path.open(self.cwd_path / f"file{i}.txt", "w") as test_file:
+                test_file.write(f"file {i}")
+
+    def read_report(self):
+        with Path.open(self.report_path, "r") as report:
+            return json.load(report)
+
+    def test_commit_report(self):
+        self.create_files(5)
+        mygit.main(self.cwd_path, shlex_split(f"--trace-file {self.report_path} index -a"), False)
+        report = self.read_report()
+        assert report["command"] == "index"
+        assert report["counters"]["files_hashed"] == 5  # ignore file is hashed by init
+        assert report["counters"]["bytes_hashed"] == report["counters"]["bytes_compressed"]
+        assert report["counters"]["bytes_read"] == report["counters"]["bytes_hashed"]  # no objects are read yet
+
+        mygit.main(self.cwd_path, shlex_split(f"--trace-file {self.report_path} commit first"), False)
+        report = self.read_report()
+        assert {"load state", "walk", "write index", "write trees"} <= set(report["phases"])  # racy files are hashed
+        assert report["phases"]["write trees"]["calls"] == 1
+        assert report["counters"]["objects_written"] == 7  # five blobs, tree and commit, ignore file is stored by init
+        assert report["counters"]["stat_cache_hits"] + report["counters"]["stat_cache_misses"] == 6
+        assert report["wall_time"] >= report["phases"]["load state"]["time"]
+
+    def test_object_reads_are_counted(self):
+        self.create_files(1)
+        commit(self.cwd_path, "first")
+        checksum = get_blob_checksum(b"file 0")
+        mygit.main(self.cwd_path, shlex_split(f"--trace-file {self.report_path} print {checksum}"), False)
+        report = self.read_report()
+        assert report["counters"]["objects_read"] == 1
+        assert report["counters"]["bytes_read"] == get_object_path(checksum, self.constants).stat().st_size
+
+        mygit.main(self.cwd_path, shlex_split("pack -a"), False)
+        mygit.main(self.cwd_path, shlex_split(f"--trace-file {self.report_path} print {checksum}"), False)
+        report = self.read_report()
+        assert report["counters"]["bytes_read"] == find_packed_object(checksum, self.constants)[1][1]  # pack record
+
+    def test_trace_from_environment(self, monkeypatch):
+        self.create_files(2)
+        monkeypatch.setenv("MYGIT_TRACE", str(self.report_path))
+        mygit.main(self.cwd_path, shlex_split("status"), False)
+        assert self.read_report()["counters"]["stat_cache_misses"] == 2
+        assert trace.is_requested(["status"])
+
+    def test_disabled_trace_counts_nothing(self, monkeypatch):
+        monkeypatch.delenv("MYGIT_TRACE", raising=False)
+        self.create_files(2)
+        mygit.main(self.cwd_path, shlex_split("status"), False)
+        assert not trace.enabled
+        assert trace.counters == {} and trace.phases == {}
+        assert trace.phase("walk") is trace.DISABLED_PHASE
+        assert not trace.is_requested(["-j", "2", "status"])
+
+    def test_profile_dump(self):
+        self.create_files(2)
+        profile_path = Path(self.reports.name) / "status.prof"
+        mygit.main(self.cwd_path, shlex_split(f"--profile {profile_path} status"), False)
+        assert pstats.Stats(str(profile_path)).total_calls > 0
+        assert trace.is_requested(shlex_split(f"--profile={profile_path} status"))
+        assert mygit.find_command_name(shlex_split(f"--profile {profile_path} --trace status")) == "status"
@@ -0,0 +1,142 @@
+import logging
+import mygit.backend as backend
+import mygit.main as mygit
+import pytest
+import tempfile
+
+from test_utils import *
+from hashlib import sha1
+from mygit.constants import Constants, REPOSITORY_FORMAT
+from mygit.state import State
+from pathlib import Path
+from shlex import split as shlex_split
+from zlib import decompress, compress
+
+
+class TestUpgrade:
+    def setup_class(self):
+        self.cwd = tempfile.TemporaryDirectory()
+        self.cwd_path = Path(self.cwd.name)
+        self.constants = Constants(self.cwd_path)
+
+    def teardown_class(self):
+        self.cwd.cleanup()
+        pass
+
+    def teardown_method(self, method):
+        clean_directory(self.cwd_path)
+        pass
+
+    def write_legacy_object(self, content_raw: bytes) -> str:
+        content = compress(content_raw, -1)
+        checksum = sha1(content).hexdigest()  # format 1 checksum is taken from compressed content
+        with Path.open(self.constants.mygit_objects_path / checksum, "wb") as obj:
+            obj.write(content)
+        return checksum
+
+    def write_legacy_commit(self, files: dict, parent_commit_checksum: str) -> str:
+        tree_objects = []
+        workspace_state = []
+        for name in files:
+            blob_checksum = self.write_legacy_object(files[name])
+            tree_objects.append(f"blob {name} {blob_checksum}")
+            workspace_state.append(f"{name} {blob_checksum}")
+        tree_checksum = self.write_legacy_object(bytes("\n".join(tree_objects), encoding="utf-8"))
+        workspace_state_checksum = self.write_legacy_object(bytes("\n".join(workspace_state), encoding="utf-8"))
+        return self.write_legacy_object(bytes(
+            f"{tree_checksum}\n{workspace_state_checksum}\nlegacy\nThu Jan  1 00:00:00 1970 +0000\n"
+            f"{parent_commit_checksum}", encoding="utf-8"))
+
+    def create_legacy_repository(self):
+        c = self.constants
+        for directory in (c.mygit_path, c.mygit_objects_path, c.mygit_refs_path,
+                          c.mygit_branches_path, c.mygit_index_dir_path):
+            Path.mkdir(directory)
+        with Path.open(c.mygit_head_path, "w") as head:
+            head.write("master")
+        Path.open(c.mygit_index_path, "w").close()
+        Path.open(c.mygit_log_path, "w").close()
+
+        first_files = {".mygit_ignore": b".mygit"}
+        second_files = {".mygit_ignore": b".mygit", "readme.md": b"hello world"}
+        first_commit = self.write_legacy_commit(first_files, "")
+        second_commit = self.write_legacy_commit(second_files, first_commit)
+        with Path.open(c.mygit_branches_path / "master", "w") as branch:
+            branch.write(second_commit)
+        for name in second_files:
+            with Path.open(self.cwd_path / name, "wb") as workspace_file:
+                workspace_file.write(second_files[name])
+
+    def test_legacy_repository_needs_upgrade(self, caplog):
+        self.create_legacy_repository()
+        assert backend.is_init(self.constants)  # format file, packs and commit graph are not required
+        assert backend.get_repository_format(self.constants) == 1
+
+        mygit.main(self.cwd_path, shlex_split("status"))
+        assert "use 'mygit upgrade' first" in caplog.messages[-1]
+
+        mygit.main(self.cwd_path, shlex_split("upgrade"))
+        assert backend.is_init(self.constants)
+        assert backend.get_repository_format(self.constants) == REPOSITORY_FORMAT
+
+    def test_missing_commit_graph(self, caplog):
+        caplog.set_level(logging.INFO)
+        mygit.main(self.cwd_path, shlex_split("init"))  # init new repository
+        with Path.open(self.cwd_path / "readme.md", "w") as workspace_file:
+            workspace_file.write("hello world")
+        Path.unlink(self.constants.commit_graph_path)
+        assert backend.is_init(self.constants)
+
+        commit(self.cwd_path, "first")
+        assert not self.constants.commit_graph_path.exists()  # commit doesn't write graph without its header
+        mygit.main(self.cwd_path, shlex_split("checkout -n dev"))
+        mygit.main(self.cwd_path, shlex_split("checkout master"))
+        mygit.main(self.cwd_path, shlex_split("merge dev"))
+        assert "use 'mygit upgrade' first" not in caplog.text
+
+        mygit.main(self.cwd_path, shlex_split("upgrade"))
+        assert self.constants.commit_graph_path.exists()
+        assert "restored" in caplog.messages[-1]
+
+    def test_upgrade_rewrites_checksums(self):
+        self.create_legacy_repository()
+        mygit.main(self.cwd_path, shlex_split("upgrade"))
+
+        state = get_current_state(self.constants)
+        assert state.status_not_indexed_paths == []  # workspace matches rewritten commit
+        readme_checksum = state.last_commit_indexed_path[self.cwd_path / "readme.md"]
+        assert readme_checksum == get_blob_checksum(b"hello world")
+
+        commit_checksum = backend.get_last_commit_checksum(backend.get_current_branch_path(self.constants))
+        commits = 0
+        while commit_checksum != "":
+            with Path.open(self.constants.mygit_objects_path / commit_checksum[:2] / commit_checksum[2:], "rb") as commit:
+                content_raw = decompress(commit.read())
+            assert sha1(bytes(f"commit {len(content_raw)}\0", encoding="utf-8") + content_raw).hexdigest() \
+                == commit_checksum
+            commit_checksum = backend.get_commit_parent_commit(content_raw.decode().split("\n"))
+            commits += 1
+        assert commits == 2
+        assert len(list(self.constants.mygit_objects_path.glob("*/*"))) == 8  # old objects were removed
+        assert not any(len(path.name) == 40 for path in self.constants.mygit_objects_path.iterdir())  # and sharded
+        assert self.constants.commit_graph_path.exists()
+
+    def test_upgrade_rewrites_index(self):
+        self.create_legacy_repository()
+        with Path.open(self.cwd_path / "readme.md", "wb") as workspace_file:
+            workspace_file.write(b"goodbye")
+        content = compress(b"goodbye", -1)
+        legacy_checksum = sha1(content).hexdigest()
+        with Path.open(self.constants.mygit_index_dir_path / legacy_checksum, "wb") as blob:
+            blob.write(content)
+        with Path.open(self.constants.mygit_index_path, "wb") as index:
+            index.write(compress(bytes(f"readme.md {legacy_checksum}", encoding="utf-8"), -1))
+
+        mygit.main(self.cwd_path, shlex_split("upgrade"))
+
+        state = get_current_state(self.constants)
+        new_checksum = get_blob_checksum(b"goodbye")
+        assert state.current_indexed_paths == {self.cwd_path / "readme.md": new_checksum}
+        assert (self.constants.mygit_index_dir_path / new_checksum).exists()
+        assert state.status_indexed_paths == ['modified: readme.md']
+        assert state.status_not_indexed_paths == []
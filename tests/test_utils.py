@@ -1,7 +1,10 @@
 import mygit.backend as backend
+import mygit.main as mygit
 from mygit.constants import Constants
 from mygit.state import State
+from hashlib import sha1
 from pathlib import Path
+from shlex import split as shlex_split
 
 
 def clean_directory(directory_path: Path):
@@ -19,11 +22,25 @@ def remove_directory(directory_path: Path):
 
 def get_current_state(c: Constants) -> State:
     state = State()
-    state.load_cache(
-        c,
-        backend.get_compressed_file_content(c.mygit_index_path),
-        backend.get_last_commit_index_content(c))
+    state.load_cache(c, backend.get_last_commit_index_content(c))
 
     backend.check_status(c, state)
 
     return state
+
+
+def get_blob_checksum(content: bytes) -> str:
+    return sha1(bytes(f"blob {len(content)}\0", encoding="utf-8") + content).hexdigest()
+
+
+def write_file(cwd_path: Path, name: str, content: str):
+    file_path = cwd_path / name
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    with Path.open(file_path, "w") as test_file:
+        test_file.write(content)
+
+
+def commit(cwd_path: Path, message: str) -> str:
+    mygit.main(cwd_path, shlex_split("index -a"))
+    mygit.main(cwd_path, shlex_split(f"commit {message}"))
+    return backend.get_last_commit_checksum(backend.get_current_branch_path(Constants(cwd_path)))
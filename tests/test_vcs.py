@@ -36,8 +36,7 @@ class TestVCS:
             test_file.write("hello world")
 
         with Path.open(test_file_path, "rb") as test_file:
-            content = compress(test_file.read(), -1)
-            test_file_checksum = sha1(content).hexdigest()
+            test_file_checksum = get_blob_checksum(test_file.read())
 
         state = get_current_state(self.constants)
         assert state.status_not_indexed_paths == ['modified: readme.md']
@@ -53,4 +52,5 @@ class TestVCS:
 
         state = get_current_state(self.constants)
         assert state.current_indexed_paths == {}
-        assert (self.constants.mygit_objects_path / test_file_checksum).exists()  # was file really compressed & saved?
+        blob_path = self.constants.mygit_objects_path / test_file_checksum[:2] / test_file_checksum[2:]
+        assert blob_path.exists()  # was file really compressed & saved?